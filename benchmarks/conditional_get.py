@@ -0,0 +1,88 @@
+"""
+Latency of the conditional GETs: full responses (`200 OK`) against `304 Not Modified`
+for the post detail, the user profile and the notifications.
+
+Run on a test database created and destroyed by the script.
+
+    python benchmarks/conditional_get.py [--replies 20] [--requests 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social.settings.dev')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from posts.models import Post, PostReply, Notification  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def create_user(handle):
+    return User.objects.create_user(
+        email=f'{handle}@mail.com', password='Benchmark1905', username=handle,
+        user_handle=handle, first_name='First', last_name='Last', is_active=True)
+
+
+def build_data(replies):
+    user = create_user('reader')
+    author = create_user('author')
+    post = Post.objects.create(user=author, body='Benchmark post')
+    for i in range(replies):
+        reply = Post.objects.create(user=author, body=f'Reply {i}')
+        PostReply.objects.create(parent=post, reply=reply)
+        Notification.objects.create(
+            sender=author, recipient=user, notification_type='reply', post=reply,
+            header=f'{author} reply your post.')
+    return user, author, post
+
+
+def milliseconds_per_request(client, url, requests, etag=None):
+    headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url, **headers)
+    return (time.perf_counter() - start) * 1000 / requests, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--replies', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        user, author, post = build_data(args.replies)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        urls = [
+            ('post detail', reverse('post-detail', kwargs={'pk': post.id})),
+            ('user profile', reverse('users-detail', kwargs={'user_handle': author.user_handle})),
+            ('notifications', reverse('notifications')),
+        ]
+        for name, url in urls:
+            etag = client.get(url)['ETag']
+            full, full_status = milliseconds_per_request(client, url, args.requests)
+            cached, cached_status = milliseconds_per_request(
+                client, url, args.requests, etag)
+            print(f'{name:<15} {full_status} {full:>8.2f} ms   '
+                  f'{cached_status} {cached:>8.2f} ms   x{full / cached:.1f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Overhead of the database connection by request: a new connection for each
+request, a persistent connection (`CONN_MAX_AGE`) and the pool of
+`core.db.backends.postgresql`.
+
+Needs PostgreSQL (the connection of `DATABASES['default']`, directly or through
+PgBouncer). Each request is the cycle of Django: the connections are closed (or
+given back) at the start and the end, with one query in between.
+
+    python benchmarks/db_connections.py [--requests 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social.settings.dev')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import close_old_connections, connections  # noqa: E402
+
+
+MODES = [
+    ('new connection', {'ENGINE': 'django.db.backends.postgresql', 'CONN_MAX_AGE': 0}),
+    ('persistent', {'ENGINE': 'django.db.backends.postgresql', 'CONN_MAX_AGE': 60,
+                    'CONN_HEALTH_CHECKS': True}),
+    ('pool', {'ENGINE': 'core.db.backends.postgresql', 'CONN_MAX_AGE': 0}),
+]
+
+
+def add_alias(alias, overrides):
+    databases = {**settings.DATABASES, alias: {**settings.DATABASES['default'], **overrides}}
+    connections.settings[alias] = connections.configure_settings(databases)[alias]
+
+
+def milliseconds_per_request(alias, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        close_old_connections()
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        close_old_connections()
+    return (time.perf_counter() - start) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    if connections['default'].vendor != 'postgresql':
+        sys.exit('The connections are measured on PostgreSQL.')
+
+    for name, overrides in MODES:
+        alias = name.replace(' ', '_')
+        add_alias(alias, overrides)
+        milliseconds = milliseconds_per_request(alias, args.requests)
+        connections[alias].close()
+        print(f'{name:<15} {milliseconds:>8.3f} ms/request')
+
+
+if __name__ == '__main__':
+    main()
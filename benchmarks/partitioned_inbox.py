@@ -0,0 +1,103 @@
+"""
+Latency of the inbox query and of the pruning of a month of notifications, with
+the notifications table unpartitioned against partitioned by month.
+
+Needs PostgreSQL. Run on a test database created and destroyed by the script,
+with the rows spread over the last `--months` months:
+
+    python benchmarks/partitioned_inbox.py [--rows 50000000] [--users 100000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social.settings.dev')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.partitions import partition_table, drop_partitions, month_start, add_months  # noqa: E402
+from posts.models import Notification  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def build_data(rows, users, months):
+    sender = User.objects.create(
+        email='sender@mail.com', username='sender', user_handle='sender',
+        first_name='First', last_name='Last', is_active=True)
+    readers = User.objects.bulk_create([
+        User(email=f'reader{i}@mail.com', username=f'reader{i}', user_handle=f'reader{i}',
+             first_name='First', last_name='Last', is_active=True)
+        for i in range(users)], batch_size=5000)
+    first_id = min(reader.id for reader in readers)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO posts_notification (sender_id, recipient_id, notification_type, "
+            "header, is_read, count, recent_senders, create_at, modify_at) "
+            "SELECT %s, %s + floor(random() * %s)::int, 'follow', "
+            "'sender started following you.', true, 1, '[]', "
+            "now() - random() * %s * interval '30 days', now() "
+            "FROM generate_series(1, %s)",
+            [sender.id, first_id, users, months, rows])
+        cursor.execute('ANALYZE posts_notification')
+    return User.objects.filter(is_active=True).exclude(id=sender.id)[:100]
+
+
+def milliseconds_per_inbox(recipients):
+    since = timezone.now() - timedelta(days=settings.NOTIFICATION_INBOX_DAYS)
+    start = time.perf_counter()
+    for recipient in recipients:
+        list(Notification.objects.filter(
+            recipient=recipient, create_at__gte=since).values_list('id', flat=True)[:50])
+    return (time.perf_counter() - start) * 1000 / len(recipients)
+
+
+def milliseconds_to_prune_month(partitioned):
+    oldest = month_start(Notification.objects.order_by('create_at').first().create_at)
+    start = time.perf_counter()
+    if partitioned:
+        drop_partitions('posts_notification', add_months(oldest, 1))
+    else:
+        Notification.objects.filter(create_at__lt=add_months(oldest, 1)).delete()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--months', type=int, default=12)
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        sys.exit('The partitions need PostgreSQL.')
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        recipients = build_data(args.rows, args.users, args.months)
+        for partitioned in (False, True):
+            if partitioned:
+                partition_table('posts_notification')
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE posts_notification')
+            inbox = milliseconds_per_inbox(recipients)
+            prune = milliseconds_to_prune_month(partitioned)
+            name = 'partitioned' if partitioned else 'unpartitioned'
+            print(f'{name:<15} inbox {inbox:>8.2f} ms   prune a month {prune:>10.1f} ms')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
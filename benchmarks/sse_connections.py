@@ -0,0 +1,94 @@
+"""
+Memory by open connection of the events stream and latency of the fan-out of one
+event of an author to all his followers connected.
+
+Run on a test database created and destroyed by the script.
+
+    python benchmarks/sse_connections.py [--connections 1000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social.settings.dev')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from core.pubsub import broker  # noqa: E402
+from users.models import User, Follower  # noqa: E402
+
+
+def build_data(connections):
+    author = User.objects.create(
+        email='author@mail.com', username='author', user_handle='author',
+        first_name='First', last_name='Last', is_active=True)
+    users = User.objects.bulk_create([
+        User(email=f'reader{i}@mail.com', username=f'reader{i}',
+             user_handle=f'reader{i}', first_name='First', last_name='Last',
+             is_active=True)
+        for i in range(connections)])
+    Follower.objects.bulk_create([
+        Follower(follower=user, following=author) for user in users])
+    return author, [str(AccessToken.for_user(user)) for user in users]
+
+
+async def open_streams(tokens):
+    client = AsyncClient()
+    streams = []
+    for token in tokens:
+        response = await client.get(reverse('events'), {'token': token})
+        content = response.streaming_content
+        await anext(content)
+        streams.append(content)
+    return streams
+
+
+async def measure(tokens):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    streams = await open_streams(tokens)
+    memory = (tracemalloc.get_traced_memory()[0] - before) / len(streams)
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    broker.deliver('author:author', {
+        'event': 'feed', 'id': None, 'data': {'post': 1, 'user': 'author'}})
+    await asyncio.gather(*[anext(stream) for stream in streams])
+    fan_out = (time.perf_counter() - start) * 1000
+
+    for stream in streams:
+        await stream.aclose()
+    return memory, fan_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connections', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        author, tokens = build_data(args.connections)
+        memory, fan_out = asyncio.run(measure(tokens))
+        print(f'{args.connections} connections   {memory / 1024:>8.1f} KiB/connection   '
+              f'fan-out {fan_out:>8.2f} ms')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Rows per second rendered by the users list serializers.
+
+Compare the previous `to_representation` (try to read the instance as a dict and
+fall back to the attributes on the `TypeError`) with the current one, for model
+instances and for `.values()` rows.
+
+    python benchmarks/user_serializers.py [--users 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social.settings.dev')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+
+from users.models import User  # noqa: E402
+from users.serializers import ListSimpleUserSerializer, ListProfileUserSerializer  # noqa: E402
+
+
+FIELDS = [
+    'username', 'user_handle', 'email', 'first_name', 'last_name', 'birth_date',
+    'biography', 'profile_img', 'header_photo', 'website', 'location', 'create_at',
+    'follower_amount', 'following_amount',
+]
+
+
+class PreviousSimpleUserSerializer(ListSimpleUserSerializer):
+    def to_representation(self, instance):
+        try:
+            return {
+                'username': instance['username'],
+                'user_handle': instance['user_handle'],
+                'biography': instance['biography'],
+                'profile_img': instance.profile_img.url if instance['profile_img'] else '',
+                'follower_amount': instance['follower_amount'],
+                'following_amount': instance['following_amount'],
+            }
+        except:
+            return {
+                'username': instance.username,
+                'user_handle': instance.user_handle,
+                'biography': instance.biography,
+                'profile_img': instance.profile_img.url if instance.profile_img else '',
+                'follower_amount': instance.follower_amount,
+                'following_amount': instance.following_amount,
+            }
+
+
+def build_users(amount):
+    return [
+        User(
+            username=f'user{i}', user_handle=f'user{i}', email=f'user{i}@mail.com',
+            first_name='First', last_name='Last', biography='Biography',
+            profile_img=f'user{i}/profile/img.png', header_photo=f'user{i}/profile/header.png',
+            create_at=timezone.now(), follower_amount=i, following_amount=i,
+        )
+        for i in range(amount)
+    ]
+
+
+def rows_per_second(serializer_class, make_items, repeat):
+    best = None
+    for _ in range(repeat):
+        # Fresh instances each run, the image descriptors cache their `FieldFile`.
+        items = make_items()
+        start = time.perf_counter()
+        serializer_class(items, many=True).data
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(items) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    def instances():
+        return build_users(args.users)
+
+    def rows():
+        return [{field: getattr(user, field) if not field.endswith(('img', 'photo'))
+                 else getattr(user, field).name for field in FIELDS}
+                for user in build_users(args.users)]
+
+    results = [
+        ('simple, previous, instances', PreviousSimpleUserSerializer, instances),
+        ('simple, current, instances', ListSimpleUserSerializer, instances),
+        ('simple, current, rows', ListSimpleUserSerializer, rows),
+        ('profile, current, instances', ListProfileUserSerializer, instances),
+        ('profile, current, rows', ListProfileUserSerializer, rows),
+    ]
+    for name, serializer_class, make_items in results:
+        rate = rows_per_second(serializer_class, make_items, args.repeat)
+        print(f'{name:<30} {rate:>12,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
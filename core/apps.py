@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Register the tasks of the `jobs` modules of the apps.
+        autodiscover_modules('jobs')
+
+        from .checks import check_replica_stickiness, check_shared_cache
+        checks.register(check_shared_cache, checks.Tags.caches, deploy=True)
+        checks.register(check_replica_stickiness, checks.Tags.caches, checks.Tags.database)
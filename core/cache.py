@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+
+
+_local_caches = []
+
+
+class TieredCache:
+    """
+    Cache with a small in-process LRU in front of a Django cache backend.
+
+    The keys are read and written by batches: the LRU answers the keys it has,
+    and the rest are fetched from the backend with a single `get_many`. The keys
+    must change when the value changes (e.g. with a version read from the
+    database), the entries are only removed by the LRU size or by `timeout`: a
+    process never invalidates the LRU of the others, they just stop asking for
+    the old keys.
+
+    The backend (`settings.CACHES`) must be shared by the processes (Redis at
+    `CACHE_URL`) so a value rendered by one worker is reused by all of them.
+    """
+
+    def __init__(self, prefix, timeout=60 * 5, max_size=1000, alias='default'):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.max_size = max_size
+        self.alias = alias
+        self._local = OrderedDict()
+        self._lock = Lock()
+        _local_caches.append(self)
+
+    def make_key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                entry = self._local.get(key, None)
+                if entry is not None and entry[0] > now:
+                    self._local.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    missing.append(key)
+
+        if missing:
+            shared = caches[self.alias].get_many(
+                [self.make_key(key) for key in missing])
+            shared = {key: shared[self.make_key(key)]
+                      for key in missing if self.make_key(key) in shared}
+            self._set_local(shared)
+            found.update(shared)
+
+        return found
+
+    def set_many(self, mapping):
+        if not mapping:
+            return
+        caches[self.alias].set_many(
+            {self.make_key(key): value for key, value in mapping.items()},
+            self.timeout)
+        self._set_local(mapping)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def _set_local(self, mapping):
+        expires = time.monotonic() + self.timeout
+        with self._lock:
+            for key, value in mapping.items():
+                self._local[key] = (expires, value)
+                self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+
+def clear_local_caches():
+    for tiered_cache in _local_caches:
+        tiered_cache.clear_local()
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning
+
+
+def is_cache_shared():
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The fragments of the posts, the results of the polls and the stickiness to
+    the primary are seen by all the processes only with a shared cache backend.
+    """
+    if is_cache_shared():
+        return []
+    return [Warning(
+        'The default cache is in the memory of each process, the other workers '
+        'do not see the values written by one of them.',
+        hint='Set CACHE_URL to a Redis server shared by all the processes.',
+        id='core.W001',
+    )]
+
+
+def check_replica_stickiness(app_configs, **kwargs):
+    """
+    A user is kept on the primary after a write by the worker that handled it
+    only, without a shared cache, and can read from a replica without his write.
+    """
+    if not settings.DATABASE_REPLICAS or is_cache_shared():
+        return []
+    return [Warning(
+        'DATABASE_REPLICAS is set with a cache in the memory of each process, the '
+        'users do not read their own writes when served by another worker.',
+        hint='Set CACHE_URL to a Redis server shared by all the processes.',
+        id='core.W002',
+    )]
@@ -0,0 +1,134 @@
+"""
+PostgreSQL backend that takes the connections from a pool of the process instead
+of opening one for each request.
+
+Django closes the connection of a thread at the end of the request (with
+`CONN_MAX_AGE = 0`), here it goes back to the pool, rolled back if a transaction
+was left open, and the next request of any thread takes it without connecting
+again. The threads of the ASGI application (`sync_to_async`) share the pool in
+the same way, so it is safe for the async views.
+
+    'ENGINE': 'core.db.backends.postgresql',
+    'CONN_MAX_AGE': 0,
+    'POOL': {'MAX_SIZE': 20, 'TIMEOUT': 10, 'CHECK_AFTER': 30},
+"""
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.base import Database
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Up to `max_size` connections with the same parameters, idle or in use. A
+    thread waits up to `timeout` seconds for a connection when all are in use.
+    The connections idle for more than `check_after` seconds are checked before
+    being used again, and replaced if the server closed them.
+    """
+
+    def __init__(self, conn_params, max_size=20, timeout=10, check_after=30):
+        self.conn_params = conn_params
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise Database.OperationalError('No connection available in the pool.')
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection, idle_since = self._idle.pop()
+                if self.is_usable(connection, idle_since):
+                    return connection
+                connection.close()
+            return Database.connect(**self.conn_params)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def is_usable(self, connection, idle_since):
+        if connection.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def putconn(self, connection, discard=False):
+        try:
+            if discard or connection.closed:
+                connection.close()
+            else:
+                with self._lock:
+                    # The last used is taken first, so the extra ones age and get checked.
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            connection.close()
+
+
+def get_pool(conn_params, options):
+    key = repr(sorted(conn_params.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                conn_params, max_size=options.get('MAX_SIZE', 20),
+                timeout=options.get('TIMEOUT', 10),
+                check_after=options.get('CHECK_AFTER', 30))
+        return _pools[key]
+
+
+class PooledDatabase:
+    """The driver module, with `connect` taking the connections from the pool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def connect(self, **conn_params):
+        return self.pool.getconn()
+
+    def __getattr__(self, name):
+        return getattr(Database, name)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(conn_params, self.settings_dict.get('POOL', {}))
+        # The parent configures the connection, it is only taken from the pool.
+        self.Database = PooledDatabase(self.pool)
+        try:
+            return super().get_new_connection(conn_params)
+        finally:
+            del self.Database
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            discard = self.errors_occurred and not self.is_usable()
+            if not discard and self.connection.info.transaction_status != \
+                    Database.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    self.connection.rollback()
+                except Database.Error:
+                    discard = True
+            self.pool.putconn(self.connection, discard=discard)
@@ -0,0 +1,126 @@
+"""
+Routing of the reads of the read-only endpoints to the replicas of the database.
+
+The views opt in with `ReplicaReadMixin`: the reads of the actions (or methods)
+in `replica_actions` go to one of `settings.DATABASE_REPLICAS`, all the other
+queries to `default`. After a user writes (a request not safe answered without
+error), his requests use `default` for `DATABASE_REPLICA_STICKY_SECONDS`, so he
+reads his own writes even if the replicas are behind. The stickiness is kept in
+the default cache, shared by all the workers with `CACHE_URL` (see
+`core.checks`), as his next request can be served by another one. A replica
+behind more than `DATABASE_REPLICA_MAX_LAG` seconds is not used.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+logger = logging.getLogger(__name__)
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+_replicas_lag = {}
+
+
+def use_replica(value=True):
+    """Send the reads of the current request (or task) to the replicas."""
+    return _read_from_replica.set(value)
+
+
+def get_sticky_key(user):
+    return f'db:primary:{user.pk}'
+
+
+def stick_to_primary(user):
+    cache.set(get_sticky_key(user), True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user):
+    return user.is_authenticated and cache.get(get_sticky_key(user), False)
+
+
+def get_replica_lag(alias):
+    """
+    Seconds that the replica `alias` is behind the primary, read at most once by
+    `DATABASE_REPLICA_LAG_CHECK` seconds. 0 if it can not be known.
+    """
+    now = time.monotonic()
+    checked = _replicas_lag.get(alias, None)
+    if checked is not None and checked[0] > now:
+        return checked[1]
+
+    lag = 0
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - '
+                    'pg_last_xact_replay_timestamp()), 0)')
+                lag = float(cursor.fetchone()[0])
+        except DatabaseError:
+            logger.exception('Lag of the replica %s not read.', alias)
+            lag = float('inf')
+    _replicas_lag[alias] = (now + settings.DATABASE_REPLICA_LAG_CHECK, lag)
+    return lag
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get():
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.DATABASE_REPLICAS
+                    if get_replica_lag(alias) <= settings.DATABASE_REPLICA_MAX_LAG]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas have the same rows than the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    Read from the replicas in the actions of `replica_actions` (the methods for
+    the views without actions), unless the user wrote recently.
+    """
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        action = getattr(self, 'action', None) or request.method.lower()
+        use_replica(bool(settings.DATABASE_REPLICAS) and request.method in SAFE_METHODS
+                    and action in self.replica_actions and not is_sticky(request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        use_replica(False)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Keep on `default` the reads of the users that wrote in the last
+    `DATABASE_REPLICA_STICKY_SECONDS`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # The user is authenticated by the view, and set in the request by DRF.
+        user = getattr(request, 'user', None)
+        if (settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS
+                and response.status_code < 400 and user is not None and user.is_authenticated):
+            stick_to_primary(user)
+        return response
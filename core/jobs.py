@@ -0,0 +1,162 @@
+"""
+Queue of background jobs in the database, run by the `run_jobs` worker without
+an external broker.
+
+The tasks are functions registered with `@task('name')` in the `jobs` module of
+the apps, and `enqueue('name', payload)` creates a `Job` in the transaction of
+the caller, so it is only run if the transaction is committed. The worker takes
+the due jobs with `SKIP LOCKED` (several workers can run at the same time), runs
+the ones of a task with `batch_size` together in a single call, and retries the
+failed ones with an exponential backoff until `max_attempts`. The tasks of
+`settings.JOB_SCHEDULES` are enqueued each `interval` seconds, once by interval
+whatever the amount of workers thanks to their idempotency key.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class Task:
+    def __init__(self, name, func, batch_size=1, max_attempts=5, backoff=30, atomic=True):
+        self.name = name
+        self.func = func
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.atomic = atomic
+
+    def run(self, payloads):
+        # The tasks with a batch receive the list of the payloads.
+        if self.batch_size > 1:
+            self.func(payloads)
+        else:
+            self.func(**payloads[0])
+
+    def run_in_transaction(self, payloads):
+        if not self.atomic:
+            return self.run(payloads)
+        with transaction.atomic():
+            return self.run(payloads)
+
+    def get_retry_date(self, attempts, now):
+        return now + timedelta(seconds=self.backoff * 2 ** (attempts - 1))
+
+
+def task(name, batch_size=1, max_attempts=5, backoff=30, atomic=True):
+    """
+    Register a function as the task `name`. With `batch_size` greater than 1 it
+    is called with a list of up to `batch_size` payloads, else with the payload
+    as keyword arguments. Each call runs in a transaction, unless `atomic` is
+    False (for the tasks that commit by chunks themselves).
+    """
+    def decorator(func):
+        _tasks[name] = Task(name, func, batch_size, max_attempts, backoff, atomic)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, key=None, run_at=None):
+    """
+    Create a job of the task `name` to run at `run_at` (now by default). If a job
+    with the idempotency `key` exists it is not created again.
+    """
+    Job.objects.bulk_create([Job(
+        name=name,
+        payload=payload or {},
+        idempotency_key=key,
+        run_at=run_at or timezone.now(),
+    )], ignore_conflicts=key is not None)
+
+
+def enqueue_periodic(now=None):
+    now = now or timezone.now()
+    for name, interval in settings.JOB_SCHEDULES.items():
+        slot = int(now.timestamp()) // interval
+        enqueue(name, key=f'periodic:{name}:{slot}', run_at=now)
+
+
+def release_stale_jobs(now=None):
+    """Put back in the queue the jobs of the workers that died running them."""
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+    ).update(status=Job.PENDING, locked_at=None, modify_at=timezone.now())
+
+
+def claim_jobs(batch_size, now):
+    with transaction.atomic():
+        jobs_ids = list(Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.PENDING, run_at__lte=now
+        ).order_by('run_at').values_list('id', flat=True)[:batch_size])
+        Job.objects.filter(id__in=jobs_ids).update(
+            status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1,
+            modify_at=timezone.now())
+    return list(Job.objects.filter(id__in=jobs_ids).order_by('run_at', 'id').only(
+        'id', 'name', 'payload', 'attempts'))
+
+
+def fail_jobs(jobs, task, error, now):
+    for job in jobs:
+        if task is not None and job.attempts < task.max_attempts:
+            Job.objects.filter(id=job.id).update(
+                status=Job.PENDING, locked_at=None, last_error=error,
+                run_at=task.get_retry_date(job.attempts, now), modify_at=timezone.now())
+        else:
+            Job.objects.filter(id=job.id).update(
+                status=Job.FAILED, locked_at=None, last_error=error,
+                modify_at=timezone.now())
+
+
+def run_jobs(batch_size=100, now=None):
+    """
+    Run the due jobs, up to `batch_size`, and mark them as done, or to retry
+    if they failed. Return the amount of jobs run.
+    """
+    now = now or timezone.now()
+    jobs = claim_jobs(batch_size, now)
+
+    by_task = {}
+    for job in jobs:
+        by_task.setdefault(job.name, []).append(job)
+
+    for name, task_jobs in by_task.items():
+        task = _tasks.get(name, None)
+        if task is None:
+            fail_jobs(task_jobs, None, f'Task {name} not registered.', now)
+            continue
+
+        for i in range(0, len(task_jobs), task.batch_size):
+            chunk = task_jobs[i:i + task.batch_size]
+            try:
+                task.run_in_transaction([job.payload for job in chunk])
+            except Exception:
+                logger.exception('Job of %s failed.', name)
+                fail_jobs(chunk, task, traceback.format_exc(), now)
+            else:
+                Job.objects.filter(id__in=[job.id for job in chunk]).update(
+                    status=Job.DONE, locked_at=None, last_error=None,
+                    modify_at=timezone.now())
+
+    return len(jobs)
+
+
+@task('core.prune_jobs')
+def prune_jobs():
+    """Delete the jobs done, kept a while for the idempotency keys."""
+    Job.objects.filter(
+        status=Job.DONE,
+        modify_at__lt=timezone.now() - timedelta(seconds=settings.JOB_RETENTION),
+    ).delete()
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import enqueue_periodic, release_stale_jobs, run_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run the background jobs due, and enqueue the periodic ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Jobs taken per run.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running as a worker.')
+        parser.add_argument('--interval', type=float, default=1,
+                            help='Seconds to wait without jobs with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            release_stale_jobs()
+            enqueue_periodic()
+            ran = run_jobs(batch_size=options['batch_size'])
+            if ran:
+                self.stdout.write(self.style.SUCCESS(f'{ran} job/s run.'))
+
+            if not options['loop']:
+                break
+            # Without waiting while there are more jobs due.
+            if ran < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.6 on 2026-10-19 00:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_at', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('modify_at', models.DateTimeField(auto_now=True, verbose_name='Date of last modification')),
+                ('name', models.CharField(max_length=100, verbose_name='Task')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Payload')),
+                ('idempotency_key', models.CharField(blank=True, max_length=200, null=True, unique=True, verbose_name='Idempotency key')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Run at')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Locked at')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last error')),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['run_at'], name='job_pending_idx')],
+            },
+        ),
+    ]
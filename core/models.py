@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -10,3 +11,41 @@ class DatesRecordsBaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Job(DatesRecordsBaseModel):
+    """Call of a task registered in `core.jobs`, run by the `run_jobs` worker."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name=_('Task'))
+    payload = models.JSONField(default=dict, blank=True, verbose_name=_('Payload'))
+    # A job with the key of another is not created again.
+    idempotency_key = models.CharField(
+        max_length=200, unique=True, null=True, blank=True, verbose_name=_('Idempotency key'))
+    status = models.CharField(
+        max_length=10, choices=STATUS, default=PENDING, verbose_name=_('Status'))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_('Attempts'))
+    run_at = models.DateTimeField(default=timezone.now, verbose_name=_('Run at'))
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Locked at'))
+    last_error = models.TextField(null=True, blank=True, verbose_name=_('Last error'))
+
+    class Meta:
+        indexes = [
+            # Only the jobs waiting, scanned by the workers.
+            models.Index(fields=['run_at'], name='job_pending_idx',
+                         condition=models.Q(status='pending')),
+        ]
+        verbose_name = _('Job')
+        verbose_name_plural = _('Jobs')
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
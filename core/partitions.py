@@ -0,0 +1,246 @@
+"""
+Monthly range partitions of append-mostly tables on PostgreSQL.
+
+The tables of `settings.PARTITIONED_TABLES` are converted by their migration to
+tables partitioned by `create_at`, one partition by month, and the command
+`manage_partitions` creates the partitions of the next months ahead of time and
+drops the partitions older than the retention with a `DROP TABLE`. A DEFAULT
+partition receives the rows of the months without partition, so the inserts do
+not fail if the maintenance is late, and `manage_partitions` moves them to the
+partitions of their months. On other databases (SQLite for the tests) the
+tables are not partitioned and all of this is a no-op.
+
+Only tables without foreign keys pointing to them can be partitioned: the
+primary key of a partitioned table must include the partition key, so an `id`
+alone is no longer unique for a foreign key. For the same reason the unique
+indexes without `create_at` are not recreated in the partitioned table.
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_enabled(table):
+    return connection.vendor == 'postgresql' and table in getattr(
+        settings, 'PARTITIONED_TABLES', [])
+
+
+def add_months(date, months):
+    month = date.month - 1 + months
+    return date.replace(year=date.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def month_start(date):
+    return date.astimezone(dt_timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(table, start):
+    return f'{table}_p{start:%Y%m}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def has_default_partition(cursor, table):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [default_partition_name(table)])
+    return cursor.fetchone()[0]
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+    return cursor.fetchone() is not None
+
+
+def get_partitions(cursor, table):
+    """Get the names of the partitions of `table` with the start of his month."""
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(%s)", [table])
+    partitions = {}
+    for name, in cursor.fetchall():
+        try:
+            start = datetime.strptime(name[-6:], '%Y%m').replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+        partitions[name] = start
+    return partitions
+
+
+def create_partitions(table, start, end):
+    """
+    Create the monthly partitions of `table` from the month of `start` to the
+    month of `end`, included, that do not exist. Return their names.
+    """
+    created = []
+    month = month_start(start)
+    with connection.cursor() as cursor:
+        existing = get_partitions(cursor, table)
+        default = has_default_partition(cursor, table)
+        while month <= end:
+            name = partition_name(table, month)
+            if name not in existing:
+                if default:
+                    attach_partition_from_default(cursor, table, name, month)
+                else:
+                    cursor.execute(
+                        f'CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF '
+                        f'{connection.ops.quote_name(table)} FOR VALUES FROM (%s) TO (%s)',
+                        [month, add_months(month, 1)])
+                created.append(name)
+            month = add_months(month, 1)
+    return created
+
+
+def attach_partition_from_default(cursor, table, name, month):
+    """
+    Create the partition `name` of the `month` of `table` with the rows of the
+    month in the DEFAULT partition, moved in the same transaction: a partition
+    can not be created while the DEFAULT partition has rows of his range.
+    """
+    quote = connection.ops.quote_name
+    default = default_partition_name(table)
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic():
+        cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'INSERT INTO {quote(name)} SELECT * FROM {quote(default)} '
+            f'WHERE create_at >= %s AND create_at < %s', bounds)
+        cursor.execute(
+            f'DELETE FROM {quote(default)} WHERE create_at >= %s AND create_at < %s', bounds)
+        # The indexes of the table are created in the partition when attached.
+        cursor.execute(
+            f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} '
+            f'FOR VALUES FROM (%s) TO (%s)', bounds)
+
+
+def create_default_partition(table):
+    """Create the DEFAULT partition of `table` if it does not exist. Return if it was created."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if has_default_partition(cursor, table):
+            return False
+        cursor.execute(
+            f'CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quote(table)} DEFAULT')
+    return True
+
+
+def move_default_rows(table):
+    """
+    Move the rows of the DEFAULT partition of `table` to the partitions of
+    their months, created for them. Return the names of the partitions created.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if not has_default_partition(cursor, table):
+            return []
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', create_at AT TIME ZONE 'UTC') "
+            f"FROM {quote(default_partition_name(table))}")
+        months = sorted(row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall())
+
+    created = []
+    for month in months:
+        created += create_partitions(table, month, month)
+    return created
+
+
+def drop_partitions(table, before):
+    """
+    Drop the partitions of `table` whose month ends before `before`, with all
+    their rows. Return their names.
+    """
+    dropped = []
+    with connection.cursor() as cursor:
+        for name, start in sorted(get_partitions(cursor, table).items()):
+            if add_months(start, 1) <= before:
+                cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
+                dropped.append(name)
+    return dropped
+
+
+def partition_table(table, months_ahead=3):
+    """
+    Convert `table` to a table partitioned by month of `create_at`, copying his
+    rows, indexes and foreign keys. The `id` keeps being generated by a
+    sequence, and the primary key becomes (`id`, `create_at`).
+    """
+    quote = connection.ops.quote_name
+    old = f'{table}_unpartitioned'
+    sequence = f'{table}_id_seq'
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return
+
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = to_regclass(%s) AND NOT indisprimary", [table])
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            f'SELECT MIN(create_at), COALESCE(MAX(id), 0) FROM {quote(table)}')
+        first_date, last_id = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (create_at)')
+        now = datetime.now(dt_timezone.utc)
+        create_partitions(table, first_date or now, add_months(month_start(now), months_ahead))
+        create_default_partition(table)
+        cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+        # The names of the indexes, the primary key and the sequence are free
+        # once the old table is dropped.
+        cursor.execute(f'DROP TABLE {quote(old)}')
+
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, create_at)')
+        cursor.execute(f'CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id')
+        cursor.execute('SELECT setval(%s, %s, false)', [sequence, last_id + 1])
+        cursor.execute(
+            f'ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval(%s)', [sequence])
+        for definition in indexes:
+            if definition.startswith('CREATE UNIQUE') and 'create_at' not in definition:
+                logger.warning('Unique index not valid on partitions: %s', definition)
+                continue
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+
+
+def partition_tables_migration(*tables):
+    """
+    Get the function of a `RunPython` migration that partitions `tables` when
+    they are enabled in `PARTITIONED_TABLES` on PostgreSQL.
+    """
+    def forwards(apps, schema_editor):
+        for table in tables:
+            if is_enabled(table):
+                partition_table(table)
+    return forwards
+
+
+def default_partitions_migration(*tables):
+    """
+    Get the function of a `RunPython` migration that creates the DEFAULT
+    partition of `tables`, for the ones partitioned without it.
+    """
+    def forwards(apps, schema_editor):
+        for table in tables:
+            if is_enabled(table):
+                with connection.cursor() as cursor:
+                    partitioned = is_partitioned(cursor, table)
+                if partitioned:
+                    create_default_partition(table)
+    return forwards
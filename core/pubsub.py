@@ -0,0 +1,193 @@
+"""
+Publish/subscribe of the events pushed to the streams of the connected clients.
+
+Each process has a `broker` with the subscriptions of his connections, by channel.
+The events are published through the backend of `settings.PUBSUB_BACKEND`, that
+delivers them to the brokers: `LocalBackend` only to the broker of the process
+(one worker, development and tests), `PostgresBackend` to the brokers of all the
+processes with LISTEN/NOTIFY.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+class BrokerFull(Exception):
+    pass
+
+
+class Subscription:
+    """
+    Events of some channels for one connection, in a bounded queue: if the client
+    does not read them fast enough the oldest are dropped, so the memory of an
+    idle or slow connection is bounded.
+    """
+
+    def __init__(self, broker, channels, queue_size):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = 0
+
+    def put(self, message):
+        # Run in the event loop of the connection.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """
+    Subscriptions of the connections of the process by channel. `deliver` can be
+    called from any thread, the events are put in the queues from the event loop
+    of each subscription.
+    """
+
+    def __init__(self, max_subscriptions=10000, queue_size=32):
+        self.max_subscriptions = max_subscriptions
+        self.queue_size = queue_size
+        self.channels = {}
+        self.amount = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, list(channels), self.queue_size)
+        with self._lock:
+            if self.amount >= self.max_subscriptions:
+                raise BrokerFull()
+            self.amount += 1
+            for channel in subscription.channels:
+                self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.amount -= 1
+            for channel in subscription.channels:
+                subscriptions = self.channels.get(channel, set())
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    self.channels.pop(channel, None)
+
+    def deliver(self, channel, message):
+        with self._lock:
+            subscriptions = list(self.channels.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # The event loop of the connection is closed.
+                pass
+
+
+class LocalBackend:
+    """Deliver the events only to the connections of this process."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def start(self):
+        pass
+
+    def publish(self, channel, message):
+        self.broker.deliver(channel, message)
+
+
+class PostgresBackend:
+    """
+    Deliver the events to the connections of all the processes with PostgreSQL
+    LISTEN/NOTIFY on one channel of the database. A thread of each process that
+    have connections listens with his own database connection, of the alias
+    `PUBSUB_LISTEN_DATABASE` (it can not be a connection of PgBouncer in
+    transaction mode).
+    """
+    pg_channel = 'social_events'
+
+    def __init__(self, broker, alias='default', listen_alias=None):
+        self.broker = broker
+        self.alias = alias
+        self.listen_alias = listen_alias or getattr(
+            settings, 'PUBSUB_LISTEN_DATABASE', alias)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.listen, daemon=True)
+                self._thread.start()
+
+    def publish(self, channel, message):
+        payload = json.dumps({'channel': channel, 'message': message})
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.pg_channel, payload])
+
+    def listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        params = connections[self.listen_alias].get_connection_params()
+        while True:
+            try:
+                connection = psycopg2.connect(**params)
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.pg_channel}')
+                while True:
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        payload = json.loads(connection.notifies.pop(0).payload)
+                        self.broker.deliver(payload['channel'], payload['message'])
+            except psycopg2.Error:
+                logger.exception('Events listener disconnected, reconnecting.')
+                time.sleep(1)
+
+
+broker = Broker(
+    max_subscriptions=getattr(settings, 'PUBSUB_MAX_SUBSCRIPTIONS', 10000),
+    queue_size=getattr(settings, 'PUBSUB_QUEUE_SIZE', 32),
+)
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(getattr(
+            settings, 'PUBSUB_BACKEND', 'core.pubsub.LocalBackend'))(broker)
+    return _backend
+
+
+def publish(channel, message):
+    """
+    Publish an event (a JSON serializable dict) to the subscriptions of `channel`
+    when the current transaction is committed.
+    """
+    def send():
+        try:
+            get_backend().publish(channel, message)
+        except Exception:
+            # The events are a hint for the clients, not lose the request for them.
+            logger.exception('Event not published to %s.', channel)
+
+    transaction.on_commit(send)
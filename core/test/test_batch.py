@@ -0,0 +1,78 @@
+import json
+import threading
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from core.test.test_setup import BaseApiTest
+from posts.test.factories import PostFactory
+
+
+@override_settings(BATCH_CONCURRENCY=1)
+class BatchTestCase(BaseApiTest, PostFactory):
+    def post_batch(self, requests, **extra):
+        return self.client.generic(
+            'POST', reverse('batch'), json.dumps({'requests': requests}),
+            content_type='application/json', **extra)
+
+    def test_batch_get_requests(self):
+        post = self.create_post()
+        detail = self.client.get(reverse('post-detail', kwargs={'pk': post.id}))
+        profile = self.client.get(reverse('users-detail', kwargs={'user_handle': 'testuser'}))
+
+        response = self.post_batch([
+            {'id': 'post', 'path': f'/posts/{post.id}/'},
+            {'id': 'profile', 'path': '/users/testuser/'},
+            {'id': 'notifications', 'path': '/notifications/?page=1'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        responses = response.json()['responses']
+        self.assertEqual([item['id'] for item in responses],
+                         ['post', 'profile', 'notifications'])
+        self.assertTrue(all(item['status'] == status.HTTP_200_OK for item in responses))
+        self.assertEqual(responses[0]['body']['post']['id'], post.id)
+        self.assertEqual(responses[0]['headers']['ETag'], detail['ETag'])
+        self.assertEqual(responses[1]['body'], profile.json())
+
+    def test_batch_conditional_request(self):
+        url = reverse('users-detail', kwargs={'user_handle': 'testuser'})
+        etag = self.client.get(url)['ETag']
+
+        response = self.post_batch([{'path': url, 'headers': {'If-None-Match': etag}}])
+
+        self.assertEqual(response.json()['responses'][0]['status'], status.HTTP_304_NOT_MODIFIED)
+        self.assertIsNone(response.json()['responses'][0]['body'])
+
+    def test_batch_path_not_found_or_not_allowed(self):
+        response = self.post_batch([{'path': '/not-a-route/'}, {'path': '/events/'}])
+
+        self.assertEqual([item['status'] for item in response.json()['responses']],
+                         [status.HTTP_404_NOT_FOUND, status.HTTP_400_BAD_REQUEST])
+
+    def test_fail_batch_not_get_request(self):
+        response = self.post_batch([{'method': 'POST', 'path': '/posts/'}])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fail_batch_not_authenticated(self):
+        self.client.credentials()
+        response = self.post_batch([{'path': '/users/testuser/'}])
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(BATCH_CONCURRENCY=2)
+    def test_batch_run_concurrently(self):
+        # Each sub-request waits for the other one, so they must run at the same time.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def run(request, sub_request, auth):
+            barrier.wait()
+            return {'id': sub_request['id'], 'status': status.HTTP_200_OK}
+
+        with patch('core.views.run_sub_request', run):
+            response = self.post_batch([{'id': 1, 'path': '/'}, {'id': 2, 'path': '/'}])
+
+        self.assertEqual([item['id'] for item in response.json()['responses']], [1, 2])
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import TieredCache
+from core.checks import check_replica_stickiness, check_shared_cache
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.tiered_cache = TieredCache('test', timeout=60, max_size=2)
+
+    def test_get_many_fill_local_from_backend(self):
+        cache.set(self.tiered_cache.make_key('a'), 1)
+
+        self.assertEqual(self.tiered_cache.get_many(['a', 'b']), {'a': 1})
+
+        cache.clear()
+        self.assertEqual(self.tiered_cache.get_many(['a']), {'a': 1})
+
+    def test_set_many_evict_least_recently_used(self):
+        self.tiered_cache.set_many({'a': 1, 'b': 2})
+        self.tiered_cache.get_many(['a'])
+        self.tiered_cache.set_many({'c': 3})
+
+        cache.clear()
+        self.assertEqual(self.tiered_cache.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+    def test_clear_local_read_backend(self):
+        self.tiered_cache.set_many({'a': 1})
+        self.tiered_cache.clear_local()
+        cache.set(self.tiered_cache.make_key('a'), 2)
+
+        self.assertEqual(self.tiered_cache.get_many(['a']), {'a': 2})
+
+    def test_other_process_read_new_version_from_backend(self):
+        # Another process, with his own LRU in front of the same backend.
+        other = TieredCache('test', timeout=60, max_size=2)
+        self.tiered_cache.set_many({'post:1': 'v1'})
+        self.assertEqual(other.get_many(['post:1']), {'post:1': 'v1'})
+
+        self.tiered_cache.set_many({'post:2': 'v2'})
+
+        self.assertEqual(other.get_many(['post:2']), {'post:2': 'v2'})
+
+
+class SharedCacheCheckTestCase(SimpleTestCase):
+    def test_warn_memory_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['core.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/0',
+    }})
+    def test_shared_cache(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_warn_replicas_with_memory_cache(self):
+        self.assertEqual([error.id for error in check_replica_stickiness(None)], ['core.W002'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(check_replica_stickiness(None), [])
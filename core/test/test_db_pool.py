@@ -0,0 +1,50 @@
+from importlib.util import find_spec
+from unittest import mock, skipIf
+
+from django.test import SimpleTestCase
+
+
+@skipIf(find_spec('psycopg2') is None, 'psycopg2 is not installed.')
+class ConnectionPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        from core.db.backends.postgresql.base import ConnectionPool, Database
+
+        self.Database = Database
+        patcher = mock.patch.object(
+            Database, 'connect', side_effect=lambda **params: mock.Mock(closed=0))
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ConnectionPool({'dbname': 'social'}, max_size=2, timeout=0.01)
+
+    def test_reuse_idle_connection(self):
+        connection = self.pool.getconn()
+        self.pool.putconn(connection)
+
+        self.assertIs(self.pool.getconn(), connection)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_discard_connection(self):
+        connection = self.pool.getconn()
+        self.pool.putconn(connection, discard=True)
+
+        self.assertIsNot(self.pool.getconn(), connection)
+        connection.close.assert_called_once()
+
+    def test_max_size(self):
+        self.pool.getconn()
+        connection = self.pool.getconn()
+
+        with self.assertRaises(self.Database.OperationalError):
+            self.pool.getconn()
+
+        self.pool.putconn(connection)
+        self.assertIs(self.pool.getconn(), connection)
+
+    def test_check_old_idle_connection(self):
+        self.pool.check_after = 0
+        connection = self.pool.getconn()
+        connection.cursor.side_effect = self.Database.Error
+        self.pool.putconn(connection)
+
+        self.assertIsNot(self.pool.getconn(), connection)
+        connection.close.assert_called_once()
@@ -0,0 +1,60 @@
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from core.dbrouters import _replicas_lag
+from posts.models import Post
+from users.test.factories import UserFactory
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTestCase(APITransactionTestCase):
+    # The replica mirrors the test database, it sees the rows once committed.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        _replicas_lag.clear()
+        self.user = UserFactory().create_active_user()
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(user=self.user, body='Replica post')
+
+    def get_replica_queries(self, url, **params):
+        with CaptureQueriesContext(connections['replica']) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_read_only_actions_read_from_replica(self):
+        self.assertGreater(self.get_replica_queries(reverse('post-list')), 0)
+        self.assertGreater(self.get_replica_queries(
+            reverse('post-detail', kwargs={'pk': self.post.id})), 0)
+        self.assertGreater(self.get_replica_queries(reverse('users-list')), 0)
+
+    def test_other_actions_read_from_primary(self):
+        self.assertEqual(self.get_replica_queries(reverse('notifications')), 0)
+        self.assertEqual(self.get_replica_queries(
+            reverse('post-thread', kwargs={'pk': self.post.id})), 0)
+
+    def test_sticky_to_primary_after_write(self):
+        other = Post.objects.create(
+            user=UserFactory().create_active_user(), body='Other post')
+        response = self.client.post(reverse('likes-post', kwargs={'pk': other.id}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.get_replica_queries(reverse('post-list')), 0)
+
+        cache.clear()
+        self.assertGreater(self.get_replica_queries(reverse('post-list')), 0)
+
+    @override_settings(DATABASE_REPLICA_MAX_LAG=5)
+    def test_lagging_replica_not_used(self):
+        _replicas_lag['replica'] = (time.monotonic() + 60, 30)
+
+        self.assertEqual(self.get_replica_queries(reverse('post-list')), 0)
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import jobs
+from core.jobs import enqueue, enqueue_periodic, release_stale_jobs, run_jobs, Task
+from core.models import Job
+from posts.models import Post
+from posts.test.factories import PostFactory
+from users.test.factories import UserFactory
+
+
+class JobsTestCase(TestCase, PostFactory):
+    def test_enqueue_with_key_once(self):
+        enqueue('posts.add_views', {'posts': [1]}, key='views:1')
+        enqueue('posts.add_views', {'posts': [1]}, key='views:1')
+        enqueue('posts.add_views', {'posts': [1]})
+
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_add_views_merged(self):
+        post = self.create_post()
+        other = self.create_post()
+        for posts_ids in ([post.id], [post.id, other.id], [post.id]):
+            enqueue('posts.add_views', {'posts': posts_ids})
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(run_jobs(), 3)
+
+        # An update by amount of views, whatever the amount of jobs.
+        self.assertEqual(len([query for query in context.captured_queries
+                              if query['sql'].startswith('UPDATE "posts_post"')]), 2)
+
+        self.assertEqual(Post.objects.get(id=post.id).num_views, 3)
+        self.assertEqual(Post.objects.get(id=other.id).num_views, 1)
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+        self.assertEqual(run_jobs(), 0)
+
+    def test_failed_job_retried_with_backoff(self):
+        calls = []
+
+        def fail(**payload):
+            calls.append(payload)
+            raise ValueError('Failed.')
+
+        now = timezone.now()
+        with patch.dict(jobs._tasks, {'test.fail': Task(
+                'test.fail', fail, max_attempts=2, backoff=10)}):
+            enqueue('test.fail', {'value': 1}, run_at=now)
+
+            self.assertEqual(run_jobs(now=now), 1)
+            job = Job.objects.get()
+            self.assertEqual(job.status, Job.PENDING)
+            self.assertEqual(job.run_at, now + timedelta(seconds=10))
+            self.assertIn('ValueError', job.last_error)
+
+            self.assertEqual(run_jobs(now=now + timedelta(seconds=5)), 0)
+            self.assertEqual(run_jobs(now=now + timedelta(seconds=10)), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(calls, [{'value': 1}, {'value': 1}])
+
+    def test_task_not_registered_failed(self):
+        enqueue('test.missing')
+        run_jobs()
+
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    @override_settings(JOB_SCHEDULES={'core.prune_jobs': 60})
+    def test_periodic_enqueued_once_by_interval(self):
+        now = timezone.now()
+        enqueue_periodic(now)
+        enqueue_periodic(now)
+        enqueue_periodic(now + timedelta(seconds=60))
+
+        self.assertEqual(Job.objects.filter(name='core.prune_jobs').count(), 2)
+
+    def test_release_stale_jobs(self):
+        now = timezone.now()
+        Job.objects.create(name='core.prune_jobs', status=Job.RUNNING,
+                           locked_at=now - timedelta(hours=1))
+        Job.objects.create(name='core.prune_jobs', status=Job.RUNNING, locked_at=now)
+
+        self.assertEqual(release_stale_jobs(now), 1)
+        self.assertEqual(Job.objects.filter(status=Job.PENDING).count(), 1)
+
+    def test_send_activation_email(self):
+        user = UserFactory().create_active_user()
+        user.is_active = False
+        user.save()
+        enqueue('users.send_activation_email', {
+            'user_id': user.id, 'to_email': user.email,
+            'domain': 'testserver', 'protocol': 'http'})
+
+        self.assertEqual(len(mail.outbox), 0)
+        run_jobs()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [user.email])
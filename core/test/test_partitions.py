@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase, override_settings
+
+from core.partitions import (add_months, month_start, partition_name, is_enabled,
+                             default_partition_name)
+
+
+class PartitionsTestCase(SimpleTestCase):
+    def test_months(self):
+        date = datetime(2026, 11, 17, 15, 30, tzinfo=timezone.utc)
+
+        self.assertEqual(month_start(date), datetime(2026, 11, 1, tzinfo=timezone.utc))
+        self.assertEqual(add_months(month_start(date), 2),
+                         datetime(2027, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(partition_name('posts_notification', month_start(date)),
+                         'posts_notification_p202611')
+        self.assertEqual(default_partition_name('posts_notification'),
+                         'posts_notification_default')
+
+    @override_settings(PARTITIONED_TABLES=['posts_notification'])
+    def test_not_enabled_without_postgresql(self):
+        self.assertFalse(is_enabled('posts_notification'))
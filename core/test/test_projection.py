@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from users.models import User
+from users.serializers import ListSimpleUserSerializer, ListProfileUserSerializer
+from users.test.factories import UserFactory
+from posts.models import (
+    Post, PollPost, OptionPollPost, Hashtag, HashtagsPost, UserMention, Likes,
+    Notification
+)
+from posts.serializers import (
+    ListPostSerializer, ListLikedPostSerializer, ListNotificationsSerializer, load_post_polls
+)
+from posts.test.factories import PostFactory
+from posts.utils import prefetch_post_relations
+from core.utils import project
+
+
+EMPTY_VIEWER_STATE = {'liked': set(), 'reposted': set(), 'votes': {}}
+
+
+class ProjectionTestCase(APITestCase, PostFactory):
+    """
+    The serializers must not read a column deferred by `project`, that would
+    make one query for each row rendered.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory().create_active_user()
+        quoted = self.create_post_kwargs(user=self.user, body=self.body())
+        self.post = self.create_post_kwargs(
+            user=self.user, body=self.body(), quote=quoted, have_poll=True)
+
+        poll = PollPost.objects.create(post=self.post)
+        OptionPollPost.objects.create(poll=poll, option=self.option())
+        OptionPollPost.objects.create(poll=poll, option=self.option())
+        hashtag = Hashtag.objects.create(tag='projection')
+        HashtagsPost.objects.create(hashtag=hashtag, post=self.post)
+        UserMention.objects.create(user=self.user, post=self.post)
+
+    def test_project_users(self):
+        for serializer_class in [ListSimpleUserSerializer, ListProfileUserSerializer]:
+            users = list(project(User.objects.all(), serializer_class))
+
+            with self.assertNumQueries(0):
+                serializer_class(users, many=True).data
+
+    def test_project_posts(self):
+        posts = prefetch_post_relations(
+            list(project(Post.objects.all(), ListPostSerializer)))
+        polls = load_post_polls(posts)
+
+        with self.assertNumQueries(0):
+            data = ListPostSerializer(posts, many=True, context={
+                'viewer_state': EMPTY_VIEWER_STATE, 'polls': polls}).data
+
+        self.assertIn('poll', [item for item in data if item['id'] == self.post.id][0])
+
+    def test_project_liked_posts(self):
+        Likes.objects.create(user=self.user, post=self.post)
+        likes = list(project(Likes.objects.all(), ListLikedPostSerializer))
+        prefetch_post_relations([like.post for like in likes])
+        polls = load_post_polls([like.post for like in likes])
+
+        with self.assertNumQueries(0):
+            ListLikedPostSerializer(likes, many=True, context={
+                'viewer_state': EMPTY_VIEWER_STATE, 'polls': polls}).data
+
+    def test_project_notifications(self):
+        Notification.objects.create(
+            sender=self.user, recipient=self.user, notification_type='mention',
+            post=self.post, header=f'{self.user} mention you in a post.')
+        notifications = list(
+            project(Notification.objects.all(), ListNotificationsSerializer))
+        prefetch_post_relations([noti.post for noti in notifications])
+        polls = load_post_polls([noti.post for noti in notifications])
+
+        with self.assertNumQueries(0):
+            data = ListNotificationsSerializer(
+                notifications, many=True, context={'polls': polls}).data
+
+        self.assertEqual(data[0]['message'], self.post.body)
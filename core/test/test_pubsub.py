@@ -0,0 +1,40 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from core.pubsub import Broker, BrokerFull
+
+
+class BrokerTestCase(SimpleTestCase):
+    async def test_deliver_to_channel_subscriptions(self):
+        broker = Broker()
+        subscription = broker.subscribe(['user:1', 'author:a'])
+        other = broker.subscribe(['user:2'])
+
+        broker.deliver('author:a', {'event': 'feed'})
+
+        self.assertEqual(await subscription.get(timeout=1), {'event': 'feed'})
+        with self.assertRaises(asyncio.TimeoutError):
+            await other.get(timeout=0.01)
+
+    async def test_queue_drop_oldest_events(self):
+        broker = Broker(queue_size=2)
+        subscription = broker.subscribe(['user:1'])
+
+        for i in range(3):
+            broker.deliver('user:1', i)
+        await asyncio.sleep(0)
+
+        self.assertEqual(subscription.dropped, 1)
+        self.assertEqual([await subscription.get(), await subscription.get()], [1, 2])
+
+    async def test_max_subscriptions(self):
+        broker = Broker(max_subscriptions=1)
+        subscription = broker.subscribe(['user:1'])
+
+        with self.assertRaises(BrokerFull):
+            broker.subscribe(['user:2'])
+
+        subscription.close()
+        broker.subscribe(['user:2'])
+        self.assertNotIn('user:1', broker.channels)
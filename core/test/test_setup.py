@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from core.cache import clear_local_caches
 from rest_framework.test import APITestCase
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -10,6 +12,8 @@ faker = Faker()
 
 class BaseApiTest(APITestCase):
     def setUp(self):
+        cache.clear()
+        clear_local_caches()
         self.user = self.create_test_user()
 
         self.token = self.get_access_token()
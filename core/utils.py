@@ -1,7 +1,273 @@
+import hashlib
+from base64 import b64decode, b64encode
+from calendar import timegm
+
+from django.conf import settings
+from django.core.files.storage import default_storage, FileSystemStorage
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class GenericPagination(PageNumberPagination):
     page_size = 3
     page_size_query_param = 'page_size'
     max_page_size = 30
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over one or more querysets ("streams") read one after the other.
+
+    Each stream is walked by descending `id`, so every page is an indexed range scan
+    (`id < last_id ... LIMIT page_size`) no matter how deep the client is. The cursor
+    keeps the index of the stream and the last `id` returned.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        """Get the stream and the last `id` of the cursor. Raise `ValueError` if it is not valid."""
+        cursor = request.query_params.get(self.cursor_query_param, None)
+        if cursor is None:
+            return 0, None
+        try:
+            stream, last_id = b64decode(cursor.encode()).decode().split(':')
+            stream, last_id = int(stream), int(last_id) if last_id else None
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError('The cursor is not valid.')
+        if stream < 0:
+            raise ValueError('The cursor is not valid.')
+        return stream, last_id
+
+    def encode_cursor(self, stream, last_id=None):
+        # An empty `last_id` points to the beginning of the stream.
+        last_id = '' if last_id is None else last_id
+        return b64encode(f'{stream}:{last_id}'.encode()).decode()
+
+    def paginate_streams(self, streams, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        stream, last_id = self.decode_cursor(request)
+
+        page = []
+        self.next_cursor = None
+        while stream < len(streams):
+            queryset = streams[stream].order_by('-id')
+            if last_id is not None:
+                queryset = queryset.filter(id__lt=last_id)
+
+            # Ask for one more row to know if the stream has more results.
+            rows = list(queryset[:page_size - len(page) + 1])
+            has_more = len(rows) > page_size - len(page)
+            page += rows[:page_size - len(page)]
+
+            if has_more:
+                self.next_cursor = self.encode_cursor(stream, page[-1].id)
+                break
+
+            stream, last_id = stream + 1, None
+            if len(page) == page_size:
+                if stream < len(streams) and streams[stream].exists():
+                    self.next_cursor = self.encode_cursor(stream)
+                break
+
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data, count):
+        return Response({
+            'count': count,
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+def delete_in_batches(queryset, batch_size, fields=('id',), on_delete=None):
+    """
+    Delete the rows of `queryset` by chunks of `batch_size`, each one in its own
+    short transaction. `on_delete` is called with the `fields` values of each
+    chunk, to update the counters of the related rows.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by('id').values(*fields)[:batch_size])
+            if not rows:
+                break
+            queryset.model.objects.filter(
+                id__in=[row['id'] for row in rows]).delete()
+            if on_delete:
+                on_delete(rows)
+        deleted += len(rows)
+    return deleted
+
+
+def media_url(name):
+    """
+    Get the URL of a file of the default storage from his name. With the file
+    system storage the name is joined to the media prefix, without build a
+    `FieldFile` or call the storage for each file.
+    """
+    if not name:
+        return ''
+    if isinstance(default_storage, FileSystemStorage):
+        return default_storage.base_url + filepath_to_uri(name).lstrip('/')
+    return default_storage.url(name)
+
+
+def get_only_fields(serializer_class, prefix=''):
+    """
+    Get the columns read by a serializer (`only_fields`) and by the serializers
+    of his relations (`only_related`), with the lookup `prefix` of the relation.
+    """
+    fields = [prefix + field for field in serializer_class.only_fields]
+    for name, related_serializer in getattr(serializer_class, 'only_related', {}).items():
+        fields.append(prefix + name)
+        fields += get_only_fields(related_serializer, f'{prefix}{name}__')
+    return fields
+
+
+def get_related_paths(serializer_class, prefix=''):
+    paths = []
+    for name, related_serializer in getattr(serializer_class, 'only_related', {}).items():
+        paths.append(prefix + name)
+        paths += get_related_paths(related_serializer, f'{prefix}{name}__')
+    return paths
+
+
+def project(queryset, serializer_class):
+    """
+    Load only the columns that `serializer_class` renders, joining the relations
+    it renders in the same query.
+    """
+    return queryset.select_related(
+        *get_related_paths(serializer_class)
+    ).only(*get_only_fields(serializer_class))
+
+
+def get_users_table(request):
+    """
+    Get an empty `users` table for the serializers context when the client asks
+    for a normalized response (`?normalize=users`), else None. The users are
+    rendered once in the table and referenced by his handle in the results.
+    """
+    if request.query_params.get('normalize', None) == 'users':
+        return {}
+    return None
+
+
+def get_batch_keys(request, name, cast=str):
+    """
+    Get the keys of a batch request from the comma separated query parameter
+    `name`, without the repeated ones and in their order. Raise `ValueError` if
+    a key is not valid, or if there are none or more than `BATCH_MAX_KEYS`.
+    """
+    keys = [cast(key.strip()) for key in request.query_params.get(name, '').split(',')
+            if key.strip()]
+    keys = list(dict.fromkeys(keys))
+    if not keys or len(keys) > settings.BATCH_MAX_KEYS:
+        raise ValueError(f'Between 1 and {settings.BATCH_MAX_KEYS} {name} are required.')
+    return keys
+
+
+class SparseFieldset:
+    """
+    Fields of a resource asked by the client, as comma separated names:
+
+    - `?fields=`: the fields to render, by default all of them.
+    - `?expand=`: the relations to render (the fields that cost queries), by
+      default all of them, unless `fields` is sent. A relation listed in
+      `fields` is rendered too.
+
+    The serializers drop the fields not asked, and the views use `has_relation`
+    to not load the relations not rendered.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        def parse(param):
+            value = request.query_params.get(param, None)
+            if value is None:
+                return None
+            return {name.strip() for name in value.split(',') if name.strip()}
+        return cls(parse('fields'), parse('expand'))
+
+    @property
+    def is_full(self):
+        return self.fields is None and self.expand is None
+
+    def has_field(self, name):
+        return self.fields is None or name in self.fields
+
+    def has_relation(self, name):
+        if self.is_full:
+            return True
+        return name in (self.fields or ()) or name in (self.expand or ())
+
+    def filter(self, representation, relations):
+        if self.is_full:
+            return representation
+        return {
+            key: value for key, value in representation.items()
+            if (self.has_relation(key) if key in relations else self.has_field(key))
+        }
+
+
+FULL_FIELDSET = SparseFieldset()
+
+
+def get_etag(request, *stamps):
+    """
+    Weak ETag of a response from the version stamps of the rows it renders
+    (`modify_at`, versions, counters), the user and the query string, without
+    build the body. Weak because the views counters are not part of it.
+    """
+    key = repr((request.user.pk, request.GET.urlencode(), stamps))
+    return 'W/"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """
+    Get a `304 Not Modified` response if the `If-None-Match` (or else the
+    `If-Modified-Since`) header of the request match the validators, else None.
+    """
+    response = get_conditional_response(
+        request, etag=etag,
+        last_modified=timegm(last_modified.utctimetuple()) if last_modified else None)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+    # The responses depend on the user.
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -1 +1,183 @@
-from django.shortcuts import render
+"""
+Batch of API requests: `POST /batch/` runs a list of GET sub-requests to the
+routes of the API in the same process, for the clients that open a screen with
+several requests (feed, notifications, profile, hashtags).
+
+The user is authenticated once, and the sub-requests are dispatched to their
+views directly, without the JWT decode, the user query and the middlewares of
+each one. With `BATCH_CONCURRENCY` greater than 1 the sub-requests run at the
+same time, each one in a thread with his own database connection (taken from
+the pool of the worker); else they run one after the other in the thread of the
+request, with his connection.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, JsonResponse, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+
+logger = logging.getLogger(__name__)
+
+# Headers of the responses of the sub-requests sent back to the client.
+BATCH_RESPONSE_HEADERS = ('ETag', 'Last-Modified')
+
+
+def authenticate(request):
+    """Get the `(user, token)` of the JWT of the request, None if it is not valid."""
+    try:
+        return JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def get_sub_requests(request):
+    """
+    Get the sub-requests of the body of a batch, `{"requests": [{"id", "path",
+    "headers"}]}`. Raise `ValueError` if it is not valid.
+    """
+    try:
+        sub_requests = json.loads(request.body)['requests']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('The body must be a JSON object with a list of `requests`.')
+    if not isinstance(sub_requests, list) or not 0 < len(sub_requests) <= settings.BATCH_MAX_REQUESTS:
+        raise ValueError(f'Between 1 and {settings.BATCH_MAX_REQUESTS} requests are required.')
+    for sub_request in sub_requests:
+        if not isinstance(sub_request, dict) or not isinstance(sub_request.get('path', None), str):
+            raise ValueError('Each request must have a `path`.')
+        if sub_request.get('method', 'GET').upper() != 'GET':
+            raise ValueError('Only GET requests can be batched.')
+    return sub_requests
+
+
+def build_sub_request(request, sub_request, auth):
+    """
+    Build the `HttpRequest` of a sub-request from the batch request, with his
+    path, query string and headers, authenticated as the user of the batch.
+    """
+    path, _, query = sub_request['path'].partition('?')
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.path = http_request.path_info = path
+    http_request.META = {
+        **request.META, 'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+        'HTTP_ACCEPT': 'application/json'}
+    for name, value in (sub_request.get('headers', None) or {}).items():
+        http_request.META['HTTP_' + name.upper().replace('-', '_')] = str(value)
+    http_request.GET = QueryDict(query)
+    http_request._get_scheme = request._get_scheme
+    # Read by the DRF `Request`, instead of authenticate the token again.
+    http_request._force_auth_user, http_request._force_auth_token = auth
+    return http_request
+
+
+def run_sub_request(request, sub_request, auth):
+    result = {'id': sub_request.get('id', None)}
+    path = sub_request['path'].partition('?')[0]
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {**result, 'status': status.HTTP_404_NOT_FOUND, 'body': {'detail': 'Not found.'}}
+    # The async views (the streams and the batch itself) are not dispatched.
+    if asyncio.iscoroutinefunction(match.func):
+        return {**result, 'status': status.HTTP_400_BAD_REQUEST,
+                'body': {'detail': 'This path can not be batched.'}}
+
+    http_request = build_sub_request(request, sub_request, auth)
+    http_request.resolver_match = match
+    try:
+        response = match.func(http_request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception('Sub-request to %s failed.', path)
+        return {**result, 'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                'body': {'detail': 'An error occurred.'}}
+
+    result['status'] = response.status_code
+    result['headers'] = {name: response[name]
+                         for name in BATCH_RESPONSE_HEADERS if response.has_header(name)}
+    is_json = response.get('Content-Type', '').startswith('application/json')
+    result['body'] = json.loads(response.content) if response.content and is_json else None
+    return result
+
+
+def run_sub_request_in_thread(request, sub_request, auth):
+    # Like a request of the worker: the connection of the thread is closed if
+    # it is broken or too old, before and after.
+    close_old_connections()
+    try:
+        return run_sub_request(request, sub_request, auth)
+    finally:
+        close_old_connections()
+
+
+async def batch(request):
+    """
+    Run several GET requests to the API in one request.\n
+
+    The user is authenticated once for all the requests, and the requests run at the
+    same time when the API is served by the ASGI application.\n
+
+    ### Request:\n
+    - `requests` (list): Up to `10` requests, each one with:\n
+        - `id` (str, optional): Sent back with the response of the request.\n
+        - `path` (str): Path of the request with his query string, e.g. `/posts/?page=2`.\n
+        - `headers` (object, optional): Headers of the request, e.g. `If-None-Match`.\n
+
+    ### Response (Success):\n
+    - `200 OK`:\n
+        - `responses` (list): The responses in the order of `requests`, each one with:\n
+            - `id` (str): `id` of the request.\n
+            - `status` (int): Status code of the response.\n
+            - `headers` (object): The `ETag` and `Last-Modified` of the response.\n
+            - `body` (object, nullable): Data of the response.\n
+
+    ### Response (Failure):\n
+    - `400 Bad Request`:
+    If the body is not valid, or has a request that is not GET.\n
+    - `401 Unauthorized`:
+    Not authenticated user.\n
+    - `405 Method Not Allowed`:
+    If the method is not POST.\n
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'},
+                            status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    auth = await sync_to_async(authenticate)(request)
+    if auth is None:
+        return JsonResponse({'detail': 'Not authenticated user.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        sub_requests = get_sub_requests(request)
+    except ValueError as error:
+        return JsonResponse({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if settings.BATCH_CONCURRENCY <= 1:
+        run = sync_to_async(run_sub_request)
+        responses = [await run(request, sub_request, auth) for sub_request in sub_requests]
+    else:
+        semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+        run = sync_to_async(run_sub_request_in_thread, thread_sensitive=False)
+
+        async def run_limited(sub_request):
+            async with semaphore:
+                return await run(request, sub_request, auth)
+
+        responses = await asyncio.gather(
+            *(run_limited(sub_request) for sub_request in sub_requests))
+
+    return JsonResponse({'responses': responses})
+
+
+# Authenticated by the JWT of the `Authorization` header, not by the session.
+batch.csrf_exempt = True
@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from .models import (
     Post, PostReply, UserMention, Hashtag, HashtagsPost,
-    OptionPollPost, PollPost, VoteOptionPoll, Notification
+    OptionPollPost, PollPost, VoteOptionPoll, Notification, ArchivedNotification
 )
 # Register your models here.
 admin.site.register(Post)
@@ -14,3 +14,4 @@ admin.site.register(PollPost)
 admin.site.register(VoteOptionPoll)
 admin.site.register(OptionPollPost)
 admin.site.register(Notification)
+admin.site.register(ArchivedNotification)
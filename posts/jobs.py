@@ -0,0 +1,53 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.utils import timezone
+
+from core.jobs import task
+from .models import Post
+from .polls import freeze_polls
+from .utils import publish_due_posts, purge_deleted_posts, prune_notifications
+
+
+@task('posts.add_views', batch_size=500)
+def add_views(payloads):
+    """
+    Add the views of the posts read by the listings and the details, merged so
+    each post is updated once whatever the amount of views it got.
+    """
+    views = Counter(post_id for payload in payloads for post_id in payload['posts'])
+    posts_by_amount = {}
+    for post_id, amount in views.items():
+        posts_by_amount.setdefault(amount, []).append(post_id)
+    # The views are not part of the post version, they are read from the row.
+    for amount, posts_ids in posts_by_amount.items():
+        Post.objects.filter(id__in=posts_ids).update(num_views=F('num_views') + amount)
+
+
+@task('posts.publish_due_posts', max_attempts=1, atomic=False)
+def publish_due_posts_job():
+    publish_due_posts()
+
+
+@task('posts.purge_deleted_posts', max_attempts=1, atomic=False)
+def purge_deleted_posts_job():
+    purge_deleted_posts()
+
+
+@task('posts.freeze_polls', max_attempts=1, atomic=False)
+def freeze_polls_job():
+    freeze_polls()
+
+
+@task('posts.prune_notifications', max_attempts=1, atomic=False)
+def prune_notifications_job():
+    prune_notifications(
+        timezone.now() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS))
+
+
+@task('posts.manage_partitions', max_attempts=1, atomic=False)
+def manage_partitions_job():
+    call_command('manage_partitions', drop_older_than=400)
@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.partitions import (add_months, create_partitions, drop_partitions, is_enabled,
+                             create_default_partition, move_default_rows)
+
+
+class Command(BaseCommand):
+    help = ('Create the monthly partitions of the next months of the partitioned '
+            'tables, and drop the old ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Months of partitions created ahead of time.')
+        parser.add_argument('--drop-older-than', type=int, default=None,
+                            help='Drop the partitions older than these days.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running as a worker.')
+        parser.add_argument('--interval', type=float, default=60 * 60 * 24,
+                            help='Seconds to wait between runs with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            now = timezone.now()
+            for table in settings.PARTITIONED_TABLES:
+                if not is_enabled(table):
+                    continue
+                # The rows inserted while the partitions of their months were
+                # missing are moved out of the DEFAULT partition.
+                create_default_partition(table)
+                created = move_default_rows(table) + create_partitions(
+                    table, now, add_months(now, options['months_ahead']))
+                dropped = []
+                if options['drop_older_than'] is not None:
+                    dropped = drop_partitions(
+                        table, now - timedelta(days=options['drop_older_than']))
+                for name in created:
+                    self.stdout.write(self.style.SUCCESS(f'{name} created.'))
+                for name in dropped:
+                    self.stdout.write(self.style.SUCCESS(f'{name} dropped.'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
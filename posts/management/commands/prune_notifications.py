@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.utils import prune_notifications
+
+
+class Command(BaseCommand):
+    help = 'Archive and delete the read notifications older than the retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.NOTIFICATION_RETENTION_DAYS,
+                            help='Age in days of the read notifications pruned.')
+        parser.add_argument('--no-archive', action='store_true',
+                            help='Delete the notifications without archive them.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows deleted per transaction.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running as a worker.')
+        parser.add_argument('--interval', type=float, default=60 * 60,
+                            help='Seconds to wait between runs with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            pruned = prune_notifications(
+                timezone.now() - timedelta(days=options['days']),
+                batch_size=options['batch_size'],
+                archive=not options['no_archive'])
+            if pruned:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{pruned} notification/s pruned.'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
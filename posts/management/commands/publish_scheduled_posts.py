@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.utils import publish_due_posts
+
+
+class Command(BaseCommand):
+    help = 'Publish the scheduled posts whose date to publish is due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Posts published per transaction.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running as a worker.')
+        parser.add_argument('--interval', type=float, default=10,
+                            help='Seconds to wait between runs with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            published = publish_due_posts(batch_size=options['batch_size'])
+            if published:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{published} post/s published.'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
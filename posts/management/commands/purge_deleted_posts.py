@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.utils import purge_deleted_posts
+
+
+class Command(BaseCommand):
+    help = 'Delete the posts marked as deleted and the rows related to them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows deleted per transaction.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running as a worker.')
+        parser.add_argument('--interval', type=float, default=60,
+                            help='Seconds to wait between runs with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_deleted_posts(batch_size=options['batch_size'])
+            if purged:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{purged} post/s purged.'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.6 on 2026-10-18 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='likes',
+            index=models.Index(fields=['post', '-id'], name='likes_post_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(fields=['post', '-id'], name='repost_post_recent_idx'),
+        ),
+    ]
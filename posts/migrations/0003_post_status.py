@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-18 23:20
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_scheduled_posts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.filter(date_to_publish__gt=timezone.now()).update(
+        status='scheduled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_likes_repost_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('published', 'Published')], default='published', max_length=10, verbose_name='Status'),
+        ),
+        migrations.RunPython(mark_scheduled_posts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['date_to_publish'], name='post_scheduled_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('published', 'Published'), ('hidden', 'Hidden')], default='published', max_length=10, verbose_name='Status'),
+        ),
+    ]
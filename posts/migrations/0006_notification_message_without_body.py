@@ -0,0 +1,20 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def clear_copied_bodies(apps, schema_editor):
+    # The body of the post is read from the post now.
+    Notification = apps.get_model('posts', 'Notification')
+    Notification.objects.filter(
+        post__isnull=False, message=F('post__body')).update(message=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_copied_bodies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-19 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['user', 'date_to_publish', 'id'], name='post_user_published_idx'),
+        ),
+    ]
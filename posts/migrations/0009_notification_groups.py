@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-19 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_user_published_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1, verbose_name='Events'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='group_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='Group key'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='recent_senders',
+            field=models.JSONField(blank=True, default=list, verbose_name='Recent senders'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.6 on 2026-10-19 00:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_notification_groups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('mention', 'Mention'), ('like', 'Like'), ('repost', 'Repost'), ('quote', 'Quote'), ('follow', 'Follow')], max_length=20, verbose_name='Notification Type')),
+                ('post_id', models.IntegerField(blank=True, null=True, verbose_name='Related Post ID')),
+                ('header', models.CharField(max_length=150)),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='Events')),
+                ('create_at', models.DateTimeField(verbose_name='Date of creation')),
+                ('archive_at', models.DateTimeField(auto_now_add=True, verbose_name='Date of archive')),
+            ],
+            options={
+                'verbose_name': 'Archived notification',
+                'verbose_name_plural': 'Archived notifications',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', True)), fields=['create_at', 'id'], name='notification_read_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='recipient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL, verbose_name='Recipient user'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from core.partitions import partition_tables_migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_notification_archive'),
+    ]
+
+    operations = [
+        # Only on PostgreSQL, for the tables in `PARTITIONED_TABLES`.
+        migrations.RunPython(
+            partition_tables_migration('posts_notification', 'posts_archivednotification'),
+            migrations.RunPython.noop),
+    ]
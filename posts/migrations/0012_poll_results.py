@@ -0,0 +1,24 @@
+# Generated by Django 4.2.6 on 2026-10-19 01:05
+
+from django.db import migrations, models
+import posts.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_partition_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='poll_results',
+            field=models.JSONField(blank=True, null=True, verbose_name='Final poll results'),
+        ),
+        migrations.AlterField(
+            model_name='pollpost',
+            name='end_time',
+            field=models.DateTimeField(db_index=True, default=posts.models.PollPost._calc_end_time),
+        ),
+    ]
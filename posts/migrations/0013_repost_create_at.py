@@ -0,0 +1,39 @@
+# Generated by Django 4.2.6 on 2026-10-19 01:34
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+def date_existing_reposts(apps, schema_editor):
+    # The date of a repost was not saved, the publication of the post is the
+    # nearest known before it.
+    Post = apps.get_model('posts', 'Post')
+    Repost = apps.get_model('posts', 'Repost')
+    Repost.objects.filter(create_at__isnull=True).update(create_at=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('date_to_publish')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_poll_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repost',
+            name='create_at',
+            field=models.DateTimeField(null=True, verbose_name='Date of creation'),
+        ),
+        migrations.RunPython(date_existing_reposts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='repost',
+            name='create_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date of creation'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(fields=['user', '-create_at', '-id'], name='repost_user_recent_idx'),
+        ),
+    ]
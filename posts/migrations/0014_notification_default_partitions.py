@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from core.partitions import default_partitions_migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_repost_create_at'),
+    ]
+
+    operations = [
+        # The inserts of the months without partition go to the DEFAULT one.
+        migrations.RunPython(
+            default_partitions_migration('posts_notification', 'posts_archivednotification'),
+            migrations.RunPython.noop),
+    ]
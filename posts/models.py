@@ -13,7 +13,29 @@ def get_post_file_upload_path(self, filename):
     return f'{self.user}/media/{filename}'
 
 
+class PostQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(status=Post.PUBLISHED)
+
+    def scheduled(self):
+        return self.filter(status=Post.SCHEDULED)
+
+    def alive(self):
+        return self.exclude(status=Post.DELETED)
+
+
 class Post(DatesRecordsBaseModel):
+    SCHEDULED = 'scheduled'
+    PUBLISHED = 'published'
+    HIDDEN = 'hidden'
+    DELETED = 'deleted'
+    STATUS_CHOICES = (
+        (SCHEDULED, 'Scheduled'),
+        (PUBLISHED, 'Published'),
+        (HIDDEN, 'Hidden'),
+        (DELETED, 'Deleted'),
+    )
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, to_field='user_handle',
                              related_name=_("post_by"), verbose_name=_("Post by"))
 
@@ -48,6 +70,36 @@ class Post(DatesRecordsBaseModel):
 
     date_to_publish = models.DateTimeField(
         default=timezone.now, verbose_name=_("Date to be publish"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=PUBLISHED, verbose_name=_("Status"))
+    # Bumped when the counters or the content of the post change, to not use
+    # the cached representations of the previous version.
+    version = models.PositiveIntegerField(default=1, verbose_name=_("Version"))
+    # Results of the poll once it ended (see `posts.polls.freeze_polls`), read
+    # with the row to not read the poll tables.
+    poll_results = models.JSONField(
+        null=True, blank=True, verbose_name=_("Final poll results"))
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Only the posts waiting to be published, scanned by the publisher.
+            models.Index(fields=['date_to_publish'], name='post_scheduled_idx',
+                         condition=models.Q(status='scheduled')),
+            # Only the deleted posts waiting to be purged.
+            models.Index(fields=['id'], name='post_deleted_idx',
+                         condition=models.Q(status='deleted')),
+            # The published posts of the followed users after the head of a feed,
+            # and the timeline of a user read backwards.
+            models.Index(fields=['user', 'date_to_publish', 'id'], name='post_user_published_idx',
+                         condition=models.Q(status='published')),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.date_to_publish > timezone.now():
+            self.status = self.SCHEDULED
+        super().save(*args, **kwargs)
 
     def clean(self):
         if self.video and self.gif:
@@ -125,6 +177,9 @@ class Likes(models.Model):
 
     class Meta:
         unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['post', '-id'], name='likes_post_recent_idx'),
+        ]
 
         verbose_name = _('Like')
         verbose_name_plural = _("Likes")
@@ -135,9 +190,16 @@ class Repost(models.Model):
         "repost_by"), verbose_name=_("Like by"))
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name=_(
         "post_reposted"), verbose_name=_("Liked post"))
+    create_at = models.DateTimeField(
+        default=timezone.now, verbose_name=_('Date of creation'))
 
     class Meta:
         unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['post', '-id'], name='repost_post_recent_idx'),
+            # The reposts of a user in his timeline, the newest first.
+            models.Index(fields=['user', '-create_at', '-id'], name='repost_user_recent_idx'),
+        ]
 
         verbose_name = _('Repost')
         verbose_name_plural = _("Reposts")
@@ -154,7 +216,7 @@ class PollPost(models.Model):
     total_votes = models.PositiveBigIntegerField(default=0)
 
     end_time = models.DateTimeField(
-        default=_calc_end_time)
+        default=_calc_end_time, db_index=True)
 
     class Meta:
         verbose_name = _('Poll')
@@ -232,12 +294,51 @@ class Notification(DatesRecordsBaseModel):
     header = models.CharField(max_length=150)
     message = models.TextField(null=True, blank=True, verbose_name='Message')
 
+    # The likes, reposts and follows of a time window are grouped in one
+    # notification, `sender` is the last one and `recent_senders` the handles of
+    # the last ones.
+    group_key = models.CharField(
+        max_length=100, unique=True, null=True, blank=True, verbose_name='Group key')
+    count = models.PositiveIntegerField(default=1, verbose_name='Events')
+    recent_senders = models.JSONField(
+        default=list, blank=True, verbose_name='Recent senders')
+
     is_read = models.BooleanField(default=False, verbose_name='Read')
 
     class Meta:
         ordering = ('-create_at',)
+        indexes = [
+            # Only the read notifications, scanned by the pruning in date order.
+            models.Index(fields=['create_at', 'id'], name='notification_read_idx',
+                         condition=models.Q(is_read=True)),
+        ]
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
 
     def __str__(self):
         return self.header
+
+
+class ArchivedNotification(models.Model):
+    """
+    Read notification moved out of `Notification` by the retention pruning. Only
+    what is needed to show it again, without the relations to the post and the
+    sender, that can be deleted after.
+    """
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE,
+                                  related_name='archived_notifications', verbose_name=_('Recipient user'))
+    notification_type = models.CharField(
+        max_length=20, choices=Notification.NOTIFICATION_TYPES, verbose_name='Notification Type')
+    post_id = models.IntegerField(null=True, blank=True, verbose_name='Related Post ID')
+    header = models.CharField(max_length=150)
+    count = models.PositiveIntegerField(default=1, verbose_name='Events')
+    create_at = models.DateTimeField(verbose_name=_('Date of creation'))
+    archive_at = models.DateTimeField(
+        auto_now_add=True, verbose_name=_('Date of archive'))
+
+    class Meta:
+        verbose_name = 'Archived notification'
+        verbose_name_plural = 'Archived notifications'
+
+    def __str__(self):
+        return self.header
@@ -0,0 +1,148 @@
+"""
+Votes and results of the polls.
+
+A vote is a single insert checked by the unique (`user`, `poll`) of
+`VoteOptionPoll`, with the counters of the poll and the option updated in the
+same transaction. The results of a live poll are cached by post and written
+through by each vote once committed, so the posts render their poll without
+reading the poll tables. Once a poll ends the job `posts.freeze_polls` copies
+his results to `Post.poll_results`, read with the post row.
+
+The results are compact: `{'id', 'total_votes', 'end_time', 'options'}` with the
+options as `[id, option, votes]`, and `render_poll` gives the representation of
+the API.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+
+from .models import Post, PollPost, OptionPollPost, VoteOptionPoll
+
+
+POLL_RESULTS_CACHE_KEY = 'posts:poll-results:{}'
+
+
+class AlreadyVoted(Exception):
+    pass
+
+
+def get_poll_option(post, poll_id, option_id=None, option=None):
+    """
+    Get with one query the option of the poll of `post`, by his ID or else by
+    his text, with his poll. None if it does not exist.
+    """
+    options = OptionPollPost.objects.select_related('poll').filter(
+        poll_id=poll_id, poll__post=post)
+    if option_id is not None:
+        return options.filter(id=option_id).first()
+    return options.filter(option=option).first()
+
+
+def read_poll_results(posts_ids):
+    """Read the results of the polls of the posts with one query."""
+    rows = OptionPollPost.objects.filter(poll__post__in=posts_ids).order_by('id').values_list(
+        'poll__post_id', 'poll_id', 'poll__total_votes', 'poll__end_time',
+        'id', 'option', 'votes')
+    results = {}
+    for post_id, poll_id, total_votes, end_time, option_id, option, votes in rows:
+        poll = results.setdefault(post_id, {
+            'id': poll_id,
+            'total_votes': total_votes,
+            'end_time': DateTimeField().to_representation(end_time),
+            'options': [],
+        })
+        poll['options'].append([option_id, option, votes])
+    return results
+
+
+def cache_poll_results(results, timeout=None):
+    cache.set_many(
+        {POLL_RESULTS_CACHE_KEY.format(post_id): poll for post_id, poll in results.items()},
+        timeout or settings.POLL_RESULTS_TIMEOUT)
+
+
+def load_poll_results(posts_ids):
+    """
+    Get the results of the live polls of the posts (Post ID -> results) from
+    the cache, reading the missing ones with one query. The posts without poll
+    get empty results, cached too.
+    """
+    keys = {post_id: POLL_RESULTS_CACHE_KEY.format(post_id) for post_id in set(posts_ids)}
+    if not keys:
+        return {}
+    cached = cache.get_many(list(keys.values()))
+    results = {post_id: cached[key] for post_id, key in keys.items() if key in cached}
+
+    missing = [post_id for post_id in keys if post_id not in results]
+    if missing:
+        loaded = read_poll_results(missing)
+        loaded = {post_id: loaded.get(post_id, {}) for post_id in missing}
+        cache_poll_results(loaded)
+        results.update(loaded)
+    return results
+
+
+def render_poll(results):
+    poll = {
+        'id': results['id'],
+        'total_votes': results['total_votes'],
+        'end_time': results['end_time'],
+    }
+    for i, (option_id, option, votes) in enumerate(results['options']):
+        poll[f'option{i + 1}'] = {'id': option_id, 'option': option, 'votes': votes}
+    return poll
+
+
+def vote(user, option):
+    """
+    Record the vote of `user` for `option` (with his poll loaded) and add it to
+    the counters. Raise `AlreadyVoted` if the user voted in the poll. Return the
+    vote and the results of the poll, written to the cache once committed.
+    """
+    post_id = option.poll.post_id
+    try:
+        with transaction.atomic():
+            vote = VoteOptionPoll.objects.create(
+                user=user, poll_id=option.poll_id, option=option)
+            # The poll first: his row lock orders the votes of the same poll,
+            # so the results read below include the votes committed before.
+            PollPost.objects.filter(id=option.poll_id).update(
+                total_votes=F('total_votes') + 1)
+            OptionPollPost.objects.filter(id=option.id).update(votes=F('votes') + 1)
+            # The results are not part of the post version (the cached
+            # representations read them from here), only of his validators.
+            Post.objects.filter(id=post_id).update(modify_at=timezone.now())
+
+            results = read_poll_results([post_id])
+            transaction.on_commit(lambda: cache_poll_results(results))
+    except IntegrityError:
+        raise AlreadyVoted()
+    return vote, results.get(post_id)
+
+
+def freeze_polls(now=None, batch_size=500):
+    """
+    Copy the results of the ended polls to their posts, and cache them for
+    longer. The polls are frozen `POLL_FREEZE_DELAY` seconds after they end, to
+    include the votes accepted just before. Return the amount of polls frozen.
+    """
+    ended = (now or timezone.now()) - timedelta(seconds=settings.POLL_FREEZE_DELAY)
+    frozen = 0
+    while True:
+        posts_ids = list(PollPost.objects.filter(
+            end_time__lte=ended, post__poll_results__isnull=True
+        ).values_list('post_id', flat=True)[:batch_size])
+        if not posts_ids:
+            return frozen
+
+        results = read_poll_results(posts_ids)
+        Post.objects.bulk_update(
+            [Post(id=post_id, poll_results=results.get(post_id, {}))
+             for post_id in posts_ids], ['poll_results'])
+        cache_poll_results(results, settings.POLL_FROZEN_RESULTS_TIMEOUT)
+        frozen += len(posts_ids)
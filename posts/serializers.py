@@ -1,14 +1,26 @@
+from django.db.models import Prefetch, prefetch_related_objects
 from django.utils import timezone
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from core.cache import TieredCache
+from core.utils import project, FULL_FIELDSET
+from users.models import User
 from users.serializers import ListSimpleUserSerializer
 
 from .models import (
     Post, PostReply, OptionPollPost, PollPost, Likes, Repost, Hashtag,
-    HashtagsPost, UserMention, VoteOptionPoll, Notification,
+    HashtagsPost, UserMention, Notification,
 )
+from .polls import load_poll_results, render_poll, get_poll_option, vote, AlreadyVoted
+from .utils import get_viewer_state, update_post_counters, prefetch_post_relations
+
+
+# Representations of the posts without the author and the fields of the viewer,
+# by id and version. The hashtags uses, the mentioned users and the quote can be
+# until `timeout` seconds old.
+post_fragments = TieredCache('post-fragment', timeout=60 * 5, max_size=2000)
 
 
 class ListPollPostSerializer(serializers.ModelSerializer):
@@ -94,16 +106,16 @@ class CreatePostSerializer(serializers.ModelSerializer):
 
         if parent:
             PostReply.objects.create(parent=parent, reply=post)
-            parent.num_replies += 1
-            parent.save()
+            update_post_counters(parent.id, num_replies=1)
 
+        # The notification of a scheduled post is sent when it is published.
+        if parent and post.status == Post.PUBLISHED:
             Notification.objects.create(
                 sender=post.user,
                 recipient=parent.user,
                 notification_type='reply',
                 post=post,
                 header=f'{post.user} reply your post.',
-                message=post.body,
             )
 
         if opt1 and opt2:
@@ -125,6 +137,15 @@ class CreatePostSerializer(serializers.ModelSerializer):
 
 
 class BaseListPostSerializer(serializers.ModelSerializer):
+    # Fields that load other rows, rendered only when the `post_fields` of the
+    # context (a `core.utils.SparseFieldset`) expand them.
+    relation_fields = ['poll', 'hashtags', 'users-mention']
+    # Columns read by the serializer, to load them with `core.utils.project`.
+    only_fields = [
+        'user', 'body', 'have_media', 'have_poll', 'video', 'img1', 'img2', 'img3',
+        'img4', 'gif', 'quote', 'date_to_publish', 'num_replies', 'num_repost',
+        'num_likes', 'num_views', 'version', 'poll_results'
+    ]
 
     class Meta:
         model = Post
@@ -134,7 +155,11 @@ class BaseListPostSerializer(serializers.ModelSerializer):
             'num_views'
         ]
 
+    def get_fieldset(self):
+        return self.context.get('post_fields', FULL_FIELDSET)
+
     def to_representation(self, instance):
+        fieldset = self.get_fieldset()
         representation = super().to_representation(instance)
         representation['id'] = instance.id
 
@@ -156,28 +181,16 @@ class BaseListPostSerializer(serializers.ModelSerializer):
             elif instance.gif:
                 representation['media']['gif'] = instance.gif.url
 
-        elif instance.have_poll:
-
-            try:
-                poll = PollPost.objects.get(post=instance)
-                options = poll.options.all()
-                representation['poll'] = {
-                    'id': poll.id,
-                    'total_votes': poll.total_votes,
-                    'end_time': poll.end_time,
-                }
-                for i in range(len(options)):
-                    representation['poll'][f'option{str(i+1)}'] = {
-                        'option': options[i].option,
-                        'votes': options[i].votes
-                    }
-
-            except:
-                pass
+        elif instance.have_poll and fieldset.has_relation('poll'):
+            results = self.get_poll_results(instance)
+            if results:
+                representation['poll'] = render_poll(results)
 
-        hashtags = HashtagsPost.objects.select_related(
-            'hashtag').filter(post=instance.id)
-        if hashtags.exists():
+        # Read the relations from the related managers, to use the rows loaded
+        # by `prefetch_post_relations` when the view prefetch them.
+        hashtags = instance.hashtagspost_set.all() if fieldset.has_relation(
+            'hashtags') else None
+        if hashtags:
             representation['hashtags'] = []
             for tag in hashtags:
                 representation['hashtags'].append(
@@ -187,13 +200,13 @@ class BaseListPostSerializer(serializers.ModelSerializer):
                     }
                 )
 
-        users_mentions = UserMention.objects.select_related(
-            'user').filter(post=instance.id)
-        if users_mentions.exists():
+        users_mentions = instance.usermention_set.all() if fieldset.has_relation(
+            'users-mention') else None
+        if users_mentions:
             representation['users-mention'] = []
             for mention in users_mentions:
                 representation['users-mention'].append(
-                    ListSimpleUserSerializer(mention.user).data)
+                    ListSimpleUserSerializer(context=self.context).to_representation(mention.user))
 
         representation.pop('video')
         representation.pop('img1')
@@ -202,11 +215,25 @@ class BaseListPostSerializer(serializers.ModelSerializer):
         representation.pop('img4')
         representation.pop('gif')
 
-        return representation
+        return fieldset.filter(representation, self.relation_fields)
+
+    def get_poll_results(self, instance):
+        """
+        Get the results of the poll of the post: from the row once the poll
+        ended, else from `polls` in the context (loaded by `load_post_polls`),
+        else from the cache.
+        """
+        if 'poll_results' not in instance.get_deferred_fields() and instance.poll_results:
+            return instance.poll_results
+        polls = self.context.get('polls', {})
+        if instance.id not in polls:
+            polls = load_poll_results([instance.id])
+        return polls.get(instance.id, None)
 
 
 class ListPostNoQuoteSerializer(BaseListPostSerializer):
     user = ListSimpleUserSerializer(read_only=True)
+    only_related = {'user': ListSimpleUserSerializer}
 
     class Meta:
         model = Post
@@ -217,20 +244,139 @@ class ListPostNoQuoteSerializer(BaseListPostSerializer):
 class ListPostSerializer(BaseListPostSerializer):
     user = ListSimpleUserSerializer(read_only=True)
     quote = serializers.SerializerMethodField()
+    only_related = {'user': ListSimpleUserSerializer}
+    relation_fields = BaseListPostSerializer.relation_fields + ['quote']
+    viewer_fields = ['liked_by_me', 'reposted_by_me', 'my_poll_vote']
 
     class Meta:
         model = Post
         fields = BaseListPostSerializer.Meta.fields + ['user']
 
     def get_quote(self, instance):
-        if instance.quote:
-            return ListPostNoQuoteSerializer(instance.quote).data
+        # The quoted post deleted or hidden is not shown, only his absence.
+        if (self.get_fieldset().has_relation('quote') and instance.quote
+                and instance.quote.status == Post.PUBLISHED):
+            return ListPostNoQuoteSerializer(instance.quote, context=self.context).data
         return None
 
+    def get_viewer_state(self, instance):
+        """
+        Get the viewer state computed for the whole page (`viewer_state` in the context),
+        or compute it only for this post if the view not send it.
+        """
+        viewer_state = self.context.get('viewer_state', None)
+        if viewer_state is None:
+            request = self.context.get('request', None)
+            if request is None:
+                return None
+            viewer_state = get_viewer_state(request.user, [instance.id])
+        return viewer_state
+
+    def to_representation(self, instance):
+        fieldset = self.get_fieldset()
+        fragment = self.context.get('fragments', {}).get(instance.id, None)
+        if fragment is None:
+            representation = super().to_representation(instance)
+        else:
+            # Only the author and the views are read from the row.
+            representation = dict(fragment)
+            users = self.context.get('users', None)
+            if users is not None:
+                normalize_fragment_users(representation, users)
+            if fieldset.has_field('user'):
+                representation['user'] = ListSimpleUserSerializer(
+                    context=self.context).to_representation(instance.user)
+            representation['num_views'] = instance.num_views
+            # The results of the polls are not part of the fragments version.
+            polls = self.context.get('polls', {})
+            if 'poll' in representation and polls.get(instance.id, None):
+                representation['poll'] = render_poll(polls[instance.id])
+            quote = representation.get('quote', None)
+            if quote and 'poll' in quote and polls.get(instance.quote_id, None):
+                representation['quote'] = {
+                    **quote, 'poll': render_poll(polls[instance.quote_id])}
+
+        viewer_state = None
+        if any(fieldset.has_field(field) for field in self.viewer_fields):
+            viewer_state = self.get_viewer_state(instance)
+        if viewer_state is not None:
+            representation['liked_by_me'] = instance.id in viewer_state['liked']
+            representation['reposted_by_me'] = instance.id in viewer_state['reposted']
+            representation['my_poll_vote'] = viewer_state['votes'].get(
+                instance.id, None)
+
+        return fieldset.filter(representation, self.relation_fields)
+
+
+def normalize_fragment_users(representation, users):
+    """
+    Move the users of a copy of a cached fragment (the mentions, and the author
+    and mentions of the quote) to the `users` table, leaving their handle. The
+    nested values are copied, the fragment is shared with the cache.
+    """
+    if representation.get('users-mention', None):
+        mentions = []
+        for user in representation['users-mention']:
+            users.setdefault(user['user_handle'], user)
+            mentions.append(user['user_handle'])
+        representation['users-mention'] = mentions
+
+    if representation.get('quote', None):
+        quote = representation['quote'] = dict(representation['quote'])
+        if 'user' in quote:
+            users.setdefault(quote['user']['user_handle'], quote['user'])
+            quote['user'] = quote['user']['user_handle']
+        normalize_fragment_users(quote, users)
+
+
+def load_post_polls(posts, fieldset=FULL_FIELDSET):
+    """
+    Get the results of the live polls of a list of posts and of their quotes
+    (`polls` in the context of the list serializers) with one round-trip to the
+    cache. The results of the ended polls are read from the rows.
+    """
+    if not fieldset.has_relation('poll'):
+        return {}
+    posts_ids = [post.id for post in posts if post.have_poll and not post.poll_results]
+    if fieldset.has_relation('quote'):
+        posts_ids += [post.quote_id for post in posts if post.quote_id is not None]
+    return load_poll_results(posts_ids)
+
+
+def load_post_fragments(posts, fieldset=FULL_FIELDSET, polls=None):
+    """
+    Get the cached representations of a list of posts (`fragments` in the context
+    of `ListPostSerializer`) with one round-trip to the cache, rendering and
+    caching the missing ones. The relations are prefetched only for the posts
+    not found, and only the relations of `fieldset`: the partial representations
+    are not cached. `polls` are the results from `load_post_polls`.
+    """
+    keys = {post.id: f'{post.id}:{post.version}' for post in posts}
+    cached = post_fragments.get_many(list(keys.values()))
+    fragments = {post_id: cached[key]
+                 for post_id, key in keys.items() if key in cached}
+
+    missing = [post for post in posts if post.id not in fragments]
+    prefetch_post_relations(missing, fieldset)
+    rendered = {}
+    for post in missing:
+        fragment = dict(ListPostSerializer(
+            post, context={'post_fields': fieldset, 'polls': polls or {}}).data)
+        fragment.pop('user', None)
+        fragments[post.id] = rendered[keys[post.id]] = fragment
+    if fieldset.is_full:
+        post_fragments.set_many(rendered)
+
+    prefetch_related_objects(list(posts), Prefetch(
+        'user', queryset=project(User.objects.all(), ListSimpleUserSerializer)))
+    return fragments
+
 
 class ListLikedPostSerializer(serializers.ModelSerializer):
     post = ListPostSerializer(read_only=True)
     user = ListSimpleUserSerializer(read_only=True)
+    only_fields = []
+    only_related = {'user': ListSimpleUserSerializer, 'post': ListPostSerializer}
 
     class Meta:
         model = Likes
@@ -248,6 +394,9 @@ class ListLikedPostSerializer(serializers.ModelSerializer):
 class ListRepostPostSerializer(serializers.ModelSerializer):
     post = ListPostSerializer(read_only=True)
     user = ListSimpleUserSerializer(read_only=True)
+    # Not rendered, read to merge the reposts by date in the user timeline.
+    only_fields = ['create_at']
+    only_related = {'user': ListSimpleUserSerializer, 'post': ListPostSerializer}
 
     class Meta:
         model = Repost
@@ -275,58 +424,43 @@ class ListPostRepliesSerializer(serializers.ModelSerializer):
         fields = ['post', 'replies']
 
 
-class CreateVoteOptionPollSerializer(serializers.ModelSerializer):
-    option = serializers.CharField(max_length=25)
-
-    class Meta:
-        model = VoteOptionPoll
-        fields = ['poll', 'option']
+class CreateVoteOptionPollSerializer(serializers.Serializer):
+    poll = serializers.IntegerField()
+    option_id = serializers.IntegerField(required=False)
+    option = serializers.CharField(max_length=25, required=False)
 
     def to_internal_value(self, data):
-        new_data = data.copy()
-        if 'option' in data:
-            option_name = new_data['option']
-
-            try:
-                poll = PollPost.objects.get(id=new_data['poll'])
-                option = OptionPollPost.objects.get(
-                    poll=poll, option=option_name)
-                new_data['option'] = option.option
-
-            except PollPost.DoesNotExist:
-                raise serializers.ValidationError(
-                    {'poll': "Poll not found."})
-            except OptionPollPost.DoesNotExist:
-                raise serializers.ValidationError(
-                    {'option': "Option not found."})
+        validated_data = super().to_internal_value(data)
+        if 'option_id' not in validated_data and 'option' not in validated_data:
+            raise serializers.ValidationError(
+                {'option_id': "This field is required."})
+
+        # The option by his ID, the text is kept for the old clients.
+        option = get_poll_option(
+            self.context.get('post'), validated_data['poll'],
+            option_id=validated_data.get('option_id', None),
+            option=validated_data.get('option', None))
+        if option is None:
+            raise serializers.ValidationError(
+                {'option': "Option not found."})
 
-        return super().to_internal_value(new_data)
+        validated_data['option'] = option
+        return validated_data
 
     def validate(self, data):
-        user = self.context.get('user')
-        poll = data['poll']
-        opt_to_vote = self.Meta.model.objects.filter(
-            user=user, poll=poll)
-        if opt_to_vote.exists():
-            raise serializers.ValidationError(
-                {"detail": "You have already voted on an option of this poll."})
-
-        if poll.end_time < timezone.now():
+        if data['option'].poll.end_time < timezone.now():
             raise serializers.ValidationError(
                 {"poll": "Voting for this poll has ended."})
 
         return super().validate(data)
 
     def create(self, validated_data):
-
-        user = self.context.get('user')
-        return self.Meta.model.objects.create(
-            user=user,
-            poll=validated_data['poll'],
-            option=OptionPollPost.objects.get(
-                poll=validated_data['poll'],
-                option=validated_data['option'])
-        )
+        try:
+            vote_option, _ = vote(self.context.get('user'), validated_data['option'])
+        except AlreadyVoted:
+            raise serializers.ValidationError(
+                {"detail": ["You have already voted on an option of this poll."]})
+        return vote_option
 
 
 class ListHashtagsSerializer(serializers.ModelSerializer):
@@ -344,10 +478,46 @@ class ListHashtagsSerializer(serializers.ModelSerializer):
 class ListNotificationsSerializer(serializers.ModelSerializer):
     sender = ListSimpleUserSerializer(read_only=True)
     post = ListPostNotificationSerializer(read_only=True)
+    recent_senders = serializers.SerializerMethodField()
+    only_fields = ['notification_type', 'header',
+                   'message', 'count', 'recent_senders', 'is_read', 'create_at']
+    only_related = {'sender': ListSimpleUserSerializer,
+                    'post': ListPostNotificationSerializer}
+    relation_fields = ['sender', 'post', 'recent_senders']
 
     class Meta:
         model = Notification
-        exclude = ['recipient', 'modify_at', 'id']
+        exclude = ['recipient', 'modify_at', 'id', 'group_key']
+
+    def get_fieldset(self):
+        # The fields of the notification are in `notification_fields`, the ones
+        # of his post in `post_fields`.
+        return self.context.get('notification_fields', FULL_FIELDSET)
+
+    def get_fields(self):
+        # Not render the relations not asked, his rows are not loaded.
+        fields = super().get_fields()
+        for name in self.relation_fields:
+            if not self.get_fieldset().has_relation(name):
+                fields.pop(name)
+        return fields
+
+    def get_recent_senders(self, instance):
+        # The users of all the notifications are loaded at once by the view
+        # (`senders`), without them only the handles are rendered.
+        senders = self.context.get('senders', None)
+        if senders is None:
+            return instance.recent_senders
+        serializer = ListSimpleUserSerializer(context=self.context)
+        return [serializer.to_representation(senders[handle])
+                for handle in instance.recent_senders if handle in senders]
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        # The notifications of a post not copy his body, read it from the post.
+        if representation['message'] is None and instance.post is not None:
+            representation['message'] = instance.post.body
+        return self.get_fieldset().filter(representation, self.relation_fields)
 
 
 class DummySerializer(serializers.Serializer):
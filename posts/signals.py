@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Post, Notification
+from .utils import publish_notification_events, publish_feed_events
+
+
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created, **kwargs):
+    if created:
+        publish_notification_events([instance])
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    # The scheduled posts are pushed by `publish_due_posts` when published.
+    if created and instance.status == Post.PUBLISHED:
+        publish_feed_events([instance])
@@ -6,6 +6,8 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from core.test.test_setup import BaseApiTest
+from users.models import Follower
+from users.test.factories import UserFactory
 from .factories import PostFactory
 from ..models import Likes
 
@@ -73,9 +75,9 @@ class AuthLikesSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(len(response.data) > 0)
-        self.assertIsInstance(response.data, list)
-        self.assertIn('username', response.data[0])
+        self.assertTrue(len(response.data['results']) > 0)
+        self.assertIsInstance(response.data['results'], list)
+        self.assertIn('username', response.data['results'][0])
 
     def test_list_like_in_own_post(self):
         post = self.create_post_kwargs(
@@ -88,9 +90,9 @@ class AuthLikesSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(len(response.data) > 0)
-        self.assertIsInstance(response.data, list)
-        self.assertIn('username', response.data[0])
+        self.assertTrue(len(response.data['results']) > 0)
+        self.assertIsInstance(response.data['results'], list)
+        self.assertIn('username', response.data['results'][0])
 
     def test_delete_like_in_random_post(self):
         post = self.create_post()
@@ -126,6 +128,60 @@ class AuthLikesSuccessfulTestCase(BaseApiTest, PostFactory):
         self.assertFalse(Likes.objects.filter(
             post=post, user=self.user).exists())
 
+    def test_list_like_paginated_by_cursor(self):
+        post = self.create_post_kwargs(
+            user=self.user,
+            body=self.body(),
+            num_likes=5
+        )
+        users = [UserFactory().create_active_user() for _ in range(5)]
+        for user in users:
+            Likes.objects.create(post=post, user=user)
+        url = reverse('likes-post', kwargs={'pk': post.id})
+
+        response = self.client.get(url, {'page_size': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(
+            [user['user_handle'] for user in response.data['results']],
+            [user.user_handle for user in users[::-1][:3]]
+        )
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual(
+            [user['user_handle'] for user in response.data['results']],
+            [user.user_handle for user in users[::-1][3:]]
+        )
+        self.assertIsNone(response.data['next'])
+
+    def test_list_like_followed_first(self):
+        post = self.create_post_kwargs(
+            user=self.user,
+            body=self.body(),
+            num_likes=3
+        )
+        followed = UserFactory().create_active_user()
+        Follower.objects.create(follower=self.user, following=followed)
+        Likes.objects.create(post=post, user=followed)
+        others = [UserFactory().create_active_user() for _ in range(2)]
+        for user in others:
+            Likes.objects.create(post=post, user=user)
+        url = reverse('likes-post', kwargs={'pk': post.id})
+
+        response = self.client.get(
+            url, {'followed_first': 'true', 'page_size': 1})
+
+        self.assertEqual(
+            response.data['results'][0]['user_handle'], followed.user_handle)
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual(
+            response.data['results'][0]['user_handle'], others[1].user_handle)
+
 
 class AuthLikesFailTestCase(BaseApiTest, PostFactory):
     def test_create_like_in_post_nonexistent(self):
@@ -140,6 +196,13 @@ class AuthLikesFailTestCase(BaseApiTest, PostFactory):
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_list_like_not_valid_cursor(self):
+        post = self.create_post()
+        url = reverse('likes-post', kwargs={'pk': post.id})
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_delete_like_in_post_nonexistent(self):
         url = reverse('likes-post', kwargs={'pk': 230984})
         response = self.client.delete(url)
@@ -1,19 +1,32 @@
 import pdb
 import datetime
+from unittest.mock import patch
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from core.cache import clear_local_caches
+from core.jobs import run_jobs
+from core.pubsub import broker
 from core.test.test_setup import BaseApiTest
-from users.models import User, Follower
+from users.models import User, Follower, Block
+from users.test.factories import UserFactory
 from .factories import PostFactory
 from ..models import (
     Post, PostReply, Hashtag, HashtagsPost, UserMention,
-    PollPost, OptionPollPost, Likes, Repost
+    PollPost, OptionPollPost, Likes, Repost, VoteOptionPoll, Notification,
+    ArchivedNotification
 )
+from ..utils import (get_viewer_state, publish_due_posts, purge_deleted_posts,
+                     update_post_counters, notify_grouped, prune_notifications,
+                     get_thread_nodes)
 
 
 class NoAuthPostTestCase(APITestCase, PostFactory):
@@ -1045,6 +1058,7 @@ class AuthPostDeleteSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        purge_deleted_posts()
         self.assertFalse(Post.objects.filter(id=post.id).exists())
 
     def test_delete_post_and_replies(self):
@@ -1063,6 +1077,7 @@ class AuthPostDeleteSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        purge_deleted_posts()
         self.assertFalse(Post.objects.filter(id=post.id).exists())
         self.assertFalse(PostReply.objects.filter(parent=post).exists())
 
@@ -1083,9 +1098,37 @@ class AuthPostDeleteSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        purge_deleted_posts()
         self.assertFalse(Post.objects.filter(id=post.id).exists())
         self.assertIsNone(Post.objects.filter(id=quote.id).first().quote)
 
+    def test_delete_post_hide_it_in_quotes(self):
+        post = self.create_post_kwargs(user=self.user, body=self.body())
+        quote = self.create_post()
+        Post.objects.filter(id=quote.id).update(quote=post)
+        url = reverse('post-batch')
+        response = self.client.get(url, {'ids': quote.id})
+        self.assertEqual(response.data['results'][0]['quote']['id'], post.id)
+
+        self.client.delete(reverse('post-detail', kwargs={'pk': post.id}))
+        response = self.client.get(url, {'ids': quote.id})
+
+        self.assertIsNone(response.data['results'][0]['quote'])
+
+    def test_delete_reply_hide_it_in_parent(self):
+        parent = self.create_post()
+        reply = self.create_post_kwargs(user=self.user, body=self.body())
+        PostReply.objects.create(parent=parent, reply=reply)
+        url = reverse('post-detail', kwargs={'pk': parent.id})
+        response = self.client.get(url)
+        self.assertEqual([post['id'] for post in response.data['replies']], [reply.id])
+
+        self.client.delete(reverse('post-detail', kwargs={'pk': reply.id}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['replies'], [])
+
     def test_delete_post_with_poll(self):
         post = self.create_post_kwargs(
             user=self.user,
@@ -1105,9 +1148,53 @@ class AuthPostDeleteSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        purge_deleted_posts()
         self.assertFalse(PollPost.objects.filter(post=post).exists())
         self.assertFalse(OptionPollPost.objects.filter(poll=poll).exists())
 
+    def test_delete_post_hide_it_before_purge(self):
+        post = self.create_post_kwargs(
+            user=self.user,
+            body=self.body()
+        )
+
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        response = self.client.delete(url)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Post.objects.get(id=post.id).status, Post.DELETED)
+
+        url = reverse('post-thread', kwargs={'pk': post.id})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_deleted_post_update_counters(self):
+        parent = self.create_post_kwargs(
+            user=self.user,
+            body=self.body(),
+            num_replies=1
+        )
+        post = self.create_post_kwargs(
+            user=self.user,
+            body=self.body(),
+        )
+        PostReply.objects.create(parent=parent, reply=post)
+        hashtag = Hashtag.objects.create(tag='purge', amount_use=2)
+        HashtagsPost.objects.create(hashtag=hashtag, post=post)
+        HashtagsPost.objects.create(hashtag=hashtag, post=parent)
+        Likes.objects.create(user=self.user, post=post)
+
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        self.client.delete(url)
+
+        self.assertEqual(purge_deleted_posts(batch_size=1), 1)
+
+        self.assertFalse(Post.objects.filter(id=post.id).exists())
+        self.assertFalse(Likes.objects.filter(post=post.id).exists())
+        self.assertEqual(Post.objects.get(id=parent.id).num_replies, 0)
+        self.assertEqual(Hashtag.objects.get(tag='purge').amount_use, 1)
+
 
 class AuthPostDeleteFailTestCase(BaseApiTest, PostFactory):
     def test_fail_delete_post_other_owner(self):
@@ -1123,3 +1210,879 @@ class AuthPostDeleteFailTestCase(BaseApiTest, PostFactory):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AuthPostViewerStateTestCase(BaseApiTest, PostFactory):
+    def test_list_posts_viewer_state(self):
+        post, user = self.create_post_and_user()
+        post_liked = self.create_post_kwargs(user=user, body=self.body())
+
+        Follower.objects.create(follower=self.user, following=user)
+        Likes.objects.create(post=post_liked, user=self.user)
+        Repost.objects.create(post=post, user=self.user)
+
+        url = reverse('post-list')
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {item['id']: item for item in response.data['results']}
+
+        self.assertTrue(results[post_liked.id]['liked_by_me'])
+        self.assertFalse(results[post_liked.id]['reposted_by_me'])
+        self.assertFalse(results[post.id]['liked_by_me'])
+        self.assertTrue(results[post.id]['reposted_by_me'])
+        self.assertIsNone(results[post.id]['my_poll_vote'])
+
+    def test_retrieve_post_viewer_state_poll_vote(self):
+        post = self.create_post_kwargs(
+            user=self.user,
+            body=self.body(),
+            have_poll=True,
+        )
+        poll = PollPost.objects.create(post=post)
+        option = OptionPollPost.objects.create(poll=poll, option=self.option())
+        OptionPollPost.objects.create(poll=poll, option=self.option())
+        VoteOptionPoll.objects.create(user=self.user, poll=poll, option=option)
+
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['post']['my_poll_vote'],
+            {'id': option.id, 'option': option.option}
+        )
+
+    def test_viewer_state_queries_not_depend_on_posts_amount(self):
+        posts = [self.create_post() for _ in range(5)]
+        for post in posts:
+            Likes.objects.create(post=post, user=self.user)
+
+        with self.assertNumQueries(3):
+            viewer_state = get_viewer_state(
+                self.user, [post.id for post in posts])
+
+        self.assertEqual(viewer_state['liked'], set(post.id for post in posts))
+
+
+class AuthPostThreadTestCase(BaseApiTest, PostFactory):
+    def create_reply(self, parent, user=None):
+        reply = self.create_post_kwargs(
+            user=user or self.user, body=self.body())
+        PostReply.objects.create(parent=parent, reply=reply)
+        parent.num_replies += 1
+        parent.save()
+        return reply
+
+    def test_thread_post(self):
+        root = self.create_post()
+        reply = self.create_reply(root)
+        reply_of_reply = self.create_reply(reply)
+
+        url = reverse('post-thread', kwargs={'pk': root.id})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(
+            [(item['id'], item['parent'], item['depth']) for item in results],
+            [(root.id, None, 0), (reply.id, root.id, 1),
+             (reply_of_reply.id, reply.id, 2)]
+        )
+        self.assertFalse(results[0]['has_more_replies'])
+        self.assertIsNone(response.data['next'])
+
+    def test_thread_post_depth_and_fan_out_limits(self):
+        root = self.create_post()
+        replies = [self.create_reply(root) for _ in range(3)]
+        deep_reply = self.create_reply(replies[0])
+
+        url = reverse('post-thread', kwargs={'pk': root.id})
+        response = self.client.get(url, {'depth': 1, 'fan_out': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(
+            [item['id'] for item in results],
+            [root.id, replies[0].id, replies[1].id]
+        )
+        self.assertTrue(results[0]['has_more_replies'])
+        self.assertTrue(results[1]['has_more_replies'])
+        self.assertNotIn(deep_reply.id, [item['id'] for item in results])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [root.id, replies[2].id]
+        )
+
+    def test_thread_nodes_fan_out_by_parent(self):
+        root = self.create_post()
+        reply = self.create_reply(root)
+        kept = [self.create_reply(reply) for _ in range(2)]
+        cut = self.create_reply(reply)
+        self.create_reply(cut)
+        deep_reply = self.create_reply(kept[0])
+
+        nodes = get_thread_nodes(root.id, depth=3, fan_out=2)
+
+        self.assertEqual(nodes, [
+            (reply.id, root.id, 1),
+            (kept[0].id, reply.id, 2), (kept[1].id, reply.id, 2),
+            (deep_reply.id, kept[0].id, 3),
+        ])
+
+    def test_thread_post_hide_replies_of_blockers(self):
+        root = self.create_post()
+        user = UserFactory().create_active_user()
+        reply = self.create_reply(root, user=user)
+        self.create_reply(reply)
+        Block.objects.create(blocked_by=user, blocked_user=self.user)
+
+        url = reverse('post-thread', kwargs={'pk': root.id})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [root.id])
+
+    def test_thread_post_queries_not_depend_on_posts_amount(self):
+        root = self.create_post()
+        for reply in [self.create_reply(root) for _ in range(2)]:
+            self.create_reply(reply)
+
+        url = reverse('post-thread', kwargs={'pk': root.id})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+
+        for reply in [self.create_reply(root) for _ in range(3)]:
+            self.create_reply(reply)
+            self.create_reply(reply)
+
+        # Render again all the posts, not from the cached representations.
+        cache.clear()
+        clear_local_caches()
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.client.get(url)
+
+    def test_thread_post_invalid_params(self):
+        root = self.create_post()
+        url = reverse('post-thread', kwargs={'pk': root.id})
+        response = self.client.get(url, {'depth': 'a'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AuthPostScheduledTestCase(BaseApiTest, PostFactory):
+    def test_create_scheduled_post(self):
+        parent = self.create_post()
+        data = {
+            'body': self.body(),
+            'parent': parent.id,
+            'date_to_publish': timezone.now() + datetime.timedelta(days=1),
+        }
+
+        url = reverse('post-list')
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        reply = Post.objects.exclude(id=parent.id).get()
+        self.assertEqual(reply.status, Post.SCHEDULED)
+        self.assertFalse(Notification.objects.filter(post=reply).exists())
+
+        url = reverse('post-thread', kwargs={'pk': reply.id})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_publish_due_posts(self):
+        parent = self.create_post()
+        reply = self.create_post_kwargs(
+            user=self.user,
+            body=self.body(),
+            quote=parent,
+            date_to_publish=timezone.now() + datetime.timedelta(hours=1)
+        )
+        PostReply.objects.create(parent=parent, reply=reply)
+        not_due = self.create_post_kwargs(
+            user=self.user,
+            body=self.body(),
+            date_to_publish=timezone.now() + datetime.timedelta(days=2)
+        )
+
+        published = publish_due_posts(
+            now=timezone.now() + datetime.timedelta(hours=2))
+
+        self.assertEqual(published, 1)
+        self.assertEqual(Post.objects.get(id=reply.id).status, Post.PUBLISHED)
+        self.assertEqual(Post.objects.get(
+            id=not_due.id).status, Post.SCHEDULED)
+        self.assertEqual(
+            set(Notification.objects.filter(post=reply).values_list(
+                'notification_type', flat=True)),
+            {'reply', 'quote'}
+        )
+
+        url = reverse('post-detail', kwargs={'pk': reply.id})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AuthPostFragmentsTestCase(BaseApiTest, PostFactory):
+    def test_retrieve_post_from_cached_fragment(self):
+        post = self.create_post()
+        hashtag = Hashtag.objects.create(tag='fragment')
+        HashtagsPost.objects.create(hashtag=hashtag, post=post)
+
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        response = self.client.get(url)
+        run_jobs()
+
+        with CaptureQueriesContext(connection) as context:
+            cached_response = self.client.get(url)
+
+        self.assertFalse(any('posts_hashtagspost' in query['sql']
+                             for query in context.captured_queries))
+        self.assertEqual(
+            cached_response.data['post']['hashtags'], response.data['post']['hashtags'])
+        self.assertEqual(cached_response.data['post']['num_views'], 1)
+
+    def test_like_post_invalidate_fragment(self):
+        post = self.create_post()
+
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        self.client.get(url)
+
+        self.client.post(reverse('likes-post', kwargs={'pk': post.id}))
+        response = self.client.get(url)
+
+        self.assertEqual(response.data['post']['num_likes'], 1)
+        self.assertTrue(response.data['post']['liked_by_me'])
+
+
+class AuthPostNormalizeUsersTestCase(BaseApiTest, PostFactory):
+    def test_list_posts_normalize_users(self):
+        post, user = self.create_post_and_user()
+        quoted = self.create_post_kwargs(user=user, body=self.body())
+        self.create_post_kwargs(user=user, body=self.body(), quote=quoted)
+        Follower.objects.create(follower=self.user, following=user)
+        Likes.objects.create(post=post, user=user)
+
+        url = reverse('post-list')
+        response = self.client.get(url, {'normalize': 'users'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['users']), [user.user_handle])
+        self.assertEqual(
+            response.data['users'][user.user_handle]['username'], user.username)
+        for item in response.data['results']:
+            if 'liked_by' in item:
+                self.assertEqual(item['liked_by'], user.user_handle)
+                item = item['post']
+            self.assertEqual(item['user'], user.user_handle)
+            if item['quote']:
+                self.assertEqual(item['quote']['user'], user.user_handle)
+
+    def test_list_posts_normalize_users_not_change_cached_fragments(self):
+        post, user = self.create_post_and_user()
+        self.create_post_kwargs(user=user, body=self.body(), quote=post)
+        Follower.objects.create(follower=self.user, following=user)
+
+        url = reverse('post-list')
+        self.client.get(url, {'normalize': 'users'})
+        response = self.client.get(url, {'normalize': 'users'})
+        self.assertEqual(response.data['results'][0]['quote']['user'], user.user_handle)
+
+        response = self.client.get(url)
+
+        self.assertNotIn('users', response.data)
+        self.assertEqual(
+            response.data['results'][0]['quote']['user']['user_handle'], user.user_handle)
+
+    def test_thread_post_normalize_users(self):
+        root = self.create_post()
+        reply = self.create_post_kwargs(user=self.user, body=self.body())
+        PostReply.objects.create(parent=root, reply=reply)
+
+        url = reverse('post-thread', kwargs={'pk': root.id})
+        response = self.client.get(url, {'normalize': 'users'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data['users']), {root.user_id, self.user.user_handle})
+        self.assertEqual(response.data['results'][1]['user'], self.user.user_handle)
+
+    def test_list_notifications_normalize_users(self):
+        post, user = self.create_post_and_user()
+        for _ in range(2):
+            Notification.objects.create(
+                sender=user, recipient=self.user, notification_type='like',
+                post=post, header=f'{user} liked your post.')
+
+        url = reverse('notifications')
+        response = self.client.get(url, {'normalize': 'users'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['users']), [user.user_handle])
+        self.assertEqual(
+            [noti['sender'] for noti in response.data['results']],
+            [user.user_handle, user.user_handle])
+
+
+class AuthPostSparseFieldsTestCase(BaseApiTest, PostFactory):
+    def create_post_with_relations(self):
+        quoted = self.create_post_kwargs(user=self.user, body=self.body())
+        post = self.create_post_kwargs(
+            user=self.user, body=self.body(), quote=quoted)
+        hashtag = Hashtag.objects.create(tag='sparse')
+        HashtagsPost.objects.create(hashtag=hashtag, post=post)
+        return post
+
+    def test_list_posts_only_fields(self):
+        self.create_post_with_relations()
+
+        url = reverse('post-list')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'fields': 'id,body,num_likes'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for post in response.data['results']:
+            self.assertEqual(set(post), {'id', 'body', 'num_likes'})
+        for table in ('posts_hashtagspost', 'posts_likes', 'posts_usermention'):
+            self.assertFalse(any(table in query['sql']
+                                 for query in context.captured_queries))
+
+    def test_list_posts_expand_relations(self):
+        post = self.create_post_with_relations()
+
+        url = reverse('post-list')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'expand': 'quote'})
+
+        result = next(
+            result for result in response.data['results'] if result['id'] == post.id)
+        self.assertEqual(result['quote']['id'], post.quote_id)
+        self.assertNotIn('hashtags', result)
+        self.assertIn('liked_by_me', result)
+        self.assertFalse(any('posts_hashtagspost' in query['sql']
+                             for query in context.captured_queries))
+
+    def test_list_posts_sparse_fields_not_cached(self):
+        post = self.create_post_with_relations()
+
+        url = reverse('post-list')
+        self.client.get(url, {'fields': 'id'})
+        response = self.client.get(url)
+
+        result = next(
+            result for result in response.data['results'] if result['id'] == post.id)
+        self.assertEqual(result['hashtags'][0]['tag'], 'sparse')
+
+    def test_retrieve_post_only_fields(self):
+        post = self.create_post_with_relations()
+
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        response = self.client.get(url, {'fields': 'id,user'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['post']), {'id', 'user'})
+
+    def test_list_notifications_only_fields(self):
+        post = self.create_post_with_relations()
+        user = UserFactory().create_active_user()
+        Notification.objects.create(
+            sender=user, recipient=self.user, notification_type='like',
+            post=post, header=f'{user} liked your post.')
+
+        url = reverse('notifications')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'fields': 'header,post'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {'header', 'post'})
+        self.assertNotIn('hashtags', response.data[0]['post'])
+        self.assertFalse(any('posts_hashtagspost' in query['sql']
+                             for query in context.captured_queries))
+
+
+class AuthPostBatchTestCase(BaseApiTest, PostFactory):
+    def test_get_posts_batch(self):
+        posts = [self.create_post() for _ in range(3)]
+        blocking_post, blocking = self.create_post_and_user()
+        Block.objects.create(blocked_by=blocking, blocked_user=self.user)
+        scheduled = self.create_post_kwargs(
+            user=self.user, body=self.body(), status=Post.SCHEDULED,
+            date_to_publish=timezone.now() + datetime.timedelta(days=1))
+        ids = [posts[2].id, 9999, blocking_post.id, scheduled.id, posts[0].id, posts[2].id]
+
+        response = self.client.get(
+            reverse('post-batch'), {'ids': ','.join(str(post_id) for post_id in ids)})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.data['results']],
+                         [posts[2].id, posts[0].id])
+        self.assertEqual(response.data['not_found'], [9999, scheduled.id])
+        self.assertEqual(response.data['forbidden'], [blocking_post.id])
+        run_jobs()
+        self.assertEqual(Post.objects.get(id=posts[0].id).num_views, 1)
+
+    def test_get_posts_batch_constant_queries(self):
+        self.client.get(reverse('post-batch'), {'ids': self.create_post().id})
+        post = self.create_post()
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(reverse('post-batch'), {'ids': post.id})
+
+        posts_ids = [self.create_post().id for _ in range(5)]
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(
+                reverse('post-batch'), {'ids': ','.join(str(post_id) for post_id in posts_ids)})
+
+        self.assertEqual(len(many.captured_queries), len(one.captured_queries))
+
+    def test_fail_get_posts_batch_not_valid_ids(self):
+        response = self.client.get(reverse('post-batch'), {'ids': '1,two'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class AuthUserPostsTestCase(BaseApiTest, PostFactory):
+    def create_timeline(self):
+        """Posts and reposts of the user, one each minute, the oldest first."""
+        now = timezone.now()
+        items = []
+        for minutes, kind in enumerate(['post', 'repost', 'post', 'post', 'repost']):
+            date = now - datetime.timedelta(minutes=10 - minutes)
+            if kind == 'post':
+                items.append(self.create_post_kwargs(
+                    user=self.user, body=self.body(), date_to_publish=date))
+            else:
+                items.append(Repost.objects.create(
+                    user=self.user, post=self.create_post(), create_at=date))
+        items.reverse()
+        return items
+
+    def get_item_key(self, item):
+        if isinstance(item, Post):
+            return ('post', item.id)
+        return ('repost', item.post_id)
+
+    def get_response_keys(self, response):
+        return [('repost', item['post']['id']) if 'repost_by' in item else ('post', item['id'])
+                for item in response.data['results']]
+
+    def test_list_user_posts_merged_by_date(self):
+        items = self.create_timeline()
+        url = reverse('user-posts', kwargs={'user_handle': self.user.user_handle})
+
+        keys = []
+        response = self.client.get(url, {'page_size': 2})
+        pages = 1
+        while response.data['next'] is not None:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            keys += self.get_response_keys(response)
+            response = self.client.get(response.data['next'])
+            pages += 1
+        keys += self.get_response_keys(response)
+
+        self.assertEqual(keys, [self.get_item_key(item) for item in items])
+        self.assertEqual(pages, 3)
+
+    def test_list_user_posts_only_visible(self):
+        post = self.create_post_kwargs(user=self.user, body=self.body())
+        self.create_post_kwargs(
+            user=self.user, body=self.body(), status=Post.SCHEDULED,
+            date_to_publish=timezone.now() + datetime.timedelta(days=1))
+        self.create_post_kwargs(user=self.user, body=self.body(), status=Post.DELETED)
+        blocking_post, blocking = self.create_post_and_user()
+        Block.objects.create(blocked_by=blocking, blocked_user=self.user)
+        Repost.objects.create(user=self.user, post=blocking_post)
+
+        response = self.client.get(
+            reverse('user-posts', kwargs={'user_handle': self.user.user_handle}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_response_keys(response), [('post', post.id)])
+        self.assertIsNone(response.data['next'])
+
+    def test_list_user_posts_constant_queries(self):
+        url = reverse('user-posts', kwargs={'user_handle': self.user.user_handle})
+        self.create_timeline()
+        # The fragments of the posts are cached by the first request.
+        self.client.get(url, {'page_size': 5})
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(url, {'page_size': 1})
+
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url, {'page_size': 5})
+
+        self.assertEqual(len(many.captured_queries), len(one.captured_queries))
+
+    def test_fail_list_user_posts_blocked(self):
+        post, user = self.create_post_and_user()
+        Block.objects.create(blocked_by=user, blocked_user=self.user)
+
+        response = self.client.get(reverse('user-posts', kwargs={'user_handle': user.user_handle}))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_fail_list_user_posts_not_valid(self):
+        response = self.client.get(reverse('user-posts', kwargs={'user_handle': 'nobody'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(
+            reverse('user-posts', kwargs={'user_handle': self.user.user_handle}), {'cursor': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AuthPostConditionalGetTestCase(BaseApiTest, PostFactory):
+    def test_retrieve_post_not_modified(self):
+        post = self.create_post()
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        response = self.client.get(url)
+
+        # The user of the token, the stamps of the post and the blocks of the user.
+        with self.assertNumQueries(3):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        run_jobs()
+        self.assertEqual(Post.objects.get(id=post.id).num_views, 1)
+
+    def test_retrieve_post_modified_by_like_and_reply(self):
+        post = self.create_post()
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        etag = self.client.get(url)['ETag']
+
+        self.client.post(reverse('likes-post', kwargs={'pk': post.id}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        PostReply.objects.create(parent=post, reply=self.create_post())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_post_etag_depend_on_query(self):
+        post = self.create_post()
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(
+            url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_post_not_found(self):
+        url = reverse('post-detail', kwargs={'pk': 0})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_notifications_not_modified(self):
+        post, user = self.create_post_and_user()
+        Notification.objects.create(
+            sender=user, recipient=self.user, notification_type='like',
+            post=post, header=f'{user} liked your post.')
+
+        url = reverse('notifications')
+        # The validators of the first response include the notification read.
+        response = self.client.get(url)
+        self.assertTrue(Notification.objects.get().is_read)
+
+        with self.assertNumQueries(2):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        update_post_counters(post.id, num_likes=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AuthPostFeedSinceTestCase(BaseApiTest, PostFactory):
+    def setUp(self):
+        super().setUp()
+        self.followed = UserFactory().create_active_user()
+        Follower.objects.create(follower=self.user, following=self.followed)
+        self.head = self.create_post_kwargs(user=self.followed, body=self.body())
+
+    def create_followed_post(self, **kwargs):
+        return self.create_post_kwargs(user=self.followed, body=self.body(), **kwargs)
+
+    def test_list_posts_since_id(self):
+        new_posts = [self.create_followed_post() for _ in range(3)]
+        self.create_post()
+
+        url = reverse('post-list')
+        response = self.client.get(url, {'since_id': self.head.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.data['results']],
+                         [post.id for post in reversed(new_posts)])
+        self.assertFalse(response.data['has_more'])
+
+    def test_list_posts_since_cursor_without_gaps(self):
+        new_posts = [self.create_followed_post() for _ in range(5)]
+
+        url = reverse('post-list')
+        response = self.client.get(
+            url, {'since_id': self.head.id, 'page_size': 3})
+        self.assertTrue(response.data['has_more'])
+        seen = [post['id'] for post in response.data['results']]
+
+        response = self.client.get(
+            url, {'since_cursor': response.data['since_cursor'], 'page_size': 3})
+        self.assertFalse(response.data['has_more'])
+        seen += [post['id'] for post in response.data['results']]
+
+        self.assertEqual(sorted(seen), [post.id for post in new_posts])
+
+        response = self.client.get(
+            url, {'since_cursor': response.data['since_cursor']})
+        self.assertEqual(response.data['results'], [])
+
+    def test_list_posts_since_scheduled_post_published(self):
+        scheduled = self.create_followed_post(
+            date_to_publish=timezone.now() + datetime.timedelta(minutes=5))
+        self.create_followed_post()
+        response = self.client.get(
+            reverse('post-list'), {'since_id': self.head.id})
+        since_cursor = response.data['since_cursor']
+
+        publish_due_posts(now=timezone.now() + datetime.timedelta(minutes=10))
+        Post.objects.filter(id=scheduled.id).update(
+            date_to_publish=timezone.now())
+
+        response = self.client.get(
+            reverse('post-list'), {'since_cursor': since_cursor})
+        self.assertEqual([post['id'] for post in response.data['results']],
+                         [scheduled.id])
+
+    def test_list_posts_since_not_valid(self):
+        response = self.client.get(
+            reverse('post-list'), {'since_cursor': 'not-valid'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_feed_new_count(self):
+        for _ in range(3):
+            self.create_followed_post()
+        self.create_post()
+
+        url = reverse('post-feed-new-count')
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'since_id': self.head.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'count': 3, 'has_more': False})
+
+    def test_feed_new_count_without_head(self):
+        response = self.client.get(reverse('post-feed-new-count'))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.events = []
+
+    def start(self):
+        pass
+
+    def publish(self, channel, message):
+        self.events.append((channel, message))
+
+
+class PostEventsTestCase(BaseApiTest, PostFactory):
+    def test_notification_and_post_publish_events(self):
+        backend = RecordingBackend()
+        post, user = self.create_post_and_user()
+
+        with patch('core.pubsub._backend', backend), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('likes-post', kwargs={'pk': post.id}))
+            new_post = self.create_post_kwargs(user=self.user, body=self.body())
+
+        channels = [channel for channel, _ in backend.events]
+        self.assertIn(f'user:{user.id}', channels)
+        self.assertIn(f'author:{self.user.user_handle}', channels)
+        feed_event = backend.events[channels.index(
+            f'author:{self.user.user_handle}')][1]
+        self.assertEqual(feed_event['data']['post'], new_post.id)
+
+    def test_publish_due_posts_events(self):
+        backend = RecordingBackend()
+        scheduled = self.create_post_kwargs(
+            user=self.user, body=self.body(),
+            date_to_publish=timezone.now() + datetime.timedelta(minutes=5))
+
+        with patch('core.pubsub._backend', backend), \
+                self.captureOnCommitCallbacks(execute=True):
+            publish_due_posts(
+                now=timezone.now() + datetime.timedelta(minutes=10))
+
+        self.assertEqual(backend.events, [(f'author:{self.user.user_handle}', {
+            'event': 'feed', 'id': None,
+            'data': {'post': scheduled.id, 'user': self.user.user_handle}})])
+
+
+class PostEventsStreamTestCase(BaseApiTest):
+    async def test_events_stream_without_token(self):
+        response = await self.async_client.get(reverse('events'))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_events_stream_push_notification(self):
+        response = await self.async_client.get(
+            reverse('events'), {'token': self.token})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertEqual(await anext(content), b'retry: 3000\n\n')
+
+        broker.deliver(f'user:{self.user.id}', {
+            'event': 'notification', 'id': 7, 'data': {'id': 7}})
+
+        self.assertEqual(await anext(content), b'id: 7\n')
+        self.assertEqual(await anext(content),
+                         b'event: notification\ndata: {"id": 7}\n\n')
+        await content.aclose()
+
+
+class AuthNotificationGroupsTestCase(BaseApiTest, PostFactory):
+    def like_post(self, post, users):
+        for user in users:
+            self.client.force_authenticate(user)
+            response = self.client.post(
+                reverse('likes-post', kwargs={'pk': post.id}))
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.force_authenticate(self.user)
+
+    def test_likes_grouped_in_one_notification(self):
+        post = self.create_post_kwargs(user=self.user, body=self.body())
+        users = [UserFactory().create_active_user() for _ in range(4)]
+
+        self.like_post(post, users)
+
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.count, 4)
+        self.assertEqual(notification.sender, users[-1])
+        self.assertEqual(notification.header, f'{users[-1]} and 3 others like your post.')
+        self.assertEqual(notification.recent_senders,
+                         [user.user_handle for user in reversed(users[1:])])
+
+    def test_list_grouped_notifications(self):
+        post = self.create_post_kwargs(user=self.user, body=self.body())
+        users = [UserFactory().create_active_user() for _ in range(2)]
+        self.like_post(post, users)
+
+        response = self.client.get(reverse('notifications'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['count'], 2)
+        self.assertEqual(
+            [sender['user_handle'] for sender in response.data[0]['recent_senders']],
+            [users[1].user_handle, users[0].user_handle])
+        self.assertNotIn('group_key', response.data[0])
+
+        response = self.client.get(reverse('notifications'), {'normalize': 'users'})
+        self.assertEqual(response.data['results'][0]['recent_senders'],
+                         [users[1].user_handle, users[0].user_handle])
+        self.assertIn(users[0].user_handle, response.data['users'])
+
+    def test_new_like_mark_group_unread(self):
+        post = self.create_post_kwargs(user=self.user, body=self.body())
+        self.like_post(post, [UserFactory().create_active_user()])
+        self.client.get(reverse('notifications'))
+        self.assertTrue(Notification.objects.get(recipient=self.user).is_read)
+
+        self.like_post(post, [UserFactory().create_active_user()])
+
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.count, 2)
+
+    def test_groups_by_post_type_and_window(self):
+        post, other_post = (self.create_post_kwargs(
+            user=self.user, body=self.body()) for _ in range(2))
+        user = UserFactory().create_active_user()
+        now = timezone.now()
+
+        notify_grouped(user, self.user, 'like', post, now=now)
+        notify_grouped(user, self.user, 'repost', post, now=now)
+        notify_grouped(user, self.user, 'like', other_post, now=now)
+        notify_grouped(user, self.user, 'follow', now=now)
+        notify_grouped(user, self.user, 'like', post, now=now + datetime.timedelta(
+            seconds=settings.NOTIFICATION_GROUP_WINDOW))
+
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 5)
+
+    def test_grouped_notification_event(self):
+        backend = RecordingBackend()
+        post = self.create_post_kwargs(user=self.user, body=self.body())
+        users = [UserFactory().create_active_user() for _ in range(2)]
+
+        with patch('core.pubsub._backend', backend), \
+                self.captureOnCommitCallbacks(execute=True):
+            for user in users:
+                notify_grouped(user, self.user, 'like', post)
+
+        self.assertEqual([message['data']['count'] for _, message in backend.events], [1, 2])
+
+
+class PruneNotificationsTestCase(BaseApiTest, PostFactory):
+    def create_notification(self, days, is_read=True):
+        post, user = self.create_post_and_user()
+        notification = Notification.objects.create(
+            sender=user, recipient=self.user, notification_type='like',
+            post=post, header=f'{user} like your post.', is_read=is_read)
+        Notification.objects.filter(id=notification.id).update(
+            create_at=timezone.now() - datetime.timedelta(days=days))
+        return notification
+
+    def test_prune_read_old_notifications(self):
+        old = [self.create_notification(days=100) for _ in range(3)]
+        unread = self.create_notification(days=100, is_read=False)
+        recent = self.create_notification(days=1)
+
+        pruned = prune_notifications(
+            timezone.now() - datetime.timedelta(days=90), batch_size=2)
+
+        self.assertEqual(pruned, 3)
+        self.assertEqual(set(Notification.objects.values_list('id', flat=True)),
+                         {unread.id, recent.id})
+        archived = ArchivedNotification.objects.order_by('create_at')
+        self.assertEqual([noti.post_id for noti in archived],
+                         [noti.post_id for noti in old])
+        self.assertTrue(all(noti.recipient == self.user for noti in archived))
+
+    def test_prune_without_archive(self):
+        self.create_notification(days=100)
+
+        pruned = prune_notifications(timezone.now(), archive=False)
+
+        self.assertEqual(pruned, 1)
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_list_notifications_inbox_window(self):
+        post, user = self.create_post_and_user()
+        notification = Notification.objects.create(
+            sender=user, recipient=self.user, notification_type='like',
+            post=post, header=f'{user} like your post.')
+        Notification.objects.filter(id=notification.id).update(
+            create_at=timezone.now() - datetime.timedelta(
+                days=settings.NOTIFICATION_INBOX_DAYS + 1))
+
+        response = self.client.get(reverse('notifications'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
@@ -73,9 +73,9 @@ class AuthRepostSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(len(response.data) > 0)
-        self.assertIsInstance(response.data, list)
-        self.assertIn('username', response.data[0])
+        self.assertTrue(len(response.data['results']) > 0)
+        self.assertIsInstance(response.data['results'], list)
+        self.assertIn('username', response.data['results'][0])
 
     def test_list_repost_in_own_post(self):
         post = self.create_post_kwargs(
@@ -88,9 +88,9 @@ class AuthRepostSuccessfulTestCase(BaseApiTest, PostFactory):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(len(response.data) > 0)
-        self.assertIsInstance(response.data, list)
-        self.assertIn('username', response.data[0])
+        self.assertTrue(len(response.data['results']) > 0)
+        self.assertIsInstance(response.data['results'], list)
+        self.assertIn('username', response.data['results'][0])
 
     def test_delete_repost_in_random_post(self):
         post = self.create_post()
@@ -1,6 +1,9 @@
 import pdb
 import datetime
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -9,7 +12,8 @@ from rest_framework.test import APITestCase
 from core.test.test_setup import BaseApiTest
 from users.models import Block
 from .factories import PostFactory
-from ..models import PollPost, OptionPollPost, VoteOptionPoll
+from ..models import Post, PollPost, OptionPollPost, VoteOptionPoll
+from ..polls import freeze_polls
 
 
 class NoAuthVoteOptionPollTestCase(APITestCase, PostFactory):
@@ -444,3 +448,72 @@ class AuthVoteOptionPollFailTestCase(BaseApiTest, PostFactory):
 
         self.assertEqual(response.status_code,
                          status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class AuthPollResultsTestCase(BaseApiTest, PostFactory):
+    def create_poll(self, end_time=None):
+        post = self.create_post_kwargs(
+            user=self.user, body=self.body(), have_poll=True)
+        poll = PollPost.objects.create(
+            post=post, end_time=end_time or timezone.now() + datetime.timedelta(days=1))
+        options = [OptionPollPost.objects.create(poll=poll, option=self.option())
+                   for _ in range(2)]
+        return post, poll, options
+
+    def test_vote_by_option_id_written_to_cached_results(self):
+        post, poll, options = self.create_poll()
+        url = reverse('post-detail', kwargs={'pk': post.id})
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('vote-poll-post', kwargs={'pk': post.id}),
+                {'poll': poll.id, 'option_id': options[1].id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # The results come from the cache, written by the vote.
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertFalse(any('FROM "posts_optionpollpost"' in query['sql']
+                             for query in context.captured_queries))
+        self.assertEqual(response.data['post']['poll']['total_votes'], 1)
+        self.assertEqual(response.data['post']['poll']['option2'],
+                         {'id': options[1].id, 'option': options[1].option, 'votes': 1})
+
+    def test_vote_option_of_other_poll(self):
+        post, poll, _ = self.create_poll()
+        _, _, other_options = self.create_poll()
+
+        response = self.client.post(
+            reverse('vote-poll-post', kwargs={'pk': post.id}),
+            {'poll': poll.id, 'option_id': other_options[0].id})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['option'], 'Option not found.')
+        self.assertFalse(VoteOptionPoll.objects.exists())
+
+    def test_freeze_ended_polls(self):
+        post, poll, options = self.create_poll()
+        VoteOptionPoll.objects.create(user=self.user, poll=poll, option=options[0])
+        OptionPollPost.objects.filter(id=options[0].id).update(votes=1)
+        PollPost.objects.filter(id=poll.id).update(
+            total_votes=1, end_time=timezone.now() - datetime.timedelta(minutes=5))
+        live, _, _ = self.create_poll()
+
+        self.assertEqual(freeze_polls(), 1)
+        self.assertEqual(freeze_polls(), 0)
+
+        post.refresh_from_db()
+        self.assertEqual(post.poll_results['total_votes'], 1)
+        self.assertIsNone(Post.objects.get(id=live.id).poll_results)
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('post-detail', kwargs={'pk': post.id}))
+
+        # Only the vote of the user is read, with the likes and reposts.
+        self.assertFalse(any('FROM "posts_optionpollpost"' in query['sql'] or
+                             'FROM "posts_pollpost"' in query['sql']
+                             for query in context.captured_queries))
+        self.assertEqual(response.data['post']['poll']['option1']['votes'], 1)
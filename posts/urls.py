@@ -1,14 +1,18 @@
 from django.urls import path
-from .views import (LikePostAPIView, RepostAPIView,
+from .views import (PostViewSet, LikePostAPIView, RepostAPIView,
                     VoteOptionPollAPIView, HashtagAPIView,
-                    UserMentionAPIView, NotificationsListAPIView)
+                    UserMentionAPIView, NotificationsListAPIView,
+                    events_stream)
 
 urlpatterns = [
     path('posts/<str:pk>/likes/', LikePostAPIView.as_view(), name='likes-post'),
     path('posts/<str:pk>/reposts/', RepostAPIView.as_view(), name='reposts-post'),
     path('posts/<str:pk>/votepoll/',
          VoteOptionPollAPIView.as_view(), name='vote-poll-post'),
+    path('users/<str:user_handle>/posts/',
+         PostViewSet.as_view({'get': 'user_posts'}), name='user-posts'),
     path('hashtags/', HashtagAPIView.as_view(), name='hashtags'),
     path('user-mention/', UserMentionAPIView.as_view(), name='user-mention'),
-    path('notifications/', NotificationsListAPIView.as_view(), name='notifications')
+    path('notifications/', NotificationsListAPIView.as_view(), name='notifications'),
+    path('events/', events_stream, name='events'),
 ]
@@ -1,22 +1,616 @@
+import heapq
+from base64 import b64decode, b64encode
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.utils import IntegrityError
+from django.db.models import (Prefetch, prefetch_related_objects, OuterRef, Subquery,
+                              F, Q, Count)
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 
-from users.models import Block
-from .models import Post
+from core.pubsub import publish
+from core.utils import delete_in_batches, project, get_only_fields, FULL_FIELDSET
+from users.models import User, Follower
+from users.serializers import ListSimpleUserSerializer
+from users.utils import get_blocked_by_handles
+from .models import (Post, PostReply, Likes, Repost, VoteOptionPoll, HashtagsPost,
+                     UserMention, Notification, Hashtag, PollPost, OptionPollPost,
+                     ArchivedNotification)
 
 
 def is_request_user_blocked(post_pk=None, post=None, owner=None, request_user=None):
     try:
         if post_pk:
-            post = Post.objects.select_related('user').get(id=post_pk)
-            blocked = Block.objects.filter(
-                blocked_by=post.user, blocked_user=request_user).exists()
-        elif post:
-            blocked = Block.objects.filter(
-                blocked_by=post.user, blocked_user=request_user).exists()
-        else:
-            blocked = Block.objects.filter(
-                blocked_by=owner, blocked_user=request_user).exists()
-        return blocked
+            post = Post.objects.get(id=post_pk)
+        if post:
+            owner = post.user_id
+        owner = getattr(owner, 'user_handle', owner)
+        return owner in get_blocked_by_handles(request_user)
     except:
         return False
+
+
+def update_post_counters(post_id, **amounts):
+    """
+    Add the `amounts` to the counters of a post in one UPDATE, bumping his version
+    and `modify_at` (the `Last-Modified` of the post).
+    e.g. `update_post_counters(post.id, num_likes=1)`.
+    """
+    Post.objects.filter(id=post_id).update(
+        version=F('version') + 1, modify_at=timezone.now(),
+        **{counter: F(counter) + amount for counter, amount in amounts.items()})
+
+
+def bump_posts_version(posts_ids):
+    Post.objects.filter(id__in=posts_ids).update(
+        version=F('version') + 1, modify_at=timezone.now())
+
+
+def get_viewer_state(user, posts_ids):
+    """
+    Get the relation of the user with a group of posts.
+
+    Run one query on `Likes`, one on `Repost` and one on `VoteOptionPoll`,
+    whatever the amount of posts, and return:
+        - `liked` (set): IDs of the posts liked by the user.
+        - `reposted` (set): IDs of the posts reposted by the user.
+        - `votes` (dict): Post ID -> option voted by the user in the post's poll.
+    """
+    viewer_state = {'liked': set(), 'reposted': set(), 'votes': {}}
+    posts_ids = set(posts_ids)
+
+    if not posts_ids or user is None or not user.is_authenticated:
+        return viewer_state
+
+    viewer_state['liked'] = set(Likes.objects.filter(
+        user=user, post__in=posts_ids).values_list('post_id', flat=True))
+    viewer_state['reposted'] = set(Repost.objects.filter(
+        user=user, post__in=posts_ids).values_list('post_id', flat=True))
+
+    votes = VoteOptionPoll.objects.filter(
+        user=user, poll__post__in=posts_ids
+    ).values_list('poll__post_id', 'option_id', 'option__option')
+    for post_id, option_id, option in votes:
+        viewer_state['votes'][post_id] = {'id': option_id, 'option': option}
+
+    return viewer_state
+
+
+def prefetch_post_relations(posts, fieldset=FULL_FIELDSET):
+    """
+    Load for a list of posts all the relations rendered by the list serializers
+    (author, quote, hashtags and mentions) in a constant number of queries,
+    whatever the amount of posts. Only the relations of `fieldset` are loaded.
+    The polls are read from their cache (see `posts.polls`).
+    """
+    users = project(User.objects.all(), ListSimpleUserSerializer)
+    lookups = [Prefetch('user', queryset=users)]
+    prefixes = ['']
+    if fieldset.has_relation('quote'):
+        lookups += ['quote', Prefetch('quote__user', queryset=users)]
+        prefixes.append('quote__')
+
+    mentions = UserMention.objects.select_related('user').only(
+        'post', 'user', *get_only_fields(ListSimpleUserSerializer, 'user__'))
+    for prefix in prefixes:
+        if fieldset.has_relation('hashtags'):
+            lookups.append(Prefetch(f'{prefix}hashtagspost_set',
+                                    queryset=HashtagsPost.objects.select_related('hashtag')))
+        if fieldset.has_relation('users-mention'):
+            lookups.append(
+                Prefetch(f'{prefix}usermention_set', queryset=mentions))
+
+    prefetch_related_objects(list(posts), *lookups)
+    return posts
+
+
+def encode_feed_cursor(date_to_publish, post_id):
+    return b64encode(f'{date_to_publish.isoformat()}|{post_id}'.encode()).decode()
+
+
+def get_feed_head(since_cursor=None, since_id=None):
+    """
+    Get the `(date_to_publish, id)` of the newest post of the home feed that the
+    client has, from a cursor (`encode_feed_cursor`) or from the post ID.
+    Return None if they are not valid.
+    """
+    try:
+        if since_cursor is not None:
+            date_to_publish, post_id = b64decode(
+                since_cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(date_to_publish), int(post_id)
+        return Post.objects.filter(id=int(since_id)).values_list(
+            'date_to_publish', 'id').first()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def get_new_feed_posts(user, head):
+    """
+    Published posts of the users followed by `user` after the `head` of his feed,
+    in the order of the feed (`date_to_publish`, and `id` for the same date).
+    Read by the index of the published posts by user and date.
+    """
+    date_to_publish, post_id = head
+    return Post.objects.published().filter(
+        Q(user__in=Follower.objects.filter(follower=user).values('following')) &
+        (Q(date_to_publish__gt=date_to_publish) |
+         Q(date_to_publish=date_to_publish, id__gt=post_id))
+    )
+
+
+def encode_timeline_cursor(post_head, repost_head):
+    """
+    Cursor of a user timeline: the `(date, id)` of the last post and of the last
+    repost already returned, empty for a stream not read yet.
+    """
+    parts = []
+    for head in (post_head, repost_head):
+        parts += [head[0].isoformat(), str(head[1])] if head else ['', '']
+    return b64encode('|'.join(parts).encode()).decode()
+
+
+def decode_timeline_cursor(cursor):
+    """Get the `(post_head, repost_head)` of a timeline cursor, None if it is not valid."""
+    try:
+        parts = b64decode(cursor.encode()).decode().split('|')
+        if len(parts) != 4:
+            return None
+        return tuple(
+            (datetime.fromisoformat(date), int(item_id)) if date else None
+            for date, item_id in (parts[:2], parts[2:]))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def get_timeline_page(posts, reposts, post_head, repost_head, page_size):
+    """
+    Get a page of the timeline of a user, the newest first: his `posts` and his
+    `reposts` merged by date. Each stream is read after his head by his own
+    index, with one query of up to `page_size + 1` rows. Return the page, the
+    heads of both streams after it and if there are more items.
+    """
+    if post_head is not None:
+        date, post_id = post_head
+        posts = posts.filter(Q(date_to_publish__lt=date) |
+                             Q(date_to_publish=date, id__lt=post_id))
+    if repost_head is not None:
+        date, repost_id = repost_head
+        reposts = reposts.filter(Q(create_at__lt=date) |
+                                 Q(create_at=date, id__lt=repost_id))
+
+    merged = heapq.merge(
+        posts.order_by('-date_to_publish', '-id')[:page_size + 1],
+        reposts.order_by('-create_at', '-id')[:page_size + 1],
+        key=lambda item: item.date_to_publish if isinstance(item, Post) else item.create_at,
+        reverse=True)
+    items = list(islice(merged, page_size + 1))
+
+    page = items[:page_size]
+    for item in page:
+        if isinstance(item, Post):
+            post_head = (item.date_to_publish, item.id)
+        else:
+            repost_head = (item.create_at, item.id)
+    return page, post_head, repost_head, len(items) > page_size
+
+
+def get_thread_nodes(root_id, depth, fan_out, after=None):
+    """
+    Get the replies tree of a post with one recursive query over `PostReply`.
+
+    Return a list of `(post_id, parent_id, depth)` ordered by level, with at most
+    `depth` levels and `fan_out` replies for each parent (the oldest first).
+    `after` is the ID of the last direct reply of the root already seen, to get
+    the next page of the first level.
+
+    The `fan_out` limit is applied in each step of the recursion, so only the
+    kept replies are walked and the query reads at most `fan_out ** depth` rows,
+    whatever the size of the thread.
+    """
+    table = PostReply._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        # The first `fan_out` replies of each parent by the index of `parent_id`.
+        next_level = f"""
+            SELECT reply.reply_id, reply.parent_id, thread.depth + 1
+            FROM thread CROSS JOIN LATERAL (
+                SELECT reply_id, parent_id FROM {table}
+                WHERE parent_id = thread.post_id
+                ORDER BY reply_id
+                LIMIT %s
+            ) AS reply
+            WHERE thread.depth < %s
+        """
+    else:
+        next_level = f"""
+            SELECT reply.reply_id, reply.parent_id, thread.depth + 1
+            FROM thread INNER JOIN {table} AS reply ON reply.parent_id = thread.post_id
+            WHERE reply.reply_id IN (
+                SELECT reply_id FROM {table}
+                WHERE parent_id = thread.post_id
+                ORDER BY reply_id
+                LIMIT %s
+            ) AND thread.depth < %s
+        """
+
+    query = f"""
+        WITH RECURSIVE thread (post_id, parent_id, depth) AS (
+            SELECT reply_id, parent_id, 1 FROM (
+                SELECT reply_id, parent_id FROM {table}
+                WHERE parent_id = %s AND reply_id > %s
+                ORDER BY reply_id
+                LIMIT %s
+            ) AS first_level
+            UNION ALL
+            {next_level}
+        )
+        SELECT post_id, parent_id, depth FROM thread
+        ORDER BY depth, parent_id, post_id
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, [root_id, after or 0, fan_out, fan_out, depth])
+        return cursor.fetchall()
+
+
+def get_publish_notifications(posts_ids):
+    """
+    Build the notifications of replies, quotes and mentions for posts that are
+    being published, to be inserted with a single `bulk_create`.
+    """
+    notifications = []
+    posts = Post.objects.select_related(
+        'user', 'quote__user').filter(id__in=posts_ids)
+    for post in posts:
+        if post.quote:
+            notifications.append(Notification(
+                sender=post.user,
+                recipient=post.quote.user,
+                notification_type='quote',
+                post=post,
+                header=f'{post.user_id} quote your post.',
+            ))
+
+    replies = PostReply.objects.select_related(
+        'reply__user', 'parent__user').filter(reply__in=posts_ids)
+    for reply in replies:
+        notifications.append(Notification(
+            sender=reply.reply.user,
+            recipient=reply.parent.user,
+            notification_type='reply',
+            post=reply.reply,
+            header=f'{reply.reply.user_id} reply your post.',
+        ))
+
+    mentions = UserMention.objects.select_related(
+        'post__user', 'user').filter(post__in=posts_ids)
+    for mention in mentions:
+        notifications.append(Notification(
+            sender=mention.post.user,
+            recipient=mention.user,
+            notification_type='mention',
+            post=mention.post,
+            header=f'{mention.post.user_id} mention you in a post.',
+        ))
+
+    return notifications
+
+
+GROUPED_NOTIFICATIONS = {
+    'like': 'like your post.',
+    'repost': 'repost your post.',
+    'follow': 'started following you.',
+}
+RECENT_SENDERS = 3
+
+
+def get_group_header(sender, notification_type, count):
+    others = count - 1
+    if others == 0:
+        return f'{sender} {GROUPED_NOTIFICATIONS[notification_type]}'
+    return (f'{sender} and {others} other{"s" if others > 1 else ""} '
+            f'{GROUPED_NOTIFICATIONS[notification_type]}')
+
+
+def notify_grouped(sender, recipient, notification_type, post=None, now=None):
+    """
+    Add a like, repost or follow to the notification of `recipient` that groups
+    the ones of the same type and post in the current time window
+    (`NOTIFICATION_GROUP_WINDOW`), created by the first of them. The rows are one
+    by group instead of one by event, and the group is pushed again to the stream
+    of the recipient with his new `count`.
+    """
+    now = now or timezone.now()
+    window = int(now.timestamp()) // settings.NOTIFICATION_GROUP_WINDOW
+    group_key = f'{recipient.pk}:{notification_type}:{post.pk if post else ""}:{window}'
+    window_start = datetime.fromtimestamp(
+        window * settings.NOTIFICATION_GROUP_WINDOW, tz=dt_timezone.utc)
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # The unique index of `group_key` is not kept when the table is
+            # partitioned, the events of a group are serialized by this lock.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [group_key])
+        # The date bound reads only the partitions of the window.
+        notification = Notification.objects.select_for_update().filter(
+            group_key=group_key, create_at__gte=window_start).first()
+        if notification is None:
+            try:
+                with transaction.atomic():
+                    return Notification.objects.create(
+                        sender=sender,
+                        recipient=recipient,
+                        notification_type=notification_type,
+                        post=post,
+                        header=get_group_header(sender, notification_type, 1),
+                        group_key=group_key,
+                        recent_senders=[sender.user_handle],
+                    )
+            except IntegrityError:
+                # Created by another event at the same time.
+                notification = Notification.objects.select_for_update().get(
+                    group_key=group_key)
+
+        notification.count += 1
+        notification.sender = sender
+        notification.recent_senders = ([sender.user_handle] + [
+            handle for handle in notification.recent_senders
+            if handle != sender.user_handle])[:RECENT_SENDERS]
+        notification.header = get_group_header(
+            sender, notification_type, notification.count)
+        notification.is_read = False
+        notification.save(update_fields=[
+            'count', 'sender', 'recent_senders', 'header', 'is_read', 'modify_at'])
+        # The signal only push the new notifications.
+        publish_notification_events([notification])
+
+    return notification
+
+
+def get_group_senders(group, exclude):
+    """
+    Active users of the likes, reposts or follows of `group` still in place, the
+    newest first, but `exclude`. The events are not dated by window, so the ones
+    of other windows can be taken.
+    """
+    if group.notification_type == 'follow':
+        users = User.objects.filter(
+            follower__following__id=group.recipient_id).order_by('-follower__id')
+    else:
+        relation = 'likes' if group.notification_type == 'like' else 'repost_by'
+        users = User.objects.filter(
+            **{f'{relation}__post_id': group.post_id}).order_by(f'-{relation}__id')
+    return list(users.filter(is_active=True).exclude(id=exclude.id)[:RECENT_SENDERS])
+
+
+def remove_sender_from_groups(user, recipient=None, batch_size=500):
+    """
+    Take out `user` of the grouped notifications of which he is the last sender
+    (only the ones of `recipient` if given), by chunks of `batch_size`: he is
+    removed from `recent_senders`, his event is subtracted from `count` and the
+    previous sender becomes the last one. A group is deleted when his `count`
+    reaches 0. Return the amount of groups updated.
+    """
+    user_groups = Notification.objects.filter(sender=user, group_key__isnull=False)
+    if recipient is not None:
+        user_groups = user_groups.filter(recipient=recipient)
+
+    updated = 0
+    while True:
+        with transaction.atomic():
+            groups = list(user_groups.select_for_update().order_by('id')[:batch_size])
+            if not groups:
+                return updated
+
+            for group in groups:
+                group.recent_senders = [handle for handle in group.recent_senders
+                                        if handle != user.user_handle]
+            senders = {other.user_handle: other for other in User.objects.filter(
+                user_handle__in={handle for group in groups for handle in group.recent_senders},
+                is_active=True)}
+
+            kept, emptied = [], []
+            for group in groups:
+                group.count -= 1
+                recent = [senders[handle] for handle in group.recent_senders
+                          if handle in senders]
+                if group.count > 0 and not recent:
+                    # The other recent senders were deactivated, the group is
+                    # shown with the users of the events still in place.
+                    recent = get_group_senders(group, user)
+                # Without any of them left, there is nobody to show it as.
+                if group.count < 1 or not recent:
+                    emptied.append(group.id)
+                    continue
+                group.recent_senders = [other.user_handle for other in recent]
+                group.sender = recent[0]
+                group.header = get_group_header(
+                    group.sender, group.notification_type, group.count)
+                group.modify_at = timezone.now()
+                kept.append(group)
+
+            Notification.objects.bulk_update(
+                kept, ['count', 'sender', 'recent_senders', 'header', 'modify_at'])
+            Notification.objects.filter(id__in=emptied).delete()
+        updated += len(groups)
+
+
+def get_recent_senders(notifications):
+    """
+    Load with a single query the users of the `recent_senders` of the grouped
+    notifications, by handle.
+    """
+    handles = {handle for notification in notifications
+               for handle in notification.recent_senders}
+    if not handles:
+        return {}
+    # The deactivated users are not shown.
+    return {user.user_handle: user for user in User.objects.filter(
+        user_handle__in=handles, is_active=True).only(*ListSimpleUserSerializer.only_fields)}
+
+
+def publish_notification_events(notifications):
+    """
+    Push the new notifications to the streams of the recipients (channel
+    `user:<id>`), when the transaction is committed.
+    """
+    for notification in notifications:
+        publish(f'user:{notification.recipient_id}', {
+            'event': 'notification',
+            'id': notification.id,
+            'data': {
+                'id': notification.id,
+                'notification_type': notification.notification_type,
+                'header': notification.header,
+                'post': notification.post_id,
+                'count': notification.count,
+            },
+        })
+
+
+def publish_feed_events(posts):
+    """
+    Push a hint of the new published posts to the streams of the followers of the
+    authors (channel `author:<user_handle>`), when the transaction is committed.
+    The clients get the posts with the `since_cursor` of the feed.
+    """
+    for post in posts:
+        publish(f'author:{post.user_id}', {
+            'event': 'feed',
+            'id': None,
+            'data': {'post': post.id, 'user': post.user_id},
+        })
+
+
+def publish_due_posts(now=None, batch_size=500):
+    """
+    Publish the scheduled posts whose `date_to_publish` is due, in batches read
+    through the partial index of scheduled posts, and send the notifications that
+    were waiting for them. Return the amount of posts published.
+    """
+    now = now or timezone.now()
+    published = 0
+    while True:
+        with transaction.atomic():
+            # Skip the rows locked by another publisher running at the same time.
+            posts_ids = list(Post.objects.select_for_update(skip_locked=True).filter(
+                status=Post.SCHEDULED, date_to_publish__lte=now
+            ).order_by('date_to_publish').values_list('id', flat=True)[:batch_size])
+            if not posts_ids:
+                break
+
+            Post.objects.filter(id__in=posts_ids).update(status=Post.PUBLISHED)
+            notifications = Notification.objects.bulk_create(
+                get_publish_notifications(posts_ids))
+
+            # `bulk_create` and `update` not send the signals of the models.
+            publish_notification_events(notifications)
+            publish_feed_events(Post.objects.filter(
+                id__in=posts_ids).only('id', 'user'))
+
+        published += len(posts_ids)
+        if len(posts_ids) < batch_size:
+            break
+
+    return published
+
+
+def purge_deleted_posts(batch_size=500):
+    """
+    Delete the posts marked as deleted and the rows that depend on them, by
+    chunks of `batch_size`, updating the hashtags uses and the replies amount
+    of the parents with one UPDATE each. Return the amount of posts purged.
+    """
+    purged = 0
+    while True:
+        posts_ids = list(Post.objects.filter(status=Post.DELETED).order_by(
+            'id').values_list('id', flat=True)[:batch_size])
+        if not posts_ids:
+            break
+
+        # The counters are updated with the rows they count, to not decrement twice.
+        with transaction.atomic():
+            hashtags_uses = HashtagsPost.objects.filter(
+                hashtag=OuterRef('tag'), post__in=posts_ids
+            ).values('hashtag').annotate(amount=Count('id')).values('amount')
+            Hashtag.objects.filter(
+                tag__in=HashtagsPost.objects.filter(
+                    post__in=posts_ids).values('hashtag')
+            ).update(amount_use=F('amount_use') - Subquery(hashtags_uses))
+            HashtagsPost.objects.filter(post__in=posts_ids).delete()
+
+            replies = PostReply.objects.filter(
+                parent=OuterRef('id'), reply__in=posts_ids
+            ).values('parent').annotate(amount=Count('id')).values('amount')
+            Post.objects.filter(
+                id__in=PostReply.objects.filter(
+                    reply__in=posts_ids).values('parent')
+            ).update(num_replies=F('num_replies') - Subquery(replies),
+                     version=F('version') + 1, modify_at=timezone.now())
+            PostReply.objects.filter(reply__in=posts_ids).delete()
+
+        dependents = [
+            VoteOptionPoll.objects.filter(poll__post__in=posts_ids),
+            OptionPollPost.objects.filter(poll__post__in=posts_ids),
+            PollPost.objects.filter(post__in=posts_ids),
+            Likes.objects.filter(post__in=posts_ids),
+            Repost.objects.filter(post__in=posts_ids),
+            UserMention.objects.filter(post__in=posts_ids),
+            Notification.objects.filter(post__in=posts_ids),
+            PostReply.objects.filter(parent__in=posts_ids),
+        ]
+        for queryset in dependents:
+            delete_in_batches(queryset, batch_size)
+
+        Post.objects.filter(quote__in=posts_ids).update(quote=None)
+        Post.objects.filter(id__in=posts_ids).delete()
+
+        purged += len(posts_ids)
+
+    return purged
+
+
+def prune_notifications(before, batch_size=500, archive=True):
+    """
+    Delete the read notifications created before `before`, copied first to
+    `ArchivedNotification` if `archive`. The rows are read in date order through
+    the partial index of the read notifications, continuing after the last row of
+    the previous chunk, and each chunk is deleted in his own short transaction.
+    Return the amount of notifications pruned.
+    """
+    pruned = 0
+    last = None
+    while True:
+        with transaction.atomic():
+            notifications = Notification.objects.filter(
+                is_read=True, create_at__lt=before)
+            if last is not None:
+                notifications = notifications.filter(
+                    Q(create_at__gt=last[0]) | Q(create_at=last[0], id__gt=last[1]))
+            # Locked so a new event of a group can not mark it as unread meanwhile.
+            rows = list(notifications.select_for_update(skip_locked=True).order_by(
+                'create_at', 'id').values(
+                'id', 'recipient_id', 'notification_type', 'post_id', 'header',
+                'count', 'create_at')[:batch_size])
+            if not rows:
+                break
+
+            if archive:
+                ArchivedNotification.objects.bulk_create([
+                    ArchivedNotification(**{
+                        key: value for key, value in row.items() if key != 'id'})
+                    for row in rows])
+            Notification.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        pruned += len(rows)
+        last = (rows[-1]['create_at'], rows[-1]['id'])
+        if len(rows) < batch_size:
+            break
+
+    return pruned
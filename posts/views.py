@@ -1,27 +1,51 @@
+import asyncio
+import json
 import re
+from datetime import timedelta
 
-from django.db.models import Q, Max
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Max, Count, Sum
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.generics import GenericAPIView, ListAPIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from users.models import User, Follower, Block
-from core.utils import GenericPagination
+from users.utils import get_blocked_by_handles
+from core.dbrouters import ReplicaReadMixin
+from core.jobs import enqueue
+from core.pubsub import broker, get_backend, BrokerFull
+from core.utils import (GenericPagination, KeysetPagination, SparseFieldset, project,
+                        get_only_fields, get_users_table, get_etag, get_batch_keys,
+                        get_not_modified_response, set_validators)
 from .serializers import (CreatePostSerializer, ListPostSerializer,
                           ListPostRepliesSerializer, ListSimpleUserSerializer,
                           ListRepostPostSerializer, ListLikedPostSerializer, ListHashtagsSerializer,
-                          CreateVoteOptionPollSerializer, ListNotificationsSerializer, DummySerializer)
+                          CreateVoteOptionPollSerializer, ListNotificationsSerializer, DummySerializer,
+                          load_post_fragments, load_post_polls)
 from .models import (Post, PostReply, UserMention, Hashtag, HashtagsPost, Likes,
                      Repost, Notification)
-from .utils import is_request_user_blocked
+from .utils import (is_request_user_blocked, get_viewer_state,
+                    prefetch_post_relations, get_thread_nodes,
+                    update_post_counters, bump_posts_version,
+                    encode_feed_cursor, get_feed_head, get_new_feed_posts,
+                    encode_timeline_cursor, decode_timeline_cursor, get_timeline_page,
+                    notify_grouped, get_recent_senders)
 
 
 class PostPagination(PageNumberPagination):
@@ -30,17 +54,18 @@ class PostPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = CreatePostSerializer
     permission_classes = [IsAuthenticated,]
     pagination_class = PostPagination
+    replica_actions = ('list', 'retrieve', 'batch', 'user_posts')
 
     lookup_field = 'pk'
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CreatePostSerializer
-        elif self.action == 'list':
+        elif self.action in ('list', 'user_posts'):
             return ListPostSerializer, ListLikedPostSerializer, ListRepostPostSerializer
         elif self.action == 'retrieve':
             return ListPostRepliesSerializer
@@ -52,10 +77,10 @@ class PostViewSet(viewsets.ModelViewSet):
             'blocked_user').filter(blocked_by=self.request.user)
 
         if search:
-            posts = Post.objects.filter(
+            posts = Post.objects.published().filter(
                 Q(body__icontains=search) &
                 ~Q(user__in=[blocked.blocked_user for blocked in blockeds])
-            )
+            ).order_by('-date_to_publish')
 
             return posts
 
@@ -64,32 +89,29 @@ class PostViewSet(viewsets.ModelViewSet):
         users = [user.following for user in users]
 
         if lookup == None and (users == None or users == []):
-            posts = Post.objects.filter(
-                Q(date_to_publish__lte=timezone.now())).order_by('?')
+            posts = Post.objects.published().order_by('?')
 
             return posts
 
         elif lookup == None and users != []:
 
-            posts = Post.objects.filter(
-                Q(user__in=users) &
-                Q(date_to_publish__lte=timezone.now()
-                  )).order_by('-date_to_publish')
-            liked_posts = Likes.objects.select_related('post').filter(
+            posts = Post.objects.published().filter(
+                Q(user__in=users)).order_by('-date_to_publish')
+            liked_posts = Likes.objects.select_related('post', 'user').filter(
                 Q(user__in=users) & ~Q(post__in=posts) &
-                Q(post__date_to_publish__lte=timezone.now()))
+                Q(post__status=Post.PUBLISHED))
 
-            reposted_posts = Repost.objects.select_related('post').filter(
+            reposted_posts = Repost.objects.select_related('post', 'user').filter(
                 Q(user__in=users) & ~Q(post__in=posts) &
                 ~Q(post__in=liked_posts.values('post')) &
-                Q(post__date_to_publish__lte=timezone.now()))
+                Q(post__status=Post.PUBLISHED))
 
             others = Post.objects.filter(
                 ~Q(id__in=posts) &
                 ~Q(id__in=liked_posts.values('post')) &
                 ~Q(id__in=reposted_posts.values('post')) &
                 ~Q(user__in=[blocked.blocked_user for blocked in blockeds]) &
-                Q(date_to_publish__lte=timezone.now())
+                Q(status=Post.PUBLISHED)
             ).annotate(max_views=Max('num_views'))
 
             return {
@@ -101,20 +123,17 @@ class PostViewSet(viewsets.ModelViewSet):
 
         elif lookup != None:
             post = get_object_or_404(
-                Post, id=lookup, date_to_publish__lte=timezone.now())
+                Post.objects.published(), id=lookup)
             replies = PostReply.objects.select_related(
-                'reply').filter(parent=post)
+                'reply').filter(parent=post, reply__status=Post.PUBLISHED)
             return post, replies
 
         else:
             return None
 
     def _posts_add_view(self, posts_ids=None):
-
-        posts = Post.objects.filter(id__in=posts_ids)
-        for post in posts:
-            post.num_views += 1
-            post.save()
+        # Added by the jobs worker, merged with the views of other requests.
+        enqueue('posts.add_views', {'posts': sorted(posts_ids)})
 
     @extend_schema(
         responses={200: DummySerializer},
@@ -125,6 +144,16 @@ class PostViewSet(viewsets.ModelViewSet):
                 name='page', description='Page number.', type=int),
             OpenApiParameter(
                 name='page_size', description='Amount of results per page.', type=int),
+            OpenApiParameter(
+                name='normalize', description='`users` to reference the users by handle.', type=str),
+            OpenApiParameter(
+                name='fields', description='Comma separated fields of the posts to get.', type=str),
+            OpenApiParameter(
+                name='expand', description='Comma separated relations of the posts to get.', type=str),
+            OpenApiParameter(
+                name='since_id', description='ID of the newest post of the feed already seen.', type=int),
+            OpenApiParameter(
+                name='since_cursor', description='`since_cursor` of the last response with `since_id` or `since_cursor`.', type=str),
         ],
     )
     def list(self, request: Request, *args, **kwargs):
@@ -135,10 +164,24 @@ class PostViewSet(viewsets.ModelViewSet):
         - `search` (str): To find posts that contains in his body the "value".\n
         - `page` (int): Page to get.\n
         - `page_size` (int): Amount of posts to get.\n
+        - `normalize` (str): With `users`, each user is replaced by his `user_handle`,
+        and the response have a `users` object with the users by handle.\n
+        - `fields` (str): Comma separated fields of the posts to get (e.g. `id,body,user,num_likes`).
+        By default all, without relations if `expand` is not sent.\n
+        - `expand` (str): Comma separated relations of the posts to get: `quote`, `poll`,
+        `hashtags` and `users-mention`. By default all, unless `fields` is sent.\n
+        - `since_id` (int): ID of the newest post of the feed that the client has. The response
+        have only the posts of the followed users published after it (see below).\n
+        - `since_cursor` (str): Like `since_id`, the `since_cursor` of the last response.\n
 
         ### Response (Success):\n
         - `200 OK`:\n
 
+        - With `since_id` or `since_cursor`:\n
+            - `since_cursor` (str): Cursor of the newest post of the response, for the next request.\n
+            - `has_more` (bool): If there are more new posts, to get with `since_cursor`.\n
+            - `results` (list): Up to `page_size` new posts, the newest first.\n
+
         - #### Post Object:\n
             - `id` (int): Unique identifier for the post.\n
             - `body` (str): Content of the post.\n
@@ -170,7 +213,12 @@ class PostViewSet(viewsets.ModelViewSet):
                 - `option1` to `option4` (object): Information about each poll option.\n
                     - `option` (str): Text of the poll option.\n
                     - `votes` (int): Number of votes for the option.\n
-            - `quote` (object, optional): Information about the quoted post.\n\n
+            - `quote` (object, optional): Information about the quoted post.\n
+            - `liked_by_me` (bool): If the authenticated user liked the post.\n
+            - `reposted_by_me` (bool): If the authenticated user reposted the post.\n
+            - `my_poll_vote` (object, nullable): Option voted by the authenticated user in the post's poll.\n
+                - `id` (int): ID of the option.\n
+                - `option` (str): Text of the option.\n\n
         - #### Liked Post Objects:\n
             - `liked_by` (object): User who liked or reposted the post.\n
                 - Fields are the same as the user object.\n
@@ -189,6 +237,11 @@ class PostViewSet(viewsets.ModelViewSet):
         If the user is not authenticated.\n
 
         """
+        since_cursor = request.GET.get('since_cursor', None)
+        since_id = request.GET.get('since_id', None)
+        if since_cursor is not None or since_id is not None:
+            return self._list_since(request, since_cursor, since_id)
+
         lookup_search = self.request.GET.get('search', None)
 
         if lookup_search:
@@ -198,46 +251,338 @@ class PostViewSet(viewsets.ModelViewSet):
                     {'detail': f'Not found post that contains {lookup_search}.'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            posts_serializer = ListPostSerializer(posts, many=True)
-            serialized_data = posts_serializer.data
+            feed_items = project(posts, ListPostSerializer)
 
         else:
             rest_query = self.get_queryset()
 
-            posts_serializer, liked_serializer, repost_serializer = self.get_serializer_class()
             if type(rest_query) == dict:
+                feed_items = list(project(rest_query['posts'], ListPostSerializer)) + \
+                    list(project(rest_query['liked_posts'], ListLikedPostSerializer)) + \
+                    list(project(rest_query['reposted_posts'], ListRepostPostSerializer)) + \
+                    list(project(rest_query['others'], ListPostSerializer))
+            else:
+                feed_items = project(rest_query, ListPostSerializer)
+
+        # Paginate the instances and serialize only the page.
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(feed_items, request, view=self)
+
+        page_posts = [
+            item if isinstance(item, Post) else item.post for item in page]
+        context = self._get_posts_context(request, page_posts)
+        serialized_data = self._serialize_feed_page(page, context)
+
+        self._posts_add_view(set(post.id for post in page_posts))
+
+        response = paginator.get_paginated_response(serialized_data)
+        if context['users'] is not None:
+            response.data['users'] = context['users']
+        return response
+
+    def _list_since(self, request, since_cursor, since_id):
+        """
+        The posts of the followed users after the head of the client's feed, the
+        oldest first until `page_size`, so a client polling with the returned
+        `since_cursor` gets all of them without gaps.
+        """
+        head = get_feed_head(since_cursor, since_id)
+        if head is None:
+            return Response({'detail': 'since_id or since_cursor are not valid.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_size = self.pagination_class().get_page_size(request)
+        posts = list(project(get_new_feed_posts(request.user, head), ListPostSerializer).order_by(
+            'date_to_publish', 'id')[:page_size + 1])
+        has_more = len(posts) > page_size
+        posts = posts[:page_size]
+        if posts:
+            head = (posts[-1].date_to_publish, posts[-1].id)
+        posts.reverse()
+
+        context = self._get_posts_context(request, posts)
+        serializer = ListPostSerializer(posts, many=True, context=context)
+
+        self._posts_add_view(set(post.id for post in posts))
+
+        data = {
+            'since_cursor': encode_feed_cursor(*head),
+            'has_more': has_more,
+            'results': serializer.data,
+        }
+        if context['users'] is not None:
+            data['users'] = context['users']
+        return Response(data)
+
+    @extend_schema(
+        responses={200: DummySerializer},
+        parameters=[
+            OpenApiParameter(
+                name='since_id', description='ID of the newest post of the feed already seen.', type=int),
+            OpenApiParameter(
+                name='since_cursor', description='`since_cursor` of the feed.', type=str),
+        ],
+    )
+    @action(detail=False, methods=['GET'], url_path='feed/new-count')
+    def feed_new_count(self, request: Request, *args, **kwargs):
+        """
+        Count the new posts of the home feed.\n
+
+        The amount of posts of the followed users published after the newest post that the
+        client has, to know if the feed must be refreshed. Counted with one query on the
+        index of the published posts, until `100`.\n
+
+        ### URL Parameters :\n
+        - `since_id` (int): ID of the newest post of the feed that the client has.\n
+        - `since_cursor` (str): Or the `since_cursor` of the last response of the feed.\n
+
+        ### Response (Success):\n
+        - `200 OK`:\n
+            - `count` (int): Amount of new posts, up to `100`.\n
+            - `has_more` (bool): If there are more than `100` new posts.\n
+
+        ### Response (Failure):\n
+        - `400 Bad Request`:
+        If `since_id` and `since_cursor` are missing or not valid.\n
+        - `401 Unauthorized`:
+        Not authenticated user.\n
+        """
+        since_cursor = request.GET.get('since_cursor', None)
+        since_id = request.GET.get('since_id', None)
+        head = None
+        if since_cursor is not None or since_id is not None:
+            head = get_feed_head(since_cursor, since_id)
+        if head is None:
+            return Response({'detail': 'since_id or since_cursor are required and must be valid.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_count = 100
+        count = get_new_feed_posts(request.user, head)[:max_count + 1].count()
+        return Response({'count': min(count, max_count), 'has_more': count > max_count})
+
+    @extend_schema(
+        responses={200: ListPostSerializer(many=True)},
+        parameters=[
+            OpenApiParameter(
+                name='ids', description='Comma separated IDs of the posts to get (max 100).', type=str),
+            OpenApiParameter(
+                name='normalize', description='`users` to reference the users by handle.', type=str),
+            OpenApiParameter(
+                name='fields', description='Comma separated fields of the posts to get.', type=str),
+            OpenApiParameter(
+                name='expand', description='Comma separated relations of the posts to get.', type=str),
+        ],
+    )
+    @action(detail=False, methods=['GET'], url_path='batch')
+    def batch(self, request: Request, *args, **kwargs):
+        """
+        Retrieve a group of posts by their IDs.\n
 
-                posts,  liked, repost, other = rest_query['posts'], rest_query[
-                    'liked_posts'], rest_query['reposted_posts'], rest_query['others']
+        For the clients that render posts referenced by other objects (notifications, quote
+        cards, deep links), in one request instead of one for each post. The posts, their
+        relations and the state of the user with them are read in a constant number of
+        queries, whatever the amount of posts, and their views are counted once.\n
 
-                posts_serializer_data = posts_serializer(posts, many=True)
-                liked_serializer_data = liked_serializer(liked, many=True)
-                repost_serializer_data = repost_serializer(repost, many=True)
-                other_posts_serializer_data = posts_serializer(
-                    other, many=True)
+        ### URL Parameters :\n
+        - `ids` (str): Comma separated IDs of the posts, up to `100`.\n
+        - `fields`, `expand`, `normalize`: as in the list of posts.\n
 
-                serialized_data = posts_serializer_data.data + \
-                    liked_serializer_data.data + repost_serializer_data.data
+        ### Response (Success):\n
+        - `200 OK`:\n
+            - `results` (list): The posts found, in the order of `ids`, with the same fields
+            than the list of posts.\n
+            - `not_found` (list): IDs of the posts that do not exist or are not published.\n
+            - `forbidden` (list): IDs of the posts of users that blocked the user.\n
+            - `users` (object, optional): The users by handle, with `normalize=users`.\n
 
-                serialized_data += other_posts_serializer_data.data
+        ### Response (Failure):\n
+        - `400 Bad Request`:
+        If `ids` is missing or not valid.\n
+        - `401 Unauthorized`:
+        Not authenticated user.\n
+        """
+        try:
+            posts_ids = get_batch_keys(request, 'ids', int)
+        except ValueError:
+            return Response({'detail': f'ids must be between 1 and {settings.BATCH_MAX_KEYS} post IDs.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = project(Post.objects.published(), ListPostSerializer).in_bulk(posts_ids)
+        # The same blocks than `is_request_user_blocked`, read once for all the posts.
+        blocked_by = get_blocked_by_handles(request.user)
+
+        posts, not_found, forbidden = [], [], []
+        for post_id in posts_ids:
+            post = found.get(post_id, None)
+            if post is None:
+                not_found.append(post_id)
+            elif post.user_id in blocked_by:
+                forbidden.append(post_id)
             else:
-                posts_serializer_data = posts_serializer(rest_query, many=True)
-                serialized_data = posts_serializer_data.data
+                posts.append(post)
+
+        context = self._get_posts_context(request, posts)
+        serializer = ListPostSerializer(posts, many=True, context=context)
+        if posts:
+            self._posts_add_view(set(post.id for post in posts))
+
+        data = {
+            'results': serializer.data,
+            'not_found': not_found,
+            'forbidden': forbidden,
+        }
+        if context['users'] is not None:
+            data['users'] = context['users']
+        return Response(data)
 
-        paginator = self.pagination_class()
-        paginated_data = paginator.paginate_queryset(
-            serialized_data, request, view=self)
+    @extend_schema(
+        responses={200: DummySerializer},
+        parameters=[
+            OpenApiParameter("user_handle", str, OpenApiParameter.PATH),
+            OpenApiParameter(
+                name='cursor', description='`next` cursor of the previous page.', type=str),
+            OpenApiParameter(
+                name='page_size', description='Amount of results per page.', type=int),
+            OpenApiParameter(
+                name='normalize', description='`users` to reference the users by handle.', type=str),
+            OpenApiParameter(
+                name='fields', description='Comma separated fields of the posts to get.', type=str),
+            OpenApiParameter(
+                name='expand', description='Comma separated relations of the posts to get.', type=str),
+        ],
+    )
+    def user_posts(self, request: Request, user_handle=None, *args, **kwargs):
+        """
+        List the posts of a user.\n
 
-        posts_to_increment_views = set()
-        for item in paginated_data:
-            if 'id' in item:
-                posts_to_increment_views.add(item['id'])
-            elif 'post' in item and 'id' in item['post']:
-                posts_to_increment_views.add(item['post']['id'])
+        The timeline of the profile of a user: his published posts and his reposts, the
+        newest first by the date of publication of the posts and the date of the reposts.
+        Each page is read with one query on each index (posts and reposts of the user by
+        date), whatever the depth of the page.\n
 
-        self._posts_add_view(posts_to_increment_views)
+        ### Path Parameter:\n
+        - `user_handle` (str): Handle of the user.\n
 
-        return paginator.get_paginated_response(paginated_data)
+        ### URL Parameters :\n
+        - `cursor` (str): Cursor of the page to get, from the `next` link of the previous page.\n
+        - `page_size` (int): Amount of items to get.\n
+        - `fields`, `expand`, `normalize`: as in the list of posts.\n
+
+        ### Response (Success):\n
+        - `200 OK`:\n
+            - `next` (str, nullable): Link of the next page.\n
+            - `results` (list): Post objects and Repost Post objects, as in the list of posts.\n
+            - `users` (object, optional): The users by handle, with `normalize=users`.\n
+
+        ### Response (Failure):\n
+        - `400 Bad Request`:
+        If `cursor` is not valid.\n
+        - `401 Unauthorized`:
+        Not authenticated user.\n
+        - `403 Forbidden`:
+        The user blocked the authenticated user.\n
+        - `404 Not Found`:
+        The user not exists or is inactive.\n
+        """
+        user = get_object_or_404(User, user_handle=user_handle, is_active=True)
+        if is_request_user_blocked(owner=user, request_user=request.user):
+            return Response({'detail': 'You do not have permission to access this information.'}, status=status.HTTP_403_FORBIDDEN)
+
+        post_head = repost_head = None
+        cursor = request.GET.get('cursor', None)
+        if cursor is not None:
+            heads = decode_timeline_cursor(cursor)
+            if heads is None:
+                return Response({'detail': 'cursor is not valid.'}, status=status.HTTP_400_BAD_REQUEST)
+            post_head, repost_head = heads
+
+        posts = project(Post.objects.published().filter(user=user), ListPostSerializer)
+        # Not the reposts of posts of the users that blocked the authenticated user.
+        reposts = project(Repost.objects.filter(user=user, post__status=Post.PUBLISHED).exclude(
+            post__user__in=get_blocked_by_handles(request.user)), ListRepostPostSerializer)
+
+        paginator = self.pagination_class()
+        page, post_head, repost_head, has_more = get_timeline_page(
+            posts, reposts, post_head, repost_head, paginator.get_page_size(request))
+
+        page_posts = [
+            item if isinstance(item, Post) else item.post for item in page]
+        context = self._get_posts_context(request, page_posts)
+        serialized_data = self._serialize_feed_page(page, context)
+
+        if page_posts:
+            self._posts_add_view(set(post.id for post in page_posts))
+
+        next_link = None
+        if has_more:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'cursor', encode_timeline_cursor(post_head, repost_head))
+        data = {'next': next_link, 'results': serialized_data}
+        if context['users'] is not None:
+            data['users'] = context['users']
+        return Response(data)
+
+    def _get_posts_context(self, request, posts):
+        """
+        Serializer context for a page of posts: the viewer state, the cached fragments,
+        the results of the polls, the `users` table and the fieldset asked by the client.
+        """
+        fieldset = SparseFieldset.from_request(request)
+        polls = load_post_polls(posts, fieldset)
+        return {
+            'request': request,
+            'viewer_state': self._get_viewer_state(
+                request, fieldset, set(post.id for post in posts)),
+            'fragments': load_post_fragments(posts, fieldset, polls),
+            'polls': polls,
+            'users': get_users_table(request),
+            'post_fields': fieldset,
+        }
+
+    def _get_post_stamps(self, pk):
+        """
+        Get with one query the values that change when the detail of a post
+        change: his version, the last modification of the post and the author,
+        and the amount, versions and last modification of the published replies.
+        """
+        published = Q(parent_post__reply__status=Post.PUBLISHED)
+        stamps = Post.objects.published().filter(id=pk).values(
+            'user', 'version', 'modify_at', 'user__modify_at'
+        ).annotate(
+            replies_amount=Count('parent_post', filter=published),
+            replies_version=Sum('parent_post__reply__version', filter=published),
+            replies_modified=Max('parent_post__reply__modify_at', filter=published),
+        )
+        return next(iter(stamps), None)
+
+    def _get_viewer_state(self, request, fieldset, posts_ids):
+        # Not read the likes, reposts and votes of the user if not rendered.
+        if any(fieldset.has_field(field) for field in ListPostSerializer.viewer_fields):
+            return get_viewer_state(request.user, posts_ids)
+        return None
+
+    def _serialize_feed_page(self, page, context):
+        """
+        Serialize a page of feed items (`Post`, `Likes` or `Repost`) keeping the order,
+        with one serializer for each run of items of the same type.
+        """
+        posts_serializer, liked_serializer, repost_serializer = self.get_serializer_class()
+        serializers_by_type = {
+            Post: posts_serializer,
+            Likes: liked_serializer,
+            Repost: repost_serializer,
+        }
+
+        serialized_data = []
+        run = []
+        for item in page:
+            if run and type(run[-1]) != type(item):
+                serialized_data += serializers_by_type[type(run[-1])](
+                    run, many=True, context=context).data
+                run = []
+            run.append(item)
+        if run:
+            serialized_data += serializers_by_type[type(run[-1])](
+                run, many=True, context=context).data
+
+        return serialized_data
 
     @extend_schema(
         request=CreatePostSerializer,
@@ -279,8 +624,7 @@ class PostViewSet(viewsets.ModelViewSet):
         if post_serializer.is_valid():
             try:
                 quote_post = post_serializer.validated_data['quote']
-                quote_post.num_repost += 1
-                quote_post.save()
+                update_post_counters(quote_post.id, num_repost=1)
             except:
                 quote_post = None
 
@@ -289,14 +633,13 @@ class PostViewSet(viewsets.ModelViewSet):
                 post = post_serializer.save(have_media=True)
             else:
                 post = post_serializer.save()
-                if quote_post:
+                if quote_post and post.status == Post.PUBLISHED:
                     Notification.objects.create(
                         sender=post.user,
                         recipient=quote_post.user,
                         notification_type='quote',
                         post=post,
                         header=f'{post.user} quote your post.',
-                        message=post.body,
                     )
 
             return Response(
@@ -346,6 +689,9 @@ class PostViewSet(viewsets.ModelViewSet):
             - `num_views` (int): Number of views on the post.\n
             - `quote` (object, optional): Details of the quoted post.\n
                 - (Same structure as `post` object)\n
+            - `liked_by_me` (bool): If the authenticated user liked the post.\n
+            - `reposted_by_me` (bool): If the authenticated user reposted the post.\n
+            - `my_poll_vote` (object, nullable): Option voted by the authenticated user in the post's poll.\n
 
             - `replies` (list, optional): List of replies to the post.\n
                 - (Same structure as `post` object)\n
@@ -358,28 +704,175 @@ class PostViewSet(viewsets.ModelViewSet):
         - `404 Not Found`:
         Post not found.\n
 
+        ### Conditional requests:\n
+        The response have a weak `ETag` and a `Last-Modified`, from the versions of the post
+        and his replies and the last modification of the author. With a matching
+        `If-None-Match` (or `If-Modified-Since`) the response is `304 Not Modified`,
+        without body and without count a view.\n
         """
         try:
+            stamps = self._get_post_stamps(pk)
+            if stamps is None:
+                return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-            post, replies = self.get_queryset(lookup=pk)
             blocked = is_request_user_blocked(
-                post=post, request_user=request.user)
+                owner=stamps['user'], request_user=request.user)
             if blocked:
                 return Response({'detail': 'You do not have permission to access this information.'}, status=status.HTTP_401_UNAUTHORIZED)
 
+            etag = get_etag(request, *stamps.values())
+            last_modified = max(filter(None, [
+                stamps['modify_at'], stamps['user__modify_at'], stamps['replies_modified']]))
+            not_modified = get_not_modified_response(
+                request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            post, replies = self.get_queryset(lookup=pk)
+
+            replies = [reply.reply for reply in replies]
+            fieldset = SparseFieldset.from_request(request)
+            viewer_state = self._get_viewer_state(
+                request, fieldset, [post.id] + [reply.id for reply in replies])
+            polls = load_post_polls([post] + replies, fieldset)
+
             serializer = self.get_serializer_class()(
-                {'post': post, 'replies': [reply.reply for reply in replies]})
+                {'post': post, 'replies': replies},
+                context={
+                    'request': request,
+                    'viewer_state': viewer_state,
+                    'fragments': load_post_fragments([post] + replies, fieldset, polls),
+                    'polls': polls,
+                    'post_fields': fieldset,
+                })
             post_ids = set()
             post_ids.add(post.id)
 
             self._posts_add_view(post_ids)
-            return Response(serializer.data)
+            return set_validators(Response(serializer.data), etag, last_modified)
 
         except Post.DoesNotExist:
             return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
         except:
             return Response({'detail': 'An error occurred.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @extend_schema(
+        responses={200: ListPostSerializer(many=True)},
+        parameters=[
+            OpenApiParameter(
+                name='depth', description='Levels of replies to get (max 10).', type=int),
+            OpenApiParameter(
+                name='fan_out', description='Replies to get for each post (max 50).', type=int),
+            OpenApiParameter(
+                name='after', description='ID of the last direct reply already seen.', type=int),
+            OpenApiParameter(
+                name='normalize', description='`users` to reference the users by handle.', type=str),
+            OpenApiParameter(
+                name='fields', description='Comma separated fields of the posts to get.', type=str),
+            OpenApiParameter(
+                name='expand', description='Comma separated relations of the posts to get.', type=str),
+        ],
+    )
+    @action(detail=True, methods=['GET'], url_path='thread')
+    def thread(self, request: Request, pk=None, *args, **kwargs):
+        """
+        Retrieve the conversation thread of a post.\n
+
+        The replies of the post, and the replies of the replies, until `depth` levels.
+        The response is a flat list where each post have a pointer to his parent.\n
+
+        ### Path Parameter:\n
+        - `id` (int): ID of the post that starts the thread.\n
+
+        ### URL Parameters :\n
+        - `depth` (int): Levels of replies to get, by default 3 (max 10).\n
+        - `fan_out` (int): Replies to get for each post, by default 10 (max 50). The oldest first.\n
+        - `after` (int): ID of the last direct reply of the post already seen, to get the next page.\n
+            - To get more replies of a deeper post, get the thread of that post.\n
+        - `normalize` (str): With `users`, each user is replaced by his `user_handle`,
+        and the response have a `users` object with the users by handle.\n
+        - `fields` (str): Comma separated fields of the posts to get (e.g. `id,body,user,num_likes`).
+        By default all, without relations if `expand` is not sent.\n
+        - `expand` (str): Comma separated relations of the posts to get: `quote`, `poll`,
+        `hashtags` and `users-mention`. By default all, unless `fields` is sent.\n
+
+        ### Response (Success):\n
+        - `200 OK`:\n
+            - `next` (str, nullable): Link to the next page of direct replies.\n
+            - `results` (list): Posts of the thread, the first is the post of the path.\n
+                - (Same structure as post object of the posts list)\n
+                - `parent` (int, nullable): ID of the post replied.\n
+                - `depth` (int): Level of the post in the thread, 0 for the first post.\n
+                - `has_more_replies` (bool): If the post have replies that are not in the results.\n
+
+        ### Response (Failure):\n
+        - `400 Bad Request`:
+        If `depth`, `fan_out` or `after` are not integers.\n
+        - `401 Unauthorized`:
+        Not authenticated user.\n
+        - `403 FORBIDDEN`:
+        If the requesting user is blocked from accessing the post.\n
+        - `404 Not Found`:
+        Post not found.\n
+        """
+        try:
+            depth = min(max(int(request.GET.get('depth', 3)), 1), 10)
+            fan_out = min(max(int(request.GET.get('fan_out', 10)), 1), 50)
+            after = int(request.GET.get('after', 0))
+        except ValueError:
+            return Response({'detail': 'depth, fan_out and after must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        root = get_object_or_404(
+            Post.objects.published().select_related('user'), id=pk)
+        blocked = is_request_user_blocked(post=root, request_user=request.user)
+        if blocked:
+            return Response({'detail': 'You do not have permission to access this information.'}, status=status.HTTP_403_FORBIDDEN)
+
+        nodes = get_thread_nodes(root.id, depth, fan_out, after)
+
+        posts = project(Post.objects.published(), ListPostSerializer).in_bulk(
+            [node[0] for node in nodes])
+        blocked_by = get_blocked_by_handles(request.user)
+
+        # Keep the replies visible for the user, and whose parent is visible.
+        thread = [(root, None, 0)]
+        kept = {root.id}
+        for post_id, parent_id, level in nodes:
+            post = posts.get(post_id, None)
+            if post is not None and parent_id in kept and post.user_id not in blocked_by:
+                kept.add(post_id)
+                thread.append((post, parent_id, level))
+
+        thread_posts = [post for post, _, _ in thread]
+        context = self._get_posts_context(request, thread_posts)
+        users = context['users']
+        serializer = ListPostSerializer(
+            thread_posts, many=True, context=context)
+
+        children = {}
+        for _, parent_id, _ in thread:
+            children[parent_id] = children.get(parent_id, 0) + 1
+
+        results = []
+        for (post, parent_id, level), data in zip(thread, serializer.data):
+            data['parent'] = parent_id
+            data['depth'] = level
+            data['has_more_replies'] = post.num_replies > children.get(
+                post.id, 0)
+            results.append(data)
+
+        first_level = [node for node in nodes if node[2] == 1]
+        next_link = None
+        if len(first_level) == fan_out:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'after', first_level[-1][0])
+
+        self._posts_add_view({root.id})
+
+        if users is not None:
+            return Response({'next': next_link, 'results': results, 'users': users})
+        return Response({'next': next_link, 'results': results})
+
     @extend_schema(request=DummySerializer, responses={405: DummySerializer})
     def update(self, request: Request, pk=None, *args, **kwargs):
         """ 
@@ -408,7 +901,7 @@ class PostViewSet(viewsets.ModelViewSet):
 
         ### Response (Success):\n
         - `204 No Content`:
-        Post successfully deleted.\n\n
+        Post successfully deleted. The likes, reposts, replies links and the poll of the post are removed in background.\n\n
 
         ### Response (Failure):\n
         - `401 Unauthorized`:
@@ -422,46 +915,99 @@ class PostViewSet(viewsets.ModelViewSet):
         post, replies = self.get_queryset(lookup=pk)
 
         if request.user == post.user:
-            parents = PostReply.objects.select_related(
-                'parent').filter(reply=post)
-            if parents.exists():
-                parents[0].parent.num_replies -= 1
-                parents[0].parent.save()
-
-            post.delete()
+            # The post and his relations are deleted later by the purge worker.
+            with transaction.atomic():
+                Post.objects.filter(id=post.id).update(status=Post.DELETED)
+                # The cached quote cards of the post are rendered again, without it.
+                bump_posts_version(Post.objects.filter(quote=post.id).values('id'))
 
             return Response({}, status=status.HTTP_204_NO_CONTENT)
         else:
             return Response({'detail': 'Unauthorize to perform this action'}, status=status.HTTP_403_FORBIDDEN)
 
 
+INTERACTION_USERS_PARAMETERS = [
+    OpenApiParameter(
+        name='cursor', description='Cursor of the page, from the `next` link.', type=str),
+    OpenApiParameter(
+        name='page_size', description='Amount of results per page.', type=int),
+    OpenApiParameter(
+        name='followed_first', description='Put first the users followed by the authenticated user.', type=bool),
+]
+
+
+def list_interaction_users(request, queryset, count):
+    """
+    Keyset paginated response with the users of a `Likes` or `Repost` queryset, newest first.
+
+    With `followed_first=true` the users followed by the request user come first,
+    reading the queryset as two streams (followed and not followed users).
+    The total is the denormalized counter of the post (`count`). A `cursor` not
+    valid is answered with `400 Bad Request`.
+    """
+    if request.query_params.get('followed_first', 'false').lower() == 'true':
+        following = Follower.objects.filter(
+            follower=request.user).values('following')
+        streams = [
+            queryset.filter(user__user_handle__in=following),
+            queryset.exclude(user__user_handle__in=following),
+        ]
+    else:
+        streams = [queryset]
+
+    streams = [
+        stream.select_related('user').only(
+            'user', *get_only_fields(ListSimpleUserSerializer, 'user__'))
+        for stream in streams
+    ]
+
+    paginator = KeysetPagination()
+    try:
+        page = paginator.paginate_streams(streams, request)
+    except ValueError:
+        return Response({'detail': 'cursor is not valid.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    users_serializer = ListSimpleUserSerializer(
+        [item.user for item in page], many=True)
+    return paginator.get_paginated_response(users_serializer.data, count)
+
+
 class LikePostAPIView(GenericAPIView):
 
     permission_classes = [IsAuthenticated,]
     serializer_class = DummySerializer
 
-    @extend_schema(responses={200: ListSimpleUserSerializer(many=True)})
+    @extend_schema(
+        responses={200: ListSimpleUserSerializer(many=True)},
+        parameters=INTERACTION_USERS_PARAMETERS
+    )
     def get(self, request: Request, pk=None, *args, **kwargs):
         '''
-        Retrieve the list of users who liked a specific post.
+        Retrieve the list of users who liked a specific post, the most recent first.
 
         ### Path Parameter:
         - `id` (int): ID of the post that want to get the likes.
 
+        ### URL Parameters :\n
+        - `cursor` (str): Cursor of the page to get, from the `next` link.\n
+        - `page_size` (int): Amount of users to get.\n
+        - `followed_first` (bool): Put first the users followed by the authenticated user.\n
+
         ### Response (Success):
         - `200 OK` :
-        List of user objects that like the post.\n
-            - `user_handle` (str): User handle.\n
-            - `username` (str): Username.\n
-            - `profile_img` (str): URL to the user's profile image.\n
-            - `biography` (str): Profile Biography.\n
-            - `follower_amount` (int): Number of followers for the user.\n
-            - `following_amount` (int): Number of users the user is following.\n\n
-
-        - `200 OK` (No Likes):\n
-            - An empty response is returned if no users have liked the post.\n\n
+            - `count` (int): Total amount of likes of the post.\n
+            - `next` (str, nullable): Link to the next page.\n
+            - `results` (list): User objects that like the post.\n
+                - `user_handle` (str): User handle.\n
+                - `username` (str): Username.\n
+                - `profile_img` (str): URL to the user's profile image.\n
+                - `biography` (str): Profile Biography.\n
+                - `follower_amount` (int): Number of followers for the user.\n
+                - `following_amount` (int): Number of users the user is following.\n\n
 
         ### Response (Failure):\n
+        - `400 Bad Request`:
+        If `cursor` is not valid.\n
         - `401 Unauthorized`:
         Not authenticated user.\n
         - `403 FORBIDDEN`:
@@ -470,19 +1016,14 @@ class LikePostAPIView(GenericAPIView):
         Post not found.\n
         '''
         try:
-            Post.objects.get(id=int(pk))
+            post = Post.objects.published().select_related('user').get(id=int(pk))
             blocked = is_request_user_blocked(
-                post_pk=pk, request_user=request.user)
+                post=post, request_user=request.user)
             if blocked:
                 return Response({'detail': 'You do not have permission to access this information.'}, status=status.HTTP_403_FORBIDDEN)
 
-            likes = Likes.objects.select_related(
-                'user').filter(post=pk)
-            if len(likes) != 0:
-                posts_serializer = ListSimpleUserSerializer(
-                    [like.user for like in likes], many=True)
-                return Response(posts_serializer.data, status=status.HTTP_200_OK)
-            return Response({}, status=status.HTTP_200_OK)
+            likes = Likes.objects.select_related('user').filter(post=post)
+            return list_interaction_users(request, likes, post.num_likes)
         except Post.DoesNotExist:
             return Response({'detail': f'Post {pk} not found.'}, status=status.HTTP_404_NOT_FOUND)
         except:
@@ -511,7 +1052,7 @@ class LikePostAPIView(GenericAPIView):
         '''
         try:
 
-            post = Post.objects.select_related('user').get(id=int(pk))
+            post = Post.objects.published().select_related('user').get(id=int(pk))
             blocked = is_request_user_blocked(
                 post=post, request_user=request.user)
             if blocked:
@@ -522,18 +1063,10 @@ class LikePostAPIView(GenericAPIView):
 
             if not create:
                 return Response({"detail": "You've already liked this post."}, status=status.HTTP_400_BAD_REQUEST)
-            post.num_likes += 1
-            post.save()
+            update_post_counters(post.id, num_likes=1)
 
             if request.user != post.user:
-                Notification.objects.create(
-                    sender=request.user,
-                    recipient=post.user,
-                    notification_type='like',
-                    post=post,
-                    header=f'{request.user} like your post.',
-                    message=post.body,
-                )
+                notify_grouped(request.user, post.user, 'like', post)
 
             return Response({"detail": "Post liked."}, status=status.HTTP_201_CREATED)
         except Post.DoesNotExist:
@@ -562,13 +1095,12 @@ class LikePostAPIView(GenericAPIView):
 
         '''
         try:
-            post = Post.objects.get(id=int(pk))
+            post = Post.objects.published().get(id=int(pk))
             like = Likes.objects.get(user=request.user, post=post)
 
             like.delete()
 
-            post.num_likes -= 1
-            post.save()
+            update_post_counters(post.id, num_likes=-1)
 
             return Response({}, status=status.HTTP_204_NO_CONTENT)
 
@@ -584,28 +1116,37 @@ class RepostAPIView(GenericAPIView):
     permission_classes = [IsAuthenticated,]
     serializer_class = DummySerializer
 
-    @extend_schema(responses={200: ListSimpleUserSerializer(many=True)})
+    @extend_schema(
+        responses={200: ListSimpleUserSerializer(many=True)},
+        parameters=INTERACTION_USERS_PARAMETERS
+    )
     def get(self, request: Request, pk=None, *args, **kwargs):
         '''
-        Retrieve the list of users who repost a specific post.
+        Retrieve the list of users who repost a specific post, the most recent first.
 
         ### Path Parameter:
         - `id` (int): ID of the post that want to get the reposts.
 
+        ### URL Parameters :\n
+        - `cursor` (str): Cursor of the page to get, from the `next` link.\n
+        - `page_size` (int): Amount of users to get.\n
+        - `followed_first` (bool): Put first the users followed by the authenticated user.\n
+
         ### Response (Success):
         - `200 OK` :
-        List of user objects that repost the post.\n
-            - `user_handle` (str): User handle.\n
-            - `username` (str): Username.\n
-            - `profile_img` (str): URL to the user's profile image.\n
-            - `biography` (str): Profile Biography.\n
-            - `follower_amount` (int): Number of followers for the user.\n
-            - `following_amount` (int): Number of users the user is following.\n\n
-
-        - `200 OK` (No Reposts):\n
-            - An empty response is returned if no users have reposted the post.\n\n
+            - `count` (int): Total amount of reposts of the post.\n
+            - `next` (str, nullable): Link to the next page.\n
+            - `results` (list): User objects that repost the post.\n
+                - `user_handle` (str): User handle.\n
+                - `username` (str): Username.\n
+                - `profile_img` (str): URL to the user's profile image.\n
+                - `biography` (str): Profile Biography.\n
+                - `follower_amount` (int): Number of followers for the user.\n
+                - `following_amount` (int): Number of users the user is following.\n\n
 
         ### Response (Failure):\n
+        - `400 Bad Request`:
+        If `cursor` is not valid.\n
         - `401 Unauthorized`:
         Not authenticated user.\n
         - `403 FORBIDDEN`:
@@ -615,19 +1156,14 @@ class RepostAPIView(GenericAPIView):
         '''
 
         try:
-            Post.objects.get(id=int(pk))
+            post = Post.objects.published().select_related('user').get(id=int(pk))
             blocked = is_request_user_blocked(
-                post_pk=pk, request_user=request.user)
+                post=post, request_user=request.user)
             if blocked:
                 return Response({'detail': 'You do not have permission to access this information.'}, status=status.HTTP_403_FORBIDDEN)
 
-            reposts = Repost.objects.select_related(
-                'user').filter(post=pk)
-            if len(reposts) != 0:
-                posts_serializer = ListSimpleUserSerializer(
-                    [repost.user for repost in reposts], many=True)
-                return Response(posts_serializer.data, status=status.HTTP_200_OK)
-            return Response({}, status=status.HTTP_200_OK)
+            reposts = Repost.objects.select_related('user').filter(post=post)
+            return list_interaction_users(request, reposts, post.num_repost)
         except Post.DoesNotExist:
             return Response({'detail': "Post not found."}, status=status.HTTP_404_NOT_FOUND)
         except:
@@ -655,7 +1191,7 @@ class RepostAPIView(GenericAPIView):
         Post not found.\n
         '''
         try:
-            post = Post.objects.select_related('user').get(id=int(pk))
+            post = Post.objects.published().select_related('user').get(id=int(pk))
             blocked = is_request_user_blocked(
                 post=post, request_user=request.user)
             if blocked:
@@ -666,17 +1202,9 @@ class RepostAPIView(GenericAPIView):
 
             if not create:
                 return Response({"detail": "You've already repost this post."}, status=status.HTTP_400_BAD_REQUEST)
-            post.num_repost += 1
-            post.save()
+            update_post_counters(post.id, num_repost=1)
             if request.user != post.user:
-                Notification.objects.create(
-                    sender=request.user,
-                    recipient=post.user,
-                    notification_type='repost',
-                    post=post,
-                    header=f'{post.user} repost your post.',
-                    message=post.body,
-                )
+                notify_grouped(request.user, post.user, 'repost', post)
             return Response({"detail": "Post reposted."}, status=status.HTTP_201_CREATED)
         except Post.DoesNotExist:
             return Response({'detail': "Post not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -704,12 +1232,11 @@ class RepostAPIView(GenericAPIView):
 
         '''
         try:
-            post = Post.objects.get(id=int(pk))
+            post = Post.objects.published().get(id=int(pk))
             repost = Repost.objects.get(user=request.user, post=post)
 
             repost.delete()
-            post.num_repost -= 1
-            post.save()
+            update_post_counters(post.id, num_repost=-1)
 
             return Response({"detail": "Post repost undid."}, status=status.HTTP_204_NO_CONTENT)
 
@@ -721,10 +1248,11 @@ class RepostAPIView(GenericAPIView):
             return Response({'detail': 'Internal error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HashtagAPIView(GenericAPIView):
+class HashtagAPIView(ReplicaReadMixin, GenericAPIView):
     permission_classes = [IsAuthenticated,]
     serializer_class = DummySerializer
     pagination_class = GenericPagination
+    replica_actions = ('get',)
     lookup_field = 'tag'
 
     def get_queryset(self, lookup=None):
@@ -784,7 +1312,8 @@ class HashtagAPIView(GenericAPIView):
 
         '''
         if 'post' in request.data.keys():
-            post = get_object_or_404(Post, id=request.data['post'])
+            post = get_object_or_404(
+                Post.objects.alive(), id=request.data['post'])
 
             hashtags = re.findall(r'#\w+', post.body)
             processed_hashtags = False
@@ -802,6 +1331,7 @@ class HashtagAPIView(GenericAPIView):
                     continue
 
             if processed_hashtags:
+                bump_posts_version([post.id])
                 return Response({'detail': 'Hashtag/s created successfully.'}, status=status.HTTP_201_CREATED)
             else:
                 return Response({'detail': 'Body of post examined successfully and not found any hashtags.'}, status=status.HTTP_200_OK)
@@ -836,7 +1366,8 @@ class UserMentionAPIView(GenericAPIView):
 
         '''
         if 'post' in request.data.keys():
-            post = get_object_or_404(Post, id=request.data['post'])
+            post = get_object_or_404(
+                Post.objects.alive(), id=request.data['post'])
 
             users_mentions = re.findall(r'@\w+', post.body)
             processed_user_mention = False
@@ -850,19 +1381,20 @@ class UserMentionAPIView(GenericAPIView):
                     if not is_block:
                         UserMention.objects.create(user=user, post=post)
 
+                    if not is_block and post.status == Post.PUBLISHED:
                         Notification.objects.create(
                             sender=post.user,
                             recipient=user,
                             notification_type='mention',
                             post=post,
                             header=f'{post.user} mention you in a post.',
-                            message=post.body,
                         )
                     processed_user_mention = True
 
                 except:
                     continue
             if processed_user_mention:
+                bump_posts_version([post.id])
                 return Response({'detail': 'Mention/s created successfully.'}, status=status.HTTP_201_CREATED)
             else:
                 return Response({'detail': 'Body of post examined successfully and not found any mention.'}, status=status.HTTP_200_OK)
@@ -885,7 +1417,8 @@ class VoteOptionPollAPIView(GenericAPIView):
 
         ### Request:\n
         - `poll` (int): ID of the poll that have the option.\n
-        - `option` (string): Option where want to apply the vote.\n\n
+        - `option_id` (int): ID of the option where want to apply the vote.\n
+        - `option` (string): Text of the option, used without `option_id`.\n\n
 
         ### Response (Success):\n
         - `201 Created`:
@@ -903,7 +1436,7 @@ class VoteOptionPollAPIView(GenericAPIView):
 
         '''
         try:
-            post = Post.objects.select_related(
+            post = Post.objects.published().select_related(
                 'user').get(have_poll=True, id=pk)
         except:
             return Response({'detail': 'Post with poll not found.'}, status=status.HTTP_404_NOT_FOUND)
@@ -913,17 +1446,10 @@ class VoteOptionPollAPIView(GenericAPIView):
             return Response({'detail': 'You do not have permission to access this information.'}, status=status.HTTP_403_FORBIDDEN)
 
         option_serializer = self.serializer_class(
-            data=request.data, context={'user': request.user})
+            data=request.data, context={'user': request.user, 'post': post})
         if option_serializer.is_valid():
-            option = option_serializer.save()
-
-            opt = option.option
-            poll = option.poll
-
-            opt.votes += 1
-            opt.save()
-            poll.total_votes += 1
-            poll.save()
+            # The vote and the counters, see `posts.polls.vote`.
+            option_serializer.save()
 
             return Response({'detail': 'Vote successfully apply.'}, status=status.HTTP_201_CREATED)
         else:
@@ -935,15 +1461,162 @@ class NotificationsListAPIView(ListAPIView):
     permission_classes = [IsAuthenticated, ]
 
     def get_queryset(self):
-        return self.serializer_class.Meta.model.objects.filter(recipient_id=self.request.user)
+        # Bounded by date, to read only the last partitions of the table.
+        since = timezone.now() - timedelta(days=settings.NOTIFICATION_INBOX_DAYS)
+        return self.serializer_class.Meta.model.objects.filter(
+            recipient_id=self.request.user, create_at__gte=since).exclude(
+            post__status__in=[Post.DELETED, Post.HIDDEN])
+
+    def get_validators(self, request):
+        """
+        Get the `ETag` and the `Last-Modified` of the notifications, read by the
+        index of the recipient without render them.
+        """
+        stamps = self.get_queryset().aggregate(
+            amount=Count('id'),
+            modified=Max('modify_at'),
+            posts_version=Sum('post__version'),
+            posts_modified=Max('post__modify_at'),
+        )
+        etag = get_etag(request, *stamps.values())
+        last_modified = max(
+            filter(None, [stamps['modified'], stamps['posts_modified']]), default=None)
+        return etag, last_modified
 
     def get(self, request: Request, *args, **kwargs):
-        notifications = self.get_queryset()
+        # `304 Not Modified` without render the notifications when they did not change.
+        etag, last_modified = self.get_validators(request)
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        notifications = list(project(self.get_queryset(), self.serializer_class))
+        users = get_users_table(request)
+
+        # `fields` and `expand` select the fields of the notifications, the
+        # relations of the posts are expanded only by `expand`.
+        fieldset = SparseFieldset.from_request(request)
+        post_expand = fieldset.expand
+        if post_expand is None and fieldset.fields is not None:
+            post_expand = set()
+        post_fieldset = SparseFieldset(expand=post_expand)
+        polls = {}
+        if fieldset.has_relation('post'):
+            posts = [noti.post for noti in notifications if noti.post is not None]
+            prefetch_post_relations(posts, post_fieldset)
+            polls = load_post_polls(posts, post_fieldset)
+
+        senders = None
+        if fieldset.has_relation('recent_senders'):
+            senders = get_recent_senders(notifications)
+
         notifications_serializer = self.serializer_class(
-            notifications, many=True)
+            notifications, many=True, context={
+                'users': users,
+                'senders': senders,
+                'notification_fields': fieldset,
+                'post_fields': post_fieldset,
+                'polls': polls,
+            })
 
         notification_data = notifications_serializer.data.copy()
-        for noti in notifications:
-            noti.is_read = True
-            noti.save()
-        return Response(notification_data)
+        marked = self.get_queryset().filter(
+            id__in=[noti.id for noti in notifications], is_read=False
+        ).update(is_read=True, modify_at=timezone.now())
+        # The validators of the notifications once read, so the next request
+        # with them is answered with `304 Not Modified`.
+        if marked:
+            etag, last_modified = self.get_validators(request)
+        if users is not None:
+            response = Response({'results': notification_data, 'users': users})
+        else:
+            response = Response(notification_data)
+        return set_validators(response, etag, last_modified)
+
+
+def get_stream_user(request):
+    """
+    Authenticate the request of a stream with the JWT access token of the
+    `Authorization` header, or of the `token` URL parameter (an `EventSource`
+    can not send headers). Return None if it is not valid.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(
+        header) if header else request.GET.get('token', None)
+    if raw_token is None:
+        return None
+    try:
+        user = authentication.get_user(
+            authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return user if user.is_active else None
+
+
+async def stream_events(subscription, heartbeat=15, max_duration=60 * 5):
+    """
+    Write the events of a subscription as server-sent events, with a comment
+    each `heartbeat` seconds without events. The stream is closed after
+    `max_duration` seconds and the client reconnects, to free the subscriptions
+    of the clients gone.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_duration
+    try:
+        yield 'retry: 3000\n\n'
+        while loop.time() < deadline:
+            try:
+                event = await subscription.get(
+                    timeout=min(heartbeat, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if event['id'] is not None:
+                yield f'id: {event["id"]}\n'
+            yield f'event: {event["event"]}\ndata: {json.dumps(event["data"])}\n\n'
+    finally:
+        subscription.close()
+
+
+async def events_stream(request):
+    """
+    Stream of server-sent events of the authenticated user. Served by the ASGI
+    application, each connection waits on a queue without a thread.\n
+
+    ### URL Parameters :\n
+    - `token` (str): Access token, when the `Authorization` header can not be sent.\n
+
+    ### Events:\n
+    - `notification`: A new notification of the user, or a new like, repost or follow of a grouped notification. The event `id` is the notification ID.\n
+        - `id` (int), `notification_type` (str), `header` (str), `post` (int, nullable), `count` (int).\n
+    - `feed`: A new post of a followed user, get it with the `since_cursor` of the feed.\n
+        - `post` (int): ID of the post.\n
+        - `user` (str): Handle of the author.\n
+
+    ### Response (Failure):\n
+    - `401 Unauthorized`:
+    Not authenticated user.\n
+    - `503 Service Unavailable`:
+    The worker have the maximum of connections, retry later.\n
+    """
+    user = await sync_to_async(get_stream_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Not authenticated user.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    followings = await sync_to_async(list)(
+        Follower.objects.filter(follower=user).values_list('following', flat=True))
+    channels = [f'user:{user.pk}'] + \
+        [f'author:{handle}' for handle in followings]
+    try:
+        subscription = broker.subscribe(channels)
+    except BrokerFull:
+        return JsonResponse({'detail': 'Too many connections, retry later.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    get_backend().start()
+
+    response = StreamingHttpResponse(
+        stream_events(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Not buffer the events in the proxy.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -39,6 +39,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.dbrouters.PrimaryStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -181,3 +182,81 @@ enabling rapid access to vast datasets while maintaining scalability and perform
 }
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+
+# Cache shared by all the processes (API, events and jobs workers): the fragments
+# of the posts, the results of the polls and the stickiness to the primary. Redis
+# at `CACHE_URL` (e.g. `redis://cache:6379/0`); without it each process has his
+# own memory cache, only for development and tests (see `core.checks`).
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Events of the streams (`/events/`): `core.pubsub.LocalBackend` deliver them only
+# in the process that publish them, `core.pubsub.PostgresBackend` to all the
+# processes with LISTEN/NOTIFY.
+PUBSUB_BACKEND = os.environ.get('PUBSUB_BACKEND', 'core.pubsub.LocalBackend')
+# Connections of a process, and events waiting by connection.
+PUBSUB_MAX_SUBSCRIPTIONS = 10000
+PUBSUB_QUEUE_SIZE = 32
+
+# Seconds of the window in which the likes, reposts and follows of a post (or
+# user) are grouped in one notification.
+NOTIFICATION_GROUP_WINDOW = 60 * 60 * 24
+# Days a read notification is kept before `prune_notifications` archive it.
+NOTIFICATION_RETENTION_DAYS = 90
+# Days of notifications shown in the inbox, the older are never read again.
+NOTIFICATION_INBOX_DAYS = 365
+
+# Tables partitioned by month of `create_at` on PostgreSQL (see
+# `core.partitions`), comma separated: `posts_notification` and
+# `posts_archivednotification`.
+PARTITIONED_TABLES = [
+    table for table in os.environ.get('PARTITIONED_TABLES', '').split(',') if table]
+
+# Replicas of `default` (aliases of `DATABASES`) for the reads of the read-only
+# endpoints, see `core.dbrouters`.
+DATABASE_ROUTERS = ['core.dbrouters.ReplicaRouter']
+DATABASE_REPLICAS = []
+# Seconds the reads of a user stay in `default` after he writes, kept in the
+# shared cache to be seen by all the workers.
+DATABASE_REPLICA_STICKY_SECONDS = 10
+# Seconds a replica can be behind `default` to be used, and between the checks.
+DATABASE_REPLICA_MAX_LAG = 5
+DATABASE_REPLICA_LAG_CHECK = 5
+
+# Objects that can be asked in one request to the batch endpoints.
+BATCH_MAX_KEYS = 100
+# Sub-requests of a `/batch/` request, and how many of them run at the same time
+# (1 to run them one after the other, with the connection of the request).
+BATCH_MAX_REQUESTS = 10
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 4))
+
+# Seconds the results of the live polls are cached (written by each vote), and
+# of the ended polls. The polls are frozen `POLL_FREEZE_DELAY` seconds after end.
+POLL_RESULTS_TIMEOUT = 60
+POLL_FROZEN_RESULTS_TIMEOUT = 60 * 60 * 24
+POLL_FREEZE_DELAY = 60
+
+# Background jobs (`core.jobs`): tasks enqueued periodically, by seconds.
+JOB_SCHEDULES = {
+    'posts.publish_due_posts': 10,
+    'posts.purge_deleted_posts': 60,
+    'posts.freeze_polls': 60,
+    'posts.prune_notifications': 60 * 60,
+    'posts.manage_partitions': 60 * 60 * 24,
+    'core.prune_jobs': 60 * 60,
+}
+# Seconds a job can run before another worker takes it again.
+JOB_LOCK_TIMEOUT = 60 * 10
+# Seconds the jobs done are kept, with their idempotency keys.
+JOB_RETENTION = 60 * 60 * 24 * 7
@@ -15,10 +15,19 @@ DATABASES = {
         'USER': os.environ.get('DATABASE_USER'),
         'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
         'HOST': os.environ.get('DATABASE_HOST'),
-        'POST': os.environ.get('DATABASE_POST'),
+        'PORT': os.environ.get('DATABASE_PORT', os.environ.get('DATABASE_POST')),
     }
 }
 
+# A replica, used when `DATABASE_REPLICA_NAME` is set. In the tests it mirrors
+# the test database.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('DATABASE_REPLICA_NAME', DATABASES['default']['NAME']),
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = ['replica'] if os.environ.get('DATABASE_REPLICA_NAME') else []
+
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static'
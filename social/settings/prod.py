@@ -8,6 +8,11 @@ DEBUG = bool(int(os.environ.get('DEBUG')))
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS').split(',')
 
+# The connections are kept open between the requests of a thread for
+# `DATABASE_CONN_MAX_AGE` seconds, checked before reuse. With the ENGINE
+# `core.db.backends.postgresql` (and `DATABASE_CONN_MAX_AGE=0`) they are taken
+# from a pool of the process instead, for the ASGI workers. Behind PgBouncer in
+# transaction mode set `DATABASE_PGBOUNCER=1`: no server-side cursors.
 DATABASES = {
     'default': {
         'ENGINE': os.environ.get('DATABASE_ENGINE'),
@@ -15,10 +20,35 @@ DATABASES = {
         'USER': os.environ.get('DATABASE_USER'),
         'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
         'HOST': os.environ.get('DATABASE_HOST'),
-        'POST': os.environ.get('DATABASE_PORT'),
+        'PORT': os.environ.get('DATABASE_PORT'),
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': bool(int(os.environ.get('DATABASE_PGBOUNCER', 0))),
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DATABASE_POOL_SIZE', 20)),
+            'TIMEOUT': 10,
+        },
     }
 }
 
+# The LISTEN of the events needs a session of the server, not the connections
+# of PgBouncer in transaction mode: `DATABASE_DIRECT_HOST` (and PORT) connects
+# to PostgreSQL itself.
+if os.environ.get('DATABASE_DIRECT_HOST'):
+    DATABASES['direct'] = {
+        **DATABASES['default'],
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': os.environ.get('DATABASE_DIRECT_HOST'),
+        'PORT': os.environ.get('DATABASE_DIRECT_PORT'),
+        'CONN_MAX_AGE': 0,
+    }
+    PUBSUB_LISTEN_DATABASE = 'direct'
+
+# Hosts of the replicas, comma separated.
+for i, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica{i}'] = {**DATABASES['default'], 'HOST': host}
+    DATABASE_REPLICAS.append(f'replica{i}')
+
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND')
 EMAIL_HOST = os.environ.get('EMAIL_HOST')
 EMAIL_PORT = os.environ.get('EMAIL_PORT')
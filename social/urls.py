@@ -18,12 +18,15 @@ from django.urls import path, include
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from core.views import batch
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('users.routers')),
     path('', include('users.urls')),
     path('', include('posts.routers')),
     path('', include('posts.urls')),
+    path('batch/', batch, name='batch'),
 
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     path('docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='docs')
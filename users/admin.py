@@ -1,8 +1,9 @@
 from django.contrib import admin
 
-from .models import User,Follower, Block
+from .models import User,Follower, Block, AccountDeactivation
 # Register your models here.
 
 admin.site.register(User)
 admin.site.register(Follower)
-admin.site.register(Block)
\ No newline at end of file
+admin.site.register(Block)
+admin.site.register(AccountDeactivation)
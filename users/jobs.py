@@ -0,0 +1,18 @@
+from core.jobs import task
+from .models import User, ResetLink
+from .utils import send_activation_email, send_recovery_email
+
+
+@task('users.send_activation_email')
+def send_activation_email_job(user_id, to_email, domain, protocol):
+    user = User.objects.filter(id=user_id, is_active=False).first()
+    # Already activated, or deleted, before the email was sent.
+    if user is not None:
+        send_activation_email(user, to_email, domain, protocol)
+
+
+@task('users.send_recovery_email')
+def send_recovery_email_job(reset_link_id, to_email, domain, protocol):
+    reset_link = ResetLink.objects.select_related('user').filter(id=reset_link_id).first()
+    if reset_link is not None:
+        send_recovery_email(reset_link, to_email, domain, protocol)
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.utils import process_pending_deactivations
+
+
+class Command(BaseCommand):
+    help = 'Remove the content of the deactivated accounts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows changed per transaction.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running as a worker.')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds to wait between runs with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending_deactivations(
+                batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{processed} account/s processed.'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
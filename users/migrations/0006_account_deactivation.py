@@ -0,0 +1,29 @@
+# Generated by Django 4.2.6 on 2026-10-18 23:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_alter_user_last_login'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeactivation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_at', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('modify_at', models.DateTimeField(auto_now=True, verbose_name='Date of last modification')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Date of end of the cleanup')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='deactivation', to=settings.AUTH_USER_MODEL, to_field='user_handle', verbose_name='Deactivated user')),
+            ],
+            options={
+                'verbose_name': 'Account deactivation',
+                'verbose_name_plural': 'Accounts deactivations',
+            },
+        ),
+    ]
@@ -173,3 +173,17 @@ class Block(models.Model):
 
     def __str__(self):
         return f'{self.blocked_by} blocked the user {self.blocked_user}.'
+
+
+class AccountDeactivation(DatesRecordsBaseModel):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, to_field='user_handle',
+                                related_name='deactivation', verbose_name=_('Deactivated user'))
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_('Date of end of the cleanup'))
+
+    class Meta:
+        verbose_name = _('Account deactivation')
+        verbose_name_plural = _('Accounts deactivations')
+
+    def __str__(self):
+        return f'Deactivation of {self.user_id}.'
@@ -8,11 +8,19 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.settings import api_settings
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-
+from core.utils import media_url
 from .models import User, Follower, Block
 
 
 class ListProfileUserSerializer(serializers.ModelSerializer):
+    only_fields = [
+        'username', 'user_handle', 'email',
+        'first_name', 'last_name', 'birth_date',
+        'biography', 'profile_img', 'header_photo',
+        'website', 'location', 'create_at',
+        'follower_amount', 'following_amount'
+    ]
+
     class Meta:
         model = User
         fields = [
@@ -24,7 +32,8 @@ class ListProfileUserSerializer(serializers.ModelSerializer):
         ]
 
     def to_representation(self, instance):
-        try:
+        # Rows from `.values()` are read by key, the images are the file names.
+        if isinstance(instance, dict):
             return {
                 'username': instance['username'],
                 'user_handle': instance['user_handle'],
@@ -33,34 +42,39 @@ class ListProfileUserSerializer(serializers.ModelSerializer):
                 'last_name': instance['last_name'],
                 'birth_date': instance['birth_date'],
                 'biography': instance['biography'],
-                'profile_img': instance.profile_img.url if instance['profile_img'] else '',
-                'header_photo': instance.header_photo.url if instance['header_photo'] else '',
+                'profile_img': media_url(instance['profile_img']),
+                'header_photo': media_url(instance['header_photo']),
                 'website': instance['website'],
                 'location': instance['location'],
                 'create_at': _(instance['create_at'].strftime("%B of %Y")),
                 'follower_amount': instance['follower_amount'],
                 'following_amount': instance['following_amount'],
             }
-        except:
-            return {
-                'username': instance.username,
-                'user_handle': instance.user_handle,
-                'email': instance.email,
-                'first_name': instance.first_name,
-                'last_name': instance.last_name,
-                'birth_date': instance.birth_date,
-                'biography': instance.biography,
-                'profile_img': instance.profile_img.url if instance.profile_img else '',
-                'header_photo': instance.header_photo.url if instance.header_photo else '',
-                'website': instance.website,
-                'location': instance.location,
-                'create_at': _(instance.create_at.strftime("%B of %Y")),
-                'follower_amount': instance.follower_amount,
-                'following_amount': instance.following_amount,
-            }
+
+        return {
+            'username': instance.username,
+            'user_handle': instance.user_handle,
+            'email': instance.email,
+            'first_name': instance.first_name,
+            'last_name': instance.last_name,
+            'birth_date': instance.birth_date,
+            'biography': instance.biography,
+            'profile_img': media_url(instance.profile_img.name),
+            'header_photo': media_url(instance.header_photo.name),
+            'website': instance.website,
+            'location': instance.location,
+            'create_at': _(instance.create_at.strftime("%B of %Y")),
+            'follower_amount': instance.follower_amount,
+            'following_amount': instance.following_amount,
+        }
 
 
 class ListSimpleUserSerializer(serializers.ModelSerializer):
+    only_fields = [
+        'username', 'user_handle', 'biography',
+        'profile_img', 'follower_amount', 'following_amount'
+    ]
+
     class Meta:
         model = User
         fields = [
@@ -69,26 +83,37 @@ class ListSimpleUserSerializer(serializers.ModelSerializer):
         ]
 
     def to_representation(self, instance):
-
-        try:
+        # With a `users` table in the context (`?normalize=users`) the user is
+        # rendered once in the table, and referenced by his handle.
+        users = self.context.get('users', None)
+        if users is not None:
+            handle = instance['user_handle'] if isinstance(
+                instance, dict) else instance.user_handle
+            if handle not in users:
+                users[handle] = self.render_user(instance)
+            return handle
+        return self.render_user(instance)
+
+    def render_user(self, instance):
+        # Rows from `.values()` are read by key, the image is the file name.
+        if isinstance(instance, dict):
             return {
                 'username': instance['username'],
                 'user_handle': instance['user_handle'],
                 'biography': instance['biography'],
-                'profile_img': instance.profile_img.url if instance['profile_img'] else '',
+                'profile_img': media_url(instance['profile_img']),
                 'follower_amount': instance['follower_amount'],
                 'following_amount': instance['following_amount'],
             }
-        except:
-            return {
-                'username': instance.username,
-                'user_handle': instance.user_handle,
 
-                'biography': instance.biography,
-                'profile_img': instance.profile_img.url if instance.profile_img else '',
-                'follower_amount': instance.follower_amount,
-                'following_amount': instance.following_amount,
-            }
+        return {
+            'username': instance.username,
+            'user_handle': instance.user_handle,
+            'biography': instance.biography,
+            'profile_img': media_url(instance.profile_img.name),
+            'follower_amount': instance.follower_amount,
+            'following_amount': instance.following_amount,
+        }
 
 
 class CreateUserSerializer(serializers.ModelSerializer):
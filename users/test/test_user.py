@@ -9,7 +9,11 @@ from rest_framework.test import APITestCase
 
 from core.test.test_setup import BaseApiTest
 from .factories import UserFactory
-from ..models import User, Follower, Block
+from posts.models import Post, Likes, Repost, Notification
+from posts.utils import notify_grouped
+from ..models import User, Follower, Block, AccountDeactivation
+from ..serializers import ListSimpleUserSerializer, ListProfileUserSerializer
+from ..utils import get_blocked_by_handles, process_pending_deactivations
 
 
 class NoAuthUserTestCase(APITestCase, UserFactory):
@@ -157,6 +161,24 @@ class AuthUserTestCase(BaseApiTest, UserFactory):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_user_not_modified(self):
+        url = reverse('users-detail',
+                      kwargs={'user_handle': self.user.user_handle})
+        response = self.client.get(url)
+
+        with self.assertNumQueries(4):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        self.client.patch(url, {'first_name': 'Arty'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], 'Arty')
+
     def test_update_user(self):
         url = reverse('users-detail',
                       kwargs={'user_handle': self.user.user_handle})
@@ -211,6 +233,122 @@ class AuthUserTestCase(BaseApiTest, UserFactory):
         user = User.objects.get(user_handle=self.user.user_handle)
 
         self.assertFalse(user.is_active)
+        self.assertTrue(AccountDeactivation.objects.filter(
+            user=user, finished_at__isnull=True).exists())
+
+    def test_process_deactivation_remove_user_content(self):
+        user = self.create_active_user()
+        other_post = Post.objects.create(user=user, body='Other post')
+        other_post.num_likes = other_post.num_repost = 1
+        other_post.save()
+        post = Post.objects.create(user=self.user, body='Post')
+
+        Likes.objects.create(user=self.user, post=other_post)
+        Repost.objects.create(user=self.user, post=other_post)
+        Follower.objects.create(follower=self.user, following=user)
+        Follower.objects.create(follower=user, following=self.user)
+        User.objects.filter(user_handle__in=[self.user.user_handle, user.user_handle]).update(
+            follower_amount=1, following_amount=1)
+        Notification.objects.create(
+            sender=user, recipient=self.user, notification_type='follow',
+            header=f'{user} is following you.')
+
+        url = reverse('users-detail',
+                      kwargs={'user_handle': self.user.user_handle})
+        self.client.delete(url)
+
+        process_pending_deactivations(batch_size=1)
+
+        self.assertEqual(Post.objects.get(id=post.id).status, Post.HIDDEN)
+        other_post = Post.objects.get(id=other_post.id)
+        self.assertEqual(other_post.num_likes, 0)
+        self.assertEqual(other_post.num_repost, 0)
+        self.assertFalse(Follower.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+        user = User.objects.get(id=user.id)
+        self.assertEqual(user.follower_amount, 0)
+        self.assertEqual(user.following_amount, 0)
+        self.assertIsNotNone(AccountDeactivation.objects.get(
+            user=self.user).finished_at)
+
+    def test_process_deactivation_keep_deleted_posts(self):
+        deleted = Post.objects.create(
+            user=self.user, body='Deleted post', status=Post.DELETED)
+        post = Post.objects.create(user=self.user, body='Post')
+        quote = Post.objects.create(
+            user=self.create_active_user(), body='Quote', quote=post)
+
+        self.client.delete(reverse('users-detail',
+                                   kwargs={'user_handle': self.user.user_handle}))
+        process_pending_deactivations()
+
+        self.assertEqual(Post.objects.get(id=deleted.id).status, Post.DELETED)
+        self.assertEqual(Post.objects.get(id=post.id).status, Post.HIDDEN)
+        self.assertEqual(Post.objects.get(id=quote.id).version, quote.version + 1)
+
+    def test_process_deactivation_keep_groups_of_other_senders(self):
+        recipient = self.create_active_user()
+        other = self.create_active_user()
+        post = Post.objects.create(user=recipient, body='Post')
+        notify_grouped(other, recipient, 'like', post)
+        notify_grouped(self.user, recipient, 'like', post)
+        notify_grouped(self.user, recipient, 'follow')
+
+        self.client.delete(reverse('users-detail',
+                                   kwargs={'user_handle': self.user.user_handle}))
+        process_pending_deactivations()
+
+        group = Notification.objects.get()
+        self.assertEqual(group.count, 1)
+        self.assertEqual(group.sender, other)
+        self.assertEqual(group.recent_senders, [other.user_handle])
+        self.assertTrue(group.header.startswith(str(other)))
+
+    def test_process_deactivation_keep_groups_without_recent_senders(self):
+        recipient = self.create_active_user()
+        other = self.create_active_user()
+        liker = self.create_active_user()
+        post = Post.objects.create(user=recipient, body='Post', num_likes=3)
+        for sender in [liker, other, self.user]:
+            Likes.objects.create(user=sender, post=post)
+            notify_grouped(sender, recipient, 'like', post)
+        # The first liker is no longer one of the recent senders.
+        Notification.objects.update(recent_senders=[self.user.user_handle, other.user_handle])
+        User.objects.filter(id=other.id).update(is_active=False)
+
+        self.client.delete(reverse('users-detail',
+                                   kwargs={'user_handle': self.user.user_handle}))
+        process_pending_deactivations()
+
+        group = Notification.objects.get()
+        self.assertEqual(group.count, 2)
+        self.assertEqual(group.sender, liker)
+        self.assertEqual(group.recent_senders, [liker.user_handle])
+
+
+class UserSerializersTestCase(APITestCase, UserFactory):
+    def test_simple_user_serializer_instance_and_row(self):
+        user = self.create_active_user()
+        user.profile_img = 'user/profile/image file.png'
+        user.save()
+
+        data = ListSimpleUserSerializer(user).data
+        row = User.objects.filter(id=user.id).values(
+            *ListSimpleUserSerializer.Meta.fields)[0]
+
+        self.assertEqual(data['profile_img'], user.profile_img.url)
+        self.assertEqual(ListSimpleUserSerializer(row).data, data)
+
+    def test_profile_user_serializer_instance_and_row(self):
+        user = self.create_active_user()
+
+        data = ListProfileUserSerializer(user).data
+        row = User.objects.filter(id=user.id).values(
+            *ListProfileUserSerializer.Meta.fields)[0]
+
+        self.assertEqual(data['header_photo'], '')
+        self.assertEqual(ListProfileUserSerializer(row).data, data)
 
 
 class NoAuthBlockTestCase(APITestCase, UserFactory):
@@ -284,6 +422,76 @@ class AuthBlockTestCase(BaseApiTest, UserFactory):
         self.assertFalse(Block.objects.filter(
             blocked_by=self.user, blocked_user=user).exists())
 
+    def create_follows_and_notifications(self, user):
+        Follower.objects.create(follower=self.user, following=user)
+        Follower.objects.create(follower=user, following=self.user)
+        User.objects.filter(user_handle__in=[self.user.user_handle, user.user_handle]).update(
+            follower_amount=1, following_amount=1)
+
+        for sender, recipient in [(self.user, user), (user, self.user)]:
+            Notification.objects.create(
+                sender=sender, recipient=recipient, notification_type='follow',
+                header=f'{sender} is following you.')
+        Notification.objects.create(
+            sender=user, recipient=self.user, notification_type='follow',
+            header=f'{user} is following you.', is_read=True)
+
+    def test_create_block_remove_follows_and_notifications(self):
+        user = self.create_active_user()
+        self.create_follows_and_notifications(user)
+
+        url = reverse('block-list')
+        response = self.client.post(url, {'blocked_user': user.user_handle})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Follower.objects.filter(
+            follower__in=[self.user, user]).exists())
+        for blocked in User.objects.filter(user_handle__in=[self.user.user_handle, user.user_handle]):
+            self.assertEqual(blocked.follower_amount, 0)
+            self.assertEqual(blocked.following_amount, 0)
+        self.assertEqual(
+            list(Notification.objects.values_list('is_read', flat=True)), [True])
+
+    def test_create_block_keep_group_of_other_senders(self):
+        post = Post.objects.create(user=self.user, body='Post')
+        likers = [self.create_active_user() for _ in range(3)]
+        for liker in likers:
+            notify_grouped(liker, self.user, 'like', post)
+
+        url = reverse('block-list')
+        response = self.client.post(url, {'blocked_user': likers[-1].user_handle})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        group = Notification.objects.get()
+        self.assertEqual(group.count, 2)
+        self.assertEqual(group.sender, likers[1])
+        self.assertEqual(group.recent_senders,
+                         [likers[1].user_handle, likers[0].user_handle])
+        self.assertTrue(group.header.startswith(str(likers[1])))
+
+    def test_create_block_queries_not_depend_on_follows(self):
+        user = self.create_active_user()
+        self.create_follows_and_notifications(user)
+
+        url = reverse('block-list')
+        # The groups of the two users are looked up in one query by direction.
+        with self.assertNumQueries(15):
+            self.client.post(url, {'blocked_user': user.user_handle})
+
+    def test_create_block_update_blocked_by_handles(self):
+        user = self.create_active_user()
+        self.assertNotIn(self.user.user_handle, get_blocked_by_handles(user))
+
+        url = reverse('block-list')
+        self.client.post(url, {'blocked_user': user.user_handle})
+
+        self.assertIn(self.user.user_handle, get_blocked_by_handles(user))
+
+        url = reverse('block-detail', kwargs={'user_handle': user.user_handle})
+        self.client.delete(url)
+
+        self.assertNotIn(self.user.user_handle, get_blocked_by_handles(user))
+
 
 class NoAuthFollowerTestCase(APITestCase, UserFactory):
 
@@ -409,3 +617,29 @@ class AuthFollowerTestCase(BaseApiTest, UserFactory):
 
         self.assertFalse(Follower.objects.filter(
             follower=self.user.user_handle, following=user.user_handle).exists())
+
+
+class AuthUserBatchTestCase(BaseApiTest, UserFactory):
+    def test_get_users_batch(self):
+        users = [self.create_active_user() for _ in range(3)]
+        blocking = self.create_active_user()
+        Block.objects.create(blocked_by=blocking, blocked_user=self.user)
+        blocked = self.create_active_user()
+        Block.objects.create(blocked_by=self.user, blocked_user=blocked)
+        handles = [users[2].user_handle, 'missing', blocking.user_handle,
+                   blocked.user_handle, users[0].user_handle, users[2].user_handle]
+
+        # The users, and the users that blocked the user.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('users-batch'), {'handles': ','.join(handles)})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['user_handle'] for user in response.data['results']],
+                         [users[2].user_handle, users[0].user_handle])
+        self.assertEqual(response.data['not_found'], ['missing', blocked.user_handle])
+        self.assertEqual(response.data['forbidden'], [blocking.user_handle])
+
+    def test_fail_get_users_batch_without_handles(self):
+        response = self.client.get(reverse('users-batch'))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
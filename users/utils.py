@@ -6,39 +6,54 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, F, Case, When
+from django.utils import timezone
 
+from core.jobs import enqueue
+from core.utils import delete_in_batches
+from posts.models import Post, Likes, Repost, Notification
 from .tokens import account_activation_token
-from .models import User
+from .models import User, Follower, Block, AccountDeactivation
+
+
+def get_email_site(request):
+    """Get the domain and the protocol of the links of the emails sent by the jobs."""
+    return {
+        'domain': get_current_site(request).domain,
+        'protocol': 'https' if request.is_secure() else 'http',
+    }
 
 
 def activate_with_email(request, user, to_email):
+    # Sent by the jobs worker once the user is committed.
+    enqueue('users.send_activation_email', {
+        'user_id': user.pk, 'to_email': to_email, **get_email_site(request)})
 
-    try:
-        mail_subject = "Bienvenido/a a Carbono Smart - Confirmación de Registro"
 
-        context = {
-            'user': user.username,
-            'domain': get_current_site(request).domain,
-            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-            'token': account_activation_token.make_token(user),
-            'protocol': 'https' if request.is_secure() else 'http',
-        }
+def send_activation_email(user, to_email, domain, protocol):
+    mail_subject = "Bienvenido/a a Carbono Smart - Confirmación de Registro"
 
-        temp = get_template('email_confirmation_message.html')
+    context = {
+        'user': user.username,
+        'domain': domain,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': account_activation_token.make_token(user),
+        'protocol': protocol,
+    }
 
-        content = temp.render(context)
+    temp = get_template('email_confirmation_message.html')
 
-        corr = EmailMultiAlternatives(
-            subject=mail_subject,
-            from_email=settings.EMAIL_HOST_USER,
-            to=[to_email],
-        )
+    content = temp.render(context)
 
-        corr.attach_alternative(content, 'text/html')
-        corr.send(fail_silently=False)
+    corr = EmailMultiAlternatives(
+        subject=mail_subject,
+        from_email=settings.EMAIL_HOST_USER,
+        to=[to_email],
+    )
 
-    except:
-        print('ERROR')
+    corr.attach_alternative(content, 'text/html')
+    corr.send(fail_silently=False)
 
 
 def generate_available_username_suggestions(base_user_handle, max_suggestions=3):
@@ -52,16 +67,21 @@ def generate_available_username_suggestions(base_user_handle, max_suggestions=3)
     return suggestions
 
 
-def recover_account_email(request, user, to_email, token):
-    # try:
+def recover_account_email(request, reset_link, to_email):
+    # The token is read from the reset link, so it is not copied in the job.
+    enqueue('users.send_recovery_email', {
+        'reset_link_id': reset_link.pk, 'to_email': to_email, **get_email_site(request)})
+
+
+def send_recovery_email(reset_link, to_email, domain, protocol):
     mail_subject = "Recovery your account - Social Media API"
 
     context = {
-        'user': user.username,
-        'domain': get_current_site(request).domain,
-        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-        'token': token,
-        'protocol': 'https' if request.is_secure() else 'http',
+        'user': reset_link.user.username,
+        'domain': domain,
+        'uid': urlsafe_base64_encode(force_bytes(reset_link.user.pk)),
+        'token': reset_link.token,
+        'protocol': protocol,
     }
 
     temp = get_template('password_reset_key_message.html')
@@ -77,5 +97,109 @@ def recover_account_email(request, user, to_email, token):
     corr.attach_alternative(content, 'text/html')
     corr.send(fail_silently=False)
 
-    # except:
-    #     print('ERROR')
+
+def get_blocked_by_handles(user):
+    """
+    Get the handles of the users that blocked `user`, with one query on the
+    index of `Block.blocked_user`. Not cached: a block must hide the posts and
+    the profile of the blocker at once in all the processes.
+    """
+    return set(Block.objects.filter(
+        blocked_user=user).values_list('blocked_by', flat=True))
+
+
+def remove_follows_between(user, other):
+    """
+    Delete the follows in both directions between two users and update the
+    followers amounts of both with a single UPDATE, whatever the follows found.
+    """
+    follows = Follower.objects.filter(
+        Q(follower=user, following=other) | Q(follower=other, following=user))
+    edges = list(follows.values_list('follower', 'following'))
+    if not edges:
+        return 0
+
+    follows.delete()
+    decrement_follow_counters(edges)
+    return len(edges)
+
+
+def decrement_follow_counters(edges, exclude=None):
+    """
+    Update the followers amounts of the users of the deleted `(follower, following)`
+    edges with a single UPDATE. Each user must appear at most once by column,
+    `exclude` is a user handle to left out of the update.
+    """
+    followers = [follower for follower, _ in edges if follower != exclude]
+    followings = [following for _, following in edges if following != exclude]
+    User.objects.filter(user_handle__in=followers + followings).update(
+        follower_amount=F('follower_amount') - Case(
+            When(user_handle__in=followers, then=1), default=0),
+        following_amount=F('following_amount') - Case(
+            When(user_handle__in=followings, then=1), default=0),
+        modify_at=timezone.now(),
+    )
+
+
+def process_account_deactivation(deactivation, batch_size=500):
+    """
+    Remove the content of a deactivated account from the feeds by chunks: hide
+    the posts of the user, delete the likes, reposts, follows and notifications
+    (taking him out of the grouped notifications of other senders), and update
+    the counters of the posts and users affected.
+    """
+    user = deactivation.user
+
+    # The deleted posts are left to the purge worker.
+    while True:
+        posts_ids = list(Post.objects.filter(
+            user=user, status__in=[Post.PUBLISHED, Post.SCHEDULED]
+        ).values_list('id', flat=True)[:batch_size])
+        if not posts_ids:
+            break
+        with transaction.atomic():
+            Post.objects.filter(id__in=posts_ids).update(status=Post.HIDDEN)
+            # The cached quote cards of the hidden posts are rendered again.
+            Post.objects.filter(quote__in=posts_ids).update(
+                version=F('version') + 1, modify_at=timezone.now())
+
+    # A user like or repost a post only once, so each post is decremented by one.
+    delete_in_batches(
+        Likes.objects.filter(user=user), batch_size, fields=('id', 'post_id'),
+        on_delete=lambda rows: Post.objects.filter(
+            id__in=[row['post_id'] for row in rows]
+        ).update(num_likes=F('num_likes') - 1, version=F('version') + 1,
+                 modify_at=timezone.now()))
+    delete_in_batches(
+        Repost.objects.filter(user=user), batch_size, fields=('id', 'post_id'),
+        on_delete=lambda rows: Post.objects.filter(
+            id__in=[row['post_id'] for row in rows]
+        ).update(num_repost=F('num_repost') - 1, version=F('version') + 1,
+                 modify_at=timezone.now()))
+
+    delete_in_batches(
+        Follower.objects.filter(Q(follower=user) | Q(following=user)), batch_size,
+        fields=('id', 'follower_id', 'following_id'),
+        on_delete=lambda rows: decrement_follow_counters(
+            [(row['follower_id'], row['following_id']) for row in rows],
+            exclude=user.user_handle))
+    User.objects.filter(id=user.id).update(
+        follower_amount=0, following_amount=0, modify_at=timezone.now())
+
+    # The groups of likes, reposts and follows of other senders are kept.
+    delete_in_batches(Notification.objects.filter(
+        Q(recipient=user) | Q(sender=user, group_key__isnull=True)), batch_size)
+    # Imported here, `posts.utils` imports this module.
+    from posts.utils import remove_sender_from_groups
+    remove_sender_from_groups(user, batch_size=batch_size)
+
+    deactivation.finished_at = timezone.now()
+    deactivation.save()
+
+
+def process_pending_deactivations(batch_size=500):
+    deactivations = AccountDeactivation.objects.select_related(
+        'user').filter(finished_at__isnull=True).order_by('id')
+    for deactivation in deactivations:
+        process_account_deactivation(deactivation, batch_size=batch_size)
+    return len(deactivations)
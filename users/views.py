@@ -1,9 +1,11 @@
 from datetime import timedelta
 
+from django.conf import settings
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
 from django.utils import timezone
 from django.db.models import Q
+from django.db import transaction
 from django.db.utils import IntegrityError
 
 from rest_framework import viewsets, status
@@ -17,7 +19,9 @@ from rest_framework.permissions import IsAuthenticated
 
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 
-from core.utils import GenericPagination
+from core.dbrouters import ReplicaReadMixin
+from core.utils import (GenericPagination, project, get_only_fields, get_etag,
+                        get_not_modified_response, set_validators, get_batch_keys)
 from posts.models import Notification
 from .serializers import (
     CreateUserSerializer, ListProfileUserSerializer,
@@ -26,16 +30,18 @@ from .serializers import (
     PasswordRecoveryConfirmSerializer, FollowSerializer,
     BlockSerializer, ListBlockSerializer, DummySerializer
 )
-from posts.utils import is_request_user_blocked
-from .models import User, ResetLink, Follower, Block
+from posts.utils import is_request_user_blocked, notify_grouped, remove_sender_from_groups
+from .models import User, ResetLink, Follower, Block, AccountDeactivation
 from .tokens import account_activation_token
-from .utils import activate_with_email, generate_available_username_suggestions, recover_account_email
+from .utils import (activate_with_email, generate_available_username_suggestions, recover_account_email,
+                    remove_follows_between, get_blocked_by_handles)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = CreateUserSerializer
     lookup_field = 'user_handle'
     pagination_class = GenericPagination
+    replica_actions = ('list', 'batch')
 
     def get_serializer_class(self):
         """
@@ -125,7 +131,8 @@ class UserViewSet(viewsets.ModelViewSet):
         if request.user.is_authenticated:
             lookup_search = self.request.GET.get('search', None)
 
-            users = self.get_queryset(search=lookup_search)
+            users = project(self.get_queryset(
+                search=lookup_search), ListSimpleUserSerializer)
             if users.exists():
                 users_serializer = self.get_serializer_class()(users, many=True)
                 paginator = self.pagination_class()
@@ -323,17 +330,93 @@ class UserViewSet(viewsets.ModelViewSet):
         The authenticated user not have permission. access denied.\n
         - `404 Not Found`:
         User with the user_handle parse in the query parameter not exists or is inactive.\n
+
+        ### Conditional requests:\n
+        The response have a weak `ETag` and a `Last-Modified` from the last modification
+        of the user. With a matching `If-None-Match` (or `If-Modified-Since`) the response
+        is `304 Not Modified`, without body.\n
         """
         if request.user.is_authenticated:
+            user = self.get_object()
             blocked = is_request_user_blocked(
-                owner=self.get_object(), request_user=request.user)
+                owner=user, request_user=request.user)
             if blocked:
                 return Response({'detail': 'You do not have permission to access this information.'}, status=status.HTTP_403_FORBIDDEN)
 
-            return super().retrieve(request, *args, **kwargs)
+            # The counters are updated with the `modify_at` of the user.
+            etag = get_etag(request, user.modify_at,
+                            user.follower_amount, user.following_amount)
+            not_modified = get_not_modified_response(
+                request, etag, user.modify_at)
+            if not_modified is not None:
+                return not_modified
+
+            serializer = self.get_serializer(user)
+            return set_validators(Response(serializer.data), etag, user.modify_at)
         else:
             return Response({'detail': 'Not authenticated user.'}, status=status.HTTP_401_UNAUTHORIZED)
 
+    @extend_schema(
+        responses={200: ListProfileUserSerializer(many=True)},
+        parameters=[
+            OpenApiParameter(
+                name='handles', description='Comma separated handles of the users to get (max 100).', type=str),
+        ],
+    )
+    @action(detail=False, methods=['GET'], url_path='batch', permission_classes=[IsAuthenticated])
+    def batch(self, request: Request, *args, **kwargs):
+        """
+        Retrieve a group of user profiles by their handles.\n
+
+        The profiles of several users in one request instead of one for each user, read with
+        one query for the users and at most one for the users that blocked the authenticated
+        user.\n
+
+        ### URL Parameters :\n
+        - `handles` (str): Comma separated user handles, up to `100`.\n
+
+        ### Response (Success):\n
+        - `200 OK`:\n
+            - `results` (list): The profiles found, in the order of `handles`, with the same
+            fields than the profile of a user.\n
+            - `not_found` (list): Handles of the users that do not exist, are inactive or are
+            blocked by the user.\n
+            - `forbidden` (list): Handles of the users that blocked the user.\n
+
+        ### Response (Failure):\n
+        - `400 Bad Request`:
+        If `handles` is missing or not valid.\n
+        - `401 Unauthorized`:
+        User not authenticated.\n
+        """
+        try:
+            handles = get_batch_keys(request, 'handles')
+        except ValueError:
+            return Response({'detail': f'handles must be between 1 and {settings.BATCH_MAX_KEYS} user handles.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The same users than `retrieve`: the ones blocked by the user are not found.
+        users = project(User.objects.filter(is_active=True, user_handle__in=handles).exclude(
+            user_handle__in=Block.objects.filter(blocked_by=request.user).values('blocked_user')
+        ), ListProfileUserSerializer)
+        found = {user.user_handle: user for user in users}
+        blocked_by = get_blocked_by_handles(request.user)
+
+        results, not_found, forbidden = [], [], []
+        for handle in handles:
+            user = found.get(handle, None)
+            if user is None:
+                not_found.append(handle)
+            elif handle in blocked_by:
+                forbidden.append(handle)
+            else:
+                results.append(user)
+
+        return Response({
+            'results': ListProfileUserSerializer(results, many=True).data,
+            'not_found': not_found,
+            'forbidden': forbidden,
+        })
+
     @extend_schema(parameters=[OpenApiParameter("user_handle", str, OpenApiParameter.PATH)])
     def destroy(self, request: Request, user_handle=None, *args, **kwargs):
         """
@@ -348,7 +431,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
         ### Response (Success):\n
         - `200 OK`:
-        User account deactivated successfully.\n
+        User account deactivated successfully. The posts, likes, reposts, follows and notifications of the user are removed in background.\n
             - `message` (str): Confirmation message.\n\n
 
         ### Response (Failure):\n
@@ -358,8 +441,11 @@ class UserViewSet(viewsets.ModelViewSet):
         user = self.get_queryset(lookup=user_handle)
         if request.user == user:
             try:
-                user.is_active = False
-                user.save()
+                # The content of the user is removed later by the deactivation worker.
+                with transaction.atomic():
+                    user.is_active = False
+                    user.save()
+                    AccountDeactivation.objects.get_or_create(user=user)
                 return Response({'message': 'User has been deleted.'}, status=status.HTTP_200_OK)
             except:
                 return Response({'error': "Something fail."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -552,10 +638,10 @@ class PasswordRecoveryViewSet(viewsets.ViewSet):
                 token = account_activation_token.make_token(user)
                 expiration_time = timezone.now() + timedelta(minutes=90)
 
-                ResetLink.objects.create(
+                reset_link = ResetLink.objects.create(
                     user=user, token=token, expiration_time=expiration_time)
 
-                recover_account_email(request, user, email, token)
+                recover_account_email(request, reset_link, email)
 
             return Response(
                 {'detail': f'Password reset link sent to {email}, if the email is linked to an account.'},
@@ -681,16 +767,20 @@ class EmailConfirmationView(APIView):
             return Response({'detail': 'Activation link is invalid'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class FollowViewSet(viewsets.GenericViewSet):
+class FollowViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
     serializer_class = FollowSerializer
     permission_classes = [IsAuthenticated,]
     lookup_field = 'user_handle'
+    replica_actions = ('get_followers', 'get_followings')
 
     def get_queryset(self, follower=None, following=None):
+        # Load only the user rendered of each follow, the other is the path user.
         if follower != None:
-            return Follower.objects.select_related('follower').filter(follower=follower)
+            return Follower.objects.filter(follower=follower).select_related('following').only(
+                'following', *get_only_fields(ListSimpleUserSerializer, 'following__'))
         elif following != None:
-            return Follower.objects.select_related('following').filter(following=following)
+            return Follower.objects.filter(following=following).select_related('follower').only(
+                'follower', *get_only_fields(ListSimpleUserSerializer, 'follower__'))
         else:
             return None
 
@@ -733,14 +823,7 @@ class FollowViewSet(viewsets.GenericViewSet):
 
                 follower.save()
                 following.save()
-                Notification.objects.create(
-                    sender=follower,
-                    recipient=following,
-                    notification_type='follow',
-                    post=None,
-                    header=f'{follower} started following you.',
-                    message=None,
-                )
+                notify_grouped(follower, following, 'follow')
                 return Response({'detail': 'Success follow apply.'}, status=status.HTTP_200_OK)
             except IntegrityError:
                 return Response({'detail': 'Follow already exist.'}, status=status.HTTP_409_CONFLICT)
@@ -957,7 +1040,7 @@ class BlockViewSet(viewsets.GenericViewSet):
 
         ### Response (Success):\n
         - `201 Created`:
-        The user was successfully blocked.\n
+        The user was successfully blocked. The follows between both users and the unread notifications between them are removed.\n
             - `detail` (str): Message indicating successful blocking.\n\n
 
         ### Response (Failure):\n
@@ -973,28 +1056,26 @@ class BlockViewSet(viewsets.GenericViewSet):
             blocked_by, blocked_user = request.user, block_serializer.validated_data[
                 'blocked_user']
             try:
-                Block.objects.create(
-                    blocked_by=blocked_by,
-                    blocked_user=blocked_user,
-                    reason=block_serializer.validated_data['reason'] if 'reason' in block_serializer.validated_data.keys() else None)
+                with transaction.atomic():
+                    Block.objects.create(
+                        blocked_by=blocked_by,
+                        blocked_user=blocked_user,
+                        reason=block_serializer.validated_data['reason'] if 'reason' in block_serializer.validated_data.keys() else None)
+
+                    remove_follows_between(blocked_by, blocked_user)
+
+                    Notification.objects.filter(
+                        Q(sender=blocked_by, recipient=blocked_user) |
+                        Q(sender=blocked_user, recipient=blocked_by),
+                        is_read=False, group_key__isnull=True
+                    ).delete()
+                    # The groups keep the events of the other senders.
+                    remove_sender_from_groups(blocked_user, recipient=blocked_by)
+                    remove_sender_from_groups(blocked_by, recipient=blocked_user)
 
             except IntegrityError:
                 return Response({'detail': 'User is already block.'}, status=status.HTTP_409_CONFLICT)
 
-            follows_remove = Follower.objects.select_related('follower', 'following').filter(
-                (Q(follower=blocked_by) | Q(follower=blocked_user)) &
-                (Q(following=blocked_by) | Q(following=blocked_user))
-            )
-
-            for follow in follows_remove:
-                follow.follower.follower_amount -= 1
-                follow.following.following_amount -= 1
-
-                follow.follower.save()
-                follow.following.save()
-
-            follows_remove.delete()
-
             return Response({'detail': 'The user was successfully blocked'}, status=status.HTTP_201_CREATED)
         else:
             return Response(block_serializer.errors, status=status.HTTP_400_BAD_REQUEST)